@@ -24,6 +24,10 @@ CREATE TABLE IF NOT EXISTS error_records (
     error_message TEXT COMMENT '原始错误信息',
     error_stack TEXT COMMENT '错误堆栈',
 
+    -- 键值哈希 (JSON数组，供多值索引预筛匹配)
+    pattern_key_hashes JSON COMMENT '错误特征键值对哈希列表',
+    pattern_hash_blob BLOB COMMENT '预编码的匹配结构 (uint64 键/值哈希数组)',
+
     -- 特征向量
     feature_vector_id VARCHAR(100) COMMENT 'Milvus向量ID',
 
@@ -49,12 +53,13 @@ CREATE TABLE IF NOT EXISTS error_records (
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间',
 
     -- 索引
-    INDEX idx_error_type (error_type),
+    INDEX idx_type_block_level (error_type, block_level),
     INDEX idx_error_scene (error_scene),
     INDEX idx_block_level (block_level),
-    INDEX idx_last_occurred (last_occurred_at),
+    INDEX idx_last_occurred (last_occurred_at DESC),
     INDEX idx_project (project_id),
-    INDEX idx_created_at (created_at)
+    INDEX idx_created_at (created_at),
+    INDEX idx_pattern_key_hashes ((CAST(pattern_key_hashes->'$' AS UNSIGNED ARRAY)))
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='错误记录表';
 
 -- ============================================
@@ -95,7 +100,7 @@ CREATE TABLE IF NOT EXISTS error_intercept_logs (
     INDEX idx_intercept_action (intercept_action),
     INDEX idx_operation_type (operation_type),
     INDEX idx_session (session_id),
-    INDEX idx_created_at (created_at),
+    INDEX idx_created_at_covering (created_at DESC, error_record_id, intercept_action, match_confidence),
 
     -- 外键
     FOREIGN KEY (error_record_id) REFERENCES error_records(id) ON DELETE CASCADE
@@ -43,8 +43,8 @@ CREATE TABLE coding_experiences (
     usage_count INT DEFAULT 0 COMMENT '被复用次数',
 
     -- 向量表示(用于相似度计算)
-    context_embedding TEXT COMMENT '上下文向量(JSON)',
-    solution_embedding TEXT COMMENT '解决方案向量(JSON)',
+    context_embedding BLOB COMMENT '上下文向量(float32字节)',
+    solution_embedding BLOB COMMENT '解决方案向量(float32字节)',
 
     -- 元数据
     tags JSON COMMENT '标签列表',
@@ -114,12 +114,12 @@ CREATE TABLE graph_nodes (
     size FLOAT DEFAULT 1.0 COMMENT '节点大小',
 
     -- 向量表示
-    embedding TEXT COMMENT '节点嵌入向量(JSON)',
+    embedding BLOB COMMENT '节点嵌入向量(float32字节)',
 
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
 
-    INDEX idx_project_type (project_id, node_type),
+    INDEX idx_project_type_scores (project_id, node_type, complexity_score, importance_score),
     INDEX idx_importance (importance_score DESC),
     INDEX idx_complexity (complexity_score DESC),
     INDEX idx_cluster (cluster_id),
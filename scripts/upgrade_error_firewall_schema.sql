@@ -0,0 +1,137 @@
+-- ============================================
+-- 错误防火墙 - 已有数据库升级脚本
+-- 为 create_error_firewall_schema.sql 之后新增的列和索引提供增量迁移
+-- ============================================
+
+USE mcp_db;
+
+-- ============================================
+-- 1. 键值哈希列 + 多值索引 (MySQL 8.0.17+)
+-- check_operation 通过 JSON_OVERLAPS 预筛候选记录
+-- 旧记录保持 NULL，查询时仍走完整评分，可由应用重新记录后回填
+-- ============================================
+
+-- MySQL 不支持 ADD COLUMN IF NOT EXISTS，通过 information_schema 判断列是否已存在
+SET @ddl = IF(
+    (SELECT COUNT(*) FROM information_schema.COLUMNS
+     WHERE TABLE_SCHEMA = DATABASE()
+       AND TABLE_NAME = 'error_records'
+       AND COLUMN_NAME = 'pattern_key_hashes') = 0,
+    'ALTER TABLE error_records ADD COLUMN pattern_key_hashes JSON COMMENT ''错误特征键值对哈希列表''',
+    'SELECT 1'
+);
+PREPARE stmt FROM @ddl;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+SET @ddl = IF(
+    (SELECT COUNT(*) FROM information_schema.STATISTICS
+     WHERE TABLE_SCHEMA = DATABASE()
+       AND TABLE_NAME = 'error_records'
+       AND INDEX_NAME = 'idx_pattern_key_hashes') = 0,
+    'ALTER TABLE error_records ADD INDEX idx_pattern_key_hashes ((CAST(pattern_key_hashes->''$'' AS UNSIGNED ARRAY)))',
+    'SELECT 1'
+);
+PREPARE stmt FROM @ddl;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+-- ============================================
+-- 2. 面向实际查询形态的索引
+-- _find_matching_errors: WHERE error_type = ? AND block_level != 'none'
+-- get_recent_errors:     ORDER BY last_occurred_at DESC LIMIT ?
+-- get_statistics:        最近拦截 ORDER BY created_at DESC LIMIT 10 + JOIN
+-- (error_id 已有 UNIQUE 约束，无需额外索引)
+-- ============================================
+
+-- 索引同样通过 information_schema.STATISTICS 判断，脚本可重复执行
+-- 先建新索引再删旧索引，期间查询始终有索引可用
+
+SET @ddl = IF(
+    (SELECT COUNT(*) FROM information_schema.STATISTICS
+     WHERE TABLE_SCHEMA = DATABASE()
+       AND TABLE_NAME = 'error_records'
+       AND INDEX_NAME = 'idx_type_block_level') = 0,
+    'ALTER TABLE error_records ADD INDEX idx_type_block_level (error_type, block_level)',
+    'SELECT 1'
+);
+PREPARE stmt FROM @ddl;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+SET @ddl = IF(
+    (SELECT COUNT(*) FROM information_schema.STATISTICS
+     WHERE TABLE_SCHEMA = DATABASE()
+       AND TABLE_NAME = 'error_records'
+       AND INDEX_NAME = 'idx_error_type') > 0,
+    'ALTER TABLE error_records DROP INDEX idx_error_type',
+    'SELECT 1'
+);
+PREPARE stmt FROM @ddl;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+-- idx_last_occurred 改为降序: 不存在时新建，仍为升序 (COLLATION = 'A') 时重建
+SET @ddl = IF(
+    (SELECT COUNT(*) FROM information_schema.STATISTICS
+     WHERE TABLE_SCHEMA = DATABASE()
+       AND TABLE_NAME = 'error_records'
+       AND INDEX_NAME = 'idx_last_occurred'
+       AND COLLATION = 'D') > 0,
+    'SELECT 1',
+    IF(
+        (SELECT COUNT(*) FROM information_schema.STATISTICS
+         WHERE TABLE_SCHEMA = DATABASE()
+           AND TABLE_NAME = 'error_records'
+           AND INDEX_NAME = 'idx_last_occurred') = 0,
+        'ALTER TABLE error_records ADD INDEX idx_last_occurred (last_occurred_at DESC)',
+        'ALTER TABLE error_records DROP INDEX idx_last_occurred, ADD INDEX idx_last_occurred (last_occurred_at DESC)'
+    )
+);
+PREPARE stmt FROM @ddl;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+SET @ddl = IF(
+    (SELECT COUNT(*) FROM information_schema.STATISTICS
+     WHERE TABLE_SCHEMA = DATABASE()
+       AND TABLE_NAME = 'error_intercept_logs'
+       AND INDEX_NAME = 'idx_created_at_covering') = 0,
+    'ALTER TABLE error_intercept_logs ADD INDEX idx_created_at_covering (created_at DESC, error_record_id, intercept_action, match_confidence)',
+    'SELECT 1'
+);
+PREPARE stmt FROM @ddl;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+SET @ddl = IF(
+    (SELECT COUNT(*) FROM information_schema.STATISTICS
+     WHERE TABLE_SCHEMA = DATABASE()
+       AND TABLE_NAME = 'error_intercept_logs'
+       AND INDEX_NAME = 'idx_created_at') > 0,
+    'ALTER TABLE error_intercept_logs DROP INDEX idx_created_at',
+    'SELECT 1'
+);
+PREPARE stmt FROM @ddl;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+-- ============================================
+-- 3. 预编码匹配结构
+-- check_operation 直接 np.frombuffer 读取，跳过JSON解析
+-- 旧记录保持 NULL，查询时回退到解析 error_pattern
+-- ============================================
+
+SET @ddl = IF(
+    (SELECT COUNT(*) FROM information_schema.COLUMNS
+     WHERE TABLE_SCHEMA = DATABASE()
+       AND TABLE_NAME = 'error_records'
+       AND COLUMN_NAME = 'pattern_hash_blob') = 0,
+    'ALTER TABLE error_records ADD COLUMN pattern_hash_blob BLOB COMMENT ''预编码的匹配结构 (uint64 键/值哈希数组)''',
+    'SELECT 1'
+);
+PREPARE stmt FROM @ddl;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+SELECT '✅ 错误防火墙Schema升级完成!' as status;
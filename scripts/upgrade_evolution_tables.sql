@@ -0,0 +1,38 @@
+-- ============================================
+-- 智能进化系统 - 已有数据库升级脚本
+-- 为 create_evolution_tables.sql 之后的索引与列类型变更提供增量迁移
+-- ============================================
+
+USE mcp_db;
+
+-- ============================================
+-- 1. 图谱统计覆盖索引
+-- get_graph_statistics: WHERE project_id = ? 上的 COUNT / AVG(complexity_score) / MAX(importance_score)
+-- InnoDB 二级索引隐含主键 node_id，查询只需扫描索引 (Using index)
+-- 前缀 (project_id, node_type) 与原 idx_project_type 相同，可直接替换
+-- ============================================
+
+ALTER TABLE graph_nodes
+ADD INDEX idx_project_type_scores (project_id, node_type, complexity_score, importance_score),
+DROP INDEX idx_project_type;
+
+-- ============================================
+-- 2. 经验向量改为二进制存储
+-- float32 原始字节 (768维 = 3KB)，读取时 np.frombuffer 无需JSON解析
+-- 已有JSON数据原样保留，embedding_codec.decode_embedding 兼容读取
+-- ============================================
+
+ALTER TABLE coding_experiences
+MODIFY COLUMN context_embedding BLOB COMMENT '上下文向量(float32字节)',
+MODIFY COLUMN solution_embedding BLOB COMMENT '解决方案向量(float32字节)';
+
+-- ============================================
+-- 3. 图谱节点向量改为二进制存储
+-- 写入完整嵌入的 float32 原始字节 (原为前10维的JSON文本)
+-- 已有JSON数据原样保留，embedding_codec.decode_embedding 兼容读取
+-- ============================================
+
+ALTER TABLE graph_nodes
+MODIFY COLUMN embedding BLOB COMMENT '节点嵌入向量(float32字节)';
+
+SELECT '✅ 智能进化系统Schema升级完成!' as status;
@@ -53,6 +53,7 @@ class VectorDBSettings(BaseSettings):
     milvus: MilvusSettings = Field(default_factory=MilvusSettings)
     faiss_index_path: str = "./data/faiss_index"
     faiss_dimension: int = 768
+    experience_ann_kind: str = Field(default="hnsw", pattern="^(hnsw|ivf|flat)$")
 
 
 class MemorySettings(BaseSettings):
@@ -129,6 +130,14 @@ class TokenOptimizationSettings(BaseSettings):
     preserve_code_structure: bool = True
 
 
+class GraphSettings(BaseSettings):
+    """项目图谱配置"""
+
+    # 单文件分析结果磁盘缓存 (按内容摘要命名，超出上限时淘汰最久未用的条目)
+    analysis_cache_dir: str = "./data/graph_analysis_cache"
+    analysis_cache_max_mb: int = Field(default=512, ge=1)
+
+
 class AntiHallucinationSettings(BaseSettings):
     """幻觉抑制配置"""
 
@@ -258,6 +267,7 @@ class Settings(BaseSettings):
     memory: MemorySettings = Field(default_factory=MemorySettings)
     models: Optional[ModelsSettings] = Field(default_factory=ModelsSettings)
     token_optimization: TokenOptimizationSettings = Field(default_factory=TokenOptimizationSettings)
+    graph: GraphSettings = Field(default_factory=GraphSettings)
     anti_hallucination: AntiHallucinationSettings = Field(
         default_factory=AntiHallucinationSettings
     )
@@ -1,22 +1,38 @@
-"""服务层模块初始化"""
+"""服务层模块初始化
+
+导出按需加载 (PEP 562)：导入单个子模块 (如 embedding_codec) 时
+不会连带加载 torch / sentence_transformers / pymilvus 等重量级依赖
+"""
+
+from importlib import import_module
+
+_EXPORTS = {
+    "EmbeddingService": ".embedding_service",
+    "get_embedding_service": ".embedding_service",
+    "HallucinationValidationService": ".hallucination_service",
+    "create_hallucination_service": ".hallucination_service",
+    "MemoryService": ".memory_service",
+    "RedisClient": ".redis_client",
+    "get_redis_client": ".redis_client",
+    "TokenOptimizationService": ".token_service",
+    "get_token_service": ".token_service",
+    "VectorDBClient": ".vector_db",
+    "get_vector_db_client": ".vector_db",
+    "HybridStorageManager": ".hybrid_storage_system",
+    "create_storage": ".hybrid_storage_system",
+    "IntegratedMemoryManager": ".memory_hybrid_integration",
+    "create_integrated_manager": ".memory_hybrid_integration",
+}
+
+
+def __getattr__(name):
+    module_name = _EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
 
-from .embedding_service import EmbeddingService, get_embedding_service
-from .hallucination_service import (
-    HallucinationValidationService,
-    create_hallucination_service,
-)
-from .memory_service import MemoryService
-from .redis_client import RedisClient, get_redis_client
-from .token_service import TokenOptimizationService, get_token_service
-from .vector_db import VectorDBClient, get_vector_db_client
-from .hybrid_storage_system import (
-    HybridStorageManager,
-    create_storage
-)
-from .memory_hybrid_integration import (
-    IntegratedMemoryManager,
-    create_integrated_manager
-)
 
 __all__ = [
     "RedisClient",
@@ -171,6 +171,20 @@ class MultiAICollaborationController:
 
         logger.info("多AI协同控制器初始化完成")
 
+    # ============================================
+    # 代理管理
+    # ============================================
+
+    def register_agents(self, agents: List[AIAgent]) -> None:
+        """
+        批量注册代理 (一次加锁完成全部更新)
+
+        Args:
+            agents: 代理列表
+        """
+        with self.lock_mutex:
+            self.agents.update({agent.agent_id: agent for agent in agents})
+
     # ============================================
     # 任务分配
     # ============================================
@@ -1099,19 +1113,24 @@ class MultiAICollaborationController:
 
     def store_assignments(self, assignments: Dict[str, Any]) -> None:
         """存储任务分配"""
-        # 存储到Redis以便快速访问
+        if not assignments:
+            return
+
+        # 存储到Redis以便快速访问 (管道批量写入，一次往返)
+        timestamp = datetime.now().isoformat()
+        pipe = self.redis_client.client.pipeline(transaction=False)
         for agent_id, assignment in assignments.items():
-            key = f"assignment:{agent_id}"
-            self.redis_client.set(
-                key,
+            pipe.set(
+                f"assignment:{agent_id}",
                 json.dumps({
                     "task_id": assignment["task"].task_id,
                     "locks": [lock.lock_id for lock in assignment["locks"]],
                     "dependencies": assignment["dependencies"],
-                    "timestamp": datetime.now().isoformat()
+                    "timestamp": timestamp
                 }),
                 ex=3600  # 1小时过期
             )
+        pipe.execute()
 
     def notify_waiters(self, resource_id: str) -> None:
         """通知等待者"""
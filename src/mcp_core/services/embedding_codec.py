@@ -0,0 +1,49 @@
+"""
+嵌入向量二进制编解码
+coding_experiences.context_embedding / solution_embedding 以 float32 原始字节存入 BLOB 列
+"""
+
+import json
+from typing import Optional, Sequence, Union
+
+import numpy as np
+
+
+def encode_embedding(embedding: Union[np.ndarray, Sequence[float]]) -> bytes:
+    """
+    向量 -> float32 字节
+
+    Args:
+        embedding: 嵌入向量
+
+    Returns:
+        可直接写入BLOB列的字节串
+    """
+    return np.asarray(embedding, dtype=np.float32).tobytes()
+
+
+def decode_embedding(value: Union[bytes, str, None]) -> Optional[np.ndarray]:
+    """
+    BLOB列 -> float32 向量
+
+    兼容升级前写入的JSON数组 (迁移只改列类型，不改写已有数据)
+
+    Args:
+        value: 数据库中的原始值
+
+    Returns:
+        只读 float32 向量，值为空时返回 None
+    """
+    if not value:
+        return None
+
+    if isinstance(value, str):
+        return np.asarray(json.loads(value), dtype=np.float32)
+
+    if value[:1] == b"[" and value[-1:] == b"]":
+        try:
+            return np.asarray(json.loads(value), dtype=np.float32)
+        except ValueError:
+            pass
+
+    return np.frombuffer(value, dtype=np.float32)
@@ -0,0 +1,200 @@
+"""
+错误防火墙 - 批量匹配置信度评分
+将错误模式编码为 uint64 哈希数组，对所有候选记录一次性评分
+"""
+
+import hashlib
+import json
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+try:
+    from numba import njit, prange
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
+
+# 候选行数低于该值时 JIT/并行调度的开销大于收益，使用NumPy路径
+NUMBA_MIN_ROWS = 64
+
+# 0 用作填充位，哈希值保证非零
+_PAD = 0
+
+
+def _hash64(content: str) -> int:
+    """64位非零哈希"""
+    digest = hashlib.blake2b(content.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big") or 1
+
+
+def _exact_token(value: Any) -> str:
+    """
+    值的精确比较标记
+
+    数值(含bool)统一为float，使 1 / 1.0 / True 与 Python == 语义一致
+    """
+    if isinstance(value, (int, float)):
+        return f"n:{float(value)!r}"
+    if isinstance(value, str):
+        return f"s:{value}"
+    return f"j:{json.dumps(value, sort_keys=True, ensure_ascii=False, default=str)}"
+
+
+def match_tokens(value: Any) -> Tuple[str, str]:
+    """
+    值的 (精确, 小写) 比较标记
+
+    两个值满足 == 或忽略大小写相等时，至少有一个标记相同
+
+    Args:
+        value: 模式中的值
+
+    Returns:
+        (精确比较标记, 小写字符串)
+    """
+    return _exact_token(value), str(value).lower()
+
+
+def encode_pattern(pattern: Dict[str, Any]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    将模式编码为 (键哈希, 精确值哈希, 小写值哈希) 三个 uint64 数组
+
+    Args:
+        pattern: 错误模式或操作参数
+
+    Returns:
+        三个等长的 uint64 数组
+    """
+    keys = sorted(pattern)
+    return (
+        np.fromiter((_hash64(k) for k in keys), dtype=np.uint64, count=len(keys)),
+        np.fromiter((_hash64(_exact_token(pattern[k])) for k in keys), dtype=np.uint64, count=len(keys)),
+        np.fromiter((_hash64(str(pattern[k]).lower()) for k in keys), dtype=np.uint64, count=len(keys)),
+    )
+
+
+def pattern_to_blob(pattern: Dict[str, Any]) -> bytes:
+    """
+    将模式编码结果打包为二进制 (键 | 精确值 | 小写值，各为 uint64 数组)
+
+    Args:
+        pattern: 错误模式
+
+    Returns:
+        可直接存入BLOB列的字节串
+    """
+    return np.concatenate(encode_pattern(pattern)).tobytes()
+
+
+def blob_to_pattern(blob: bytes) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    从BLOB还原编码结果，不经过JSON解析
+
+    Args:
+        blob: pattern_to_blob 的输出
+
+    Returns:
+        (键哈希, 精确值哈希, 小写值哈希)
+    """
+    keys, exact, lower = np.frombuffer(blob, dtype=np.uint64).reshape(3, -1)
+    return keys, exact, lower
+
+
+def stack_patterns(
+    encoded: List[Tuple[np.ndarray, np.ndarray, np.ndarray]]
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    将多条已编码模式堆叠为 (行数, 最大键数) 的二维数组，不足处以0填充
+
+    Args:
+        encoded: encode_pattern 的结果列表
+
+    Returns:
+        键、精确值、小写值三个二维 uint64 数组
+    """
+    width = max((len(e[0]) for e in encoded), default=0)
+    shape = (len(encoded), max(width, 1))
+    row_keys = np.full(shape, _PAD, dtype=np.uint64)
+    row_exact = np.full(shape, _PAD, dtype=np.uint64)
+    row_lower = np.full(shape, _PAD, dtype=np.uint64)
+
+    for i, (keys, exact, lower) in enumerate(encoded):
+        n = len(keys)
+        row_keys[i, :n] = keys
+        row_exact[i, :n] = exact
+        row_lower[i, :n] = lower
+
+    return row_keys, row_exact, row_lower
+
+
+def _score_numpy(op_keys, op_exact, op_lower, row_keys, row_exact, row_lower) -> np.ndarray:
+    """NumPy向量化评分: 广播比较 (行, 键, 参数)"""
+    key_hit = row_keys[:, :, None] == op_keys[None, None, :]
+    exact = (key_hit & (row_exact[:, :, None] == op_exact[None, None, :])).any(axis=2)
+    lower = (key_hit & (row_lower[:, :, None] == op_lower[None, None, :])).any(axis=2)
+
+    matched = np.where(exact, 1.0, np.where(lower, 0.8, 0.0)).sum(axis=1)
+    total = (row_keys != _PAD).sum(axis=1)
+
+    out = np.zeros(len(row_keys), dtype=np.float64)
+    np.divide(matched, total, out=out, where=total > 0, casting="unsafe")
+    return out
+
+
+if HAS_NUMBA:
+    @njit(
+        "float64[:](uint64[:], uint64[:], uint64[:], uint64[:,:], uint64[:,:], uint64[:,:])",
+        cache=True, nogil=True, parallel=True
+    )
+    def _score_numba(op_keys, op_exact, op_lower, row_keys, row_exact, row_lower):
+        """编译后的逐行评分，按行并行并释放GIL"""
+        n_rows, width = row_keys.shape
+        out = np.zeros(n_rows, dtype=np.float64)
+
+        for i in prange(n_rows):
+            total = 0
+            matched = 0.0
+            for j in range(width):
+                key = row_keys[i, j]
+                if key == 0:
+                    break
+                total += 1
+                for t in range(op_keys.shape[0]):
+                    if op_keys[t] == key:
+                        if op_exact[t] == row_exact[i, j]:
+                            matched += 1.0
+                        elif op_lower[t] == row_lower[i, j]:
+                            matched += 0.8
+                        break
+            if total > 0:
+                out[i] = matched / total
+
+        return out
+
+
+def score_patterns(
+    operation_params: Dict[str, Any],
+    row_keys: np.ndarray,
+    row_exact: np.ndarray,
+    row_lower: np.ndarray
+) -> np.ndarray:
+    """
+    计算操作参数与每条候选模式的匹配置信度
+
+    键相同且值相等记1分，仅忽略大小写相等记0.8分，按模式键数归一化。
+
+    Args:
+        operation_params: 当前操作参数
+        row_keys: 候选模式键哈希 (行, 键)
+        row_exact: 候选模式精确值哈希
+        row_lower: 候选模式小写值哈希
+
+    Returns:
+        每行置信度 (float64，与Python浮点运算结果一致)
+    """
+    op_keys, op_exact, op_lower = encode_pattern(operation_params)
+
+    if HAS_NUMBA and len(row_keys) >= NUMBA_MIN_ROWS:
+        return _score_numba(op_keys, op_exact, op_lower, row_keys, row_exact, row_lower)
+    return _score_numpy(op_keys, op_exact, op_lower, row_keys, row_exact, row_lower)
@@ -10,13 +10,78 @@ import threading
 from datetime import datetime
 from typing import Any, Dict, List, Optional, Tuple
 
-from sqlalchemy import text
+from sqlalchemy import Row, text
 from sqlalchemy.orm import Session
 
 from ..common.logger import get_logger
+from .error_firewall_scoring import (
+    blob_to_pattern,
+    encode_pattern,
+    match_tokens,
+    pattern_to_blob,
+    score_patterns,
+    stack_patterns,
+)
+
+try:
+    from .websocket_service import notify_channel as _notify_channel, Channels as _Channels
+    _WS_AVAILABLE = True
+except ImportError:
+    _WS_AVAILABLE = False
 
 logger = get_logger(__name__)
 
+# 热路径SQL在模块加载时构造一次，请求期间复用同一语句对象，
+# 命中SQLAlchemy编译缓存，省去每次调用的文本解析与缓存键构建
+_Q_FIND_BY_TYPE = text("""
+    SELECT id, error_id, error_type, error_scene, error_pattern, pattern_hash_blob,
+           solution, solution_confidence, block_level, auto_fix
+    FROM error_records
+    WHERE error_type = :error_type
+      AND block_level != 'none'
+      AND (pattern_key_hashes IS NULL
+           OR JSON_OVERLAPS(pattern_key_hashes->'$', CAST(:op_key_hashes AS JSON)))
+""")
+
+_Q_ERROR_EXISTS = text("SELECT 1 FROM error_records WHERE error_id = :error_id")
+
+_Q_INSERT_INTERCEPT_LOG = text("""
+    INSERT INTO error_intercept_logs (
+        error_record_id, intercept_type, intercept_action,
+        operation_type, operation_params, match_confidence,
+        session_id
+    ) VALUES (
+        :error_record_id, :intercept_type, :intercept_action,
+        :operation_type, :operation_params, :match_confidence,
+        :session_id
+    )
+""")
+
+# VALUES 中只能出现占位符 (不能含 NOW() 等字面量)，PyMySQL 的 executemany
+# 才会把整批参数改写为一条多行 VALUES 语句，否则退化为逐行往返
+_Q_UPSERT_ERROR_BULK = text("""
+    INSERT INTO error_records (
+        error_id, error_type, error_scene, error_pattern,
+        error_message, solution, solution_confidence,
+        block_level, auto_fix, project_id, created_by,
+        pattern_key_hashes, pattern_hash_blob, last_occurred_at
+    ) VALUES (
+        :error_id, :error_type, :error_scene, :error_pattern,
+        :error_message, :solution, :solution_confidence,
+        :block_level, :auto_fix, :project_id, :created_by,
+        :pattern_key_hashes, :pattern_hash_blob, :now
+    )
+    ON DUPLICATE KEY UPDATE
+        occurrence_count = occurrence_count + 1,
+        last_occurred_at = VALUES(last_occurred_at)
+""")
+
+_Q_INCREMENT_BLOCKED = text("""
+    UPDATE error_records
+    SET blocked_count = blocked_count + 1
+    WHERE id = :id
+""")
+
 
 class ErrorFirewallService:
     """错误防火墙核心服务"""
@@ -71,8 +136,7 @@ class ErrorFirewallService:
             error_id = self._generate_error_id(error_type, error_pattern)
 
             # 检查是否已存在
-            existing = self.get_error_by_id(error_id)
-            if existing:
+            if self._error_exists(error_id):
                 # 更新发生次数
                 return self._update_error_occurrence(error_id)
 
@@ -82,12 +146,12 @@ class ErrorFirewallService:
                     error_id, error_type, error_scene, error_pattern,
                     error_message, solution, solution_confidence,
                     block_level, auto_fix, project_id, created_by,
-                    last_occurred_at
+                    pattern_key_hashes, pattern_hash_blob, last_occurred_at
                 ) VALUES (
                     :error_id, :error_type, :error_scene, :error_pattern,
                     :error_message, :solution, :solution_confidence,
                     :block_level, :auto_fix, :project_id, :created_by,
-                    NOW()
+                    :pattern_key_hashes, :pattern_hash_blob, NOW()
                 )
             """)
 
@@ -96,6 +160,8 @@ class ErrorFirewallService:
                 "error_type": error_type,
                 "error_scene": error_scene,
                 "error_pattern": json.dumps(error_pattern, ensure_ascii=False),
+                "pattern_key_hashes": json.dumps(self._pattern_key_hashes(error_pattern)),
+                "pattern_hash_blob": pattern_to_blob(error_pattern),
                 "error_message": error_message,
                 "solution": solution,
                 "solution_confidence": solution_confidence,
@@ -129,6 +195,73 @@ class ErrorFirewallService:
                 "error": str(e)
             }
 
+    def record_errors_bulk(
+        self,
+        errors: List[Dict[str, Any]],
+        batch_size: int = 1000
+    ) -> Dict[str, Any]:
+        """
+        批量记录错误 (供CI、爬虫等批处理管道使用)
+
+        每条记录的字段与 record_error 的参数一致。已存在的错误只累加
+        发生次数，由 ON DUPLICATE KEY UPDATE 在同一条语句内完成，
+        整批仅需一次解析、按 batch_size 分页发送多行 VALUES。
+
+        Args:
+            errors: 错误记录列表
+            batch_size: 每批发送的行数
+
+        Returns:
+            记录结果
+        """
+        if not errors:
+            return {"success": True, "count": 0, "error_ids": []}
+
+        try:
+            # 整批共用一个发生时间
+            now = datetime.now()
+
+            # 在进入数据库调用前完成哈希与序列化，保持发送循环紧凑
+            rows = [
+                {
+                    "error_id": self._generate_error_id(e["error_type"], e["error_pattern"]),
+                    "error_type": e["error_type"],
+                    "error_scene": e["error_scene"],
+                    "error_pattern": json.dumps(e["error_pattern"], ensure_ascii=False),
+                    "pattern_key_hashes": json.dumps(self._pattern_key_hashes(e["error_pattern"])),
+                    "pattern_hash_blob": pattern_to_blob(e["error_pattern"]),
+                    "error_message": e["error_message"],
+                    "solution": e.get("solution"),
+                    "solution_confidence": e.get("solution_confidence", 0.0),
+                    "block_level": e.get("block_level", "warning"),
+                    "auto_fix": e.get("auto_fix", False),
+                    "project_id": e.get("project_id"),
+                    "created_by": e.get("created_by"),
+                    "now": now
+                }
+                for e in errors
+            ]
+
+            for start in range(0, len(rows), batch_size):
+                self.db_session.execute(_Q_UPSERT_ERROR_BULK, rows[start:start + batch_size])
+            self.db_session.commit()
+
+            logger.info("批量记录错误完成", extra={"count": len(rows)})
+
+            return {
+                "success": True,
+                "count": len(rows),
+                "error_ids": [row["error_id"] for row in rows]
+            }
+
+        except Exception as e:
+            self.db_session.rollback()
+            logger.error(f"批量记录错误失败: {e}")
+            return {
+                "success": False,
+                "error": str(e)
+            }
+
     def get_error_by_id(self, error_id: str) -> Optional[Dict[str, Any]]:
         """
         根据错误ID获取错误记录
@@ -153,6 +286,12 @@ class ErrorFirewallService:
             logger.error(f"获取错误记录失败: {e}")
             return None
 
+    def _error_exists(self, error_id: str) -> bool:
+        """检查错误记录是否存在 (只取主键，不物化整行)"""
+        return self.db_session.execute(
+            _Q_ERROR_EXISTS, {"error_id": error_id}
+        ).first() is not None
+
     def _update_error_occurrence(self, error_id: str) -> Dict[str, Any]:
         """更新错误发生次数"""
         try:
@@ -216,29 +355,29 @@ class ErrorFirewallService:
                 }
 
             # 获取最高置信度的匹配
-            best_match = max(matches, key=lambda x: x["match_confidence"])
+            best_match, confidence = max(matches, key=lambda x: x[1])
 
             # 判断是否拦截
-            should_block = best_match["block_level"] == "block"
-            should_warn = best_match["block_level"] == "warning"
+            should_block = best_match.block_level == "block"
+            should_warn = best_match.block_level == "warning"
 
             # 记录拦截日志
             self._log_intercept(
-                error_record_id=best_match["id"],
+                error_record_id=best_match.id,
                 intercept_type="before",
                 intercept_action="blocked" if should_block else ("warned" if should_warn else "passed"),
                 operation_type=operation_type,
                 operation_params=operation_params,
-                match_confidence=best_match["match_confidence"],
+                match_confidence=confidence,
                 session_id=session_id
             )
 
             # 推送WebSocket通知
             if should_block or should_warn:
                 self._notify_error_intercepted(
-                    best_match["error_id"],
+                    best_match.error_id,
                     operation_type,
-                    best_match["solution"],
+                    best_match.solution,
                     "blocked" if should_block else "warned"
                 )
 
@@ -247,15 +386,15 @@ class ErrorFirewallService:
                 "should_warn": should_warn,
                 "risk_level": "high" if should_block else ("medium" if should_warn else "low"),
                 "matched_error": {
-                    "error_id": best_match["error_id"],
-                    "error_type": best_match["error_type"],
-                    "error_scene": best_match["error_scene"],
-                    "match_confidence": best_match["match_confidence"]
+                    "error_id": best_match.error_id,
+                    "error_type": best_match.error_type,
+                    "error_scene": best_match.error_scene,
+                    "match_confidence": confidence
                 },
-                "solution": best_match["solution"],
-                "solution_confidence": best_match["solution_confidence"],
-                "auto_fix_available": best_match["auto_fix"],
-                "message": f"⚠️ 检测到历史错误: {best_match['error_scene']}" if (should_block or should_warn) else "操作已通过检查"
+                "solution": best_match.solution,
+                "solution_confidence": best_match.solution_confidence,
+                "auto_fix_available": best_match.auto_fix,
+                "message": f"⚠️ 检测到历史错误: {best_match.error_scene}" if (should_block or should_warn) else "操作已通过检查"
             }
 
         except Exception as e:
@@ -270,7 +409,7 @@ class ErrorFirewallService:
         self,
         operation_type: str,
         operation_params: Dict[str, Any]
-    ) -> List[Dict[str, Any]]:
+    ) -> List[Tuple[Row, float]]:
         """
         查找匹配的历史错误
 
@@ -279,71 +418,45 @@ class ErrorFirewallService:
             operation_params: 操作参数
 
         Returns:
-            匹配的错误列表 (带置信度)
+            匹配的 (错误记录行, 置信度) 列表，字段按属性访问
         """
         try:
+            # 置信度>0.5至少需要一个键值匹配，先用键值哈希重叠预筛候选行；
+            # 旧记录未回填哈希时(NULL)仍参与完整评分
+            op_key_hashes = self._pattern_key_hashes(operation_params)
+            if not op_key_hashes:
+                return []
+
             # 查询同类型的错误
-            query = text("""
-                SELECT id, error_id, error_type, error_scene, error_pattern,
-                       solution, solution_confidence, block_level, auto_fix
-                FROM error_records
-                WHERE error_type = :error_type
-                  AND block_level != 'none'
-            """)
             results = self.db_session.execute(
-                query, {"error_type": operation_type}
+                _Q_FIND_BY_TYPE, {
+                    "error_type": operation_type,
+                    "op_key_hashes": json.dumps(op_key_hashes)
+                }
             ).fetchall()
 
-            matches = []
-            for row in results:
-                record = dict(row._mapping)
-                stored_pattern = json.loads(record["error_pattern"])
-
-                # 计算特征匹配度
-                confidence = self._calculate_match_confidence(
-                    operation_params, stored_pattern
-                )
+            if not results:
+                return []
 
-                if confidence > 0.5:  # 置信度阈值
-                    record["match_confidence"] = confidence
-                    matches.append(record)
+            # 计算特征匹配度 (所有候选一次性批量评分)
+            # 优先读取预编码的哈希BLOB，仅旧记录回退到JSON解析
+            row_keys, row_exact, row_lower = stack_patterns([
+                blob_to_pattern(row.pattern_hash_blob) if row.pattern_hash_blob
+                else encode_pattern(json.loads(row.error_pattern))
+                for row in results
+            ])
+            confidences = score_patterns(operation_params, row_keys, row_exact, row_lower)
 
-            return matches
+            return [
+                (row, confidence)
+                for row, confidence in zip(results, confidences.tolist())
+                if confidence > 0.5  # 置信度阈值
+            ]
 
         except Exception as e:
             logger.error(f"查找匹配错误失败: {e}")
             return []
 
-    def _calculate_match_confidence(
-        self,
-        operation_params: Dict[str, Any],
-        stored_pattern: Dict[str, Any]
-    ) -> float:
-        """
-        计算操作与存储模式的匹配置信度
-
-        Args:
-            operation_params: 当前操作参数
-            stored_pattern: 存储的错误模式
-
-        Returns:
-            置信度 (0-1)
-        """
-        if not stored_pattern:
-            return 0.0
-
-        matched_keys = 0
-        total_keys = len(stored_pattern)
-
-        for key, value in stored_pattern.items():
-            if key in operation_params:
-                if operation_params[key] == value:
-                    matched_keys += 1
-                elif str(operation_params[key]).lower() == str(value).lower():
-                    matched_keys += 0.8
-
-        return matched_keys / total_keys if total_keys > 0 else 0.0
-
     # ============================================
     # 拦截日志
     # ============================================
@@ -358,20 +471,9 @@ class ErrorFirewallService:
         match_confidence: float,
         session_id: Optional[str] = None
     ):
-        """记录拦截日志"""
+        """记录拦截日志 (拦截计数与日志在同一事务内提交)"""
         try:
-            query = text("""
-                INSERT INTO error_intercept_logs (
-                    error_record_id, intercept_type, intercept_action,
-                    operation_type, operation_params, match_confidence,
-                    session_id
-                ) VALUES (
-                    :error_record_id, :intercept_type, :intercept_action,
-                    :operation_type, :operation_params, :match_confidence,
-                    :session_id
-                )
-            """)
-            self.db_session.execute(query, {
+            self.db_session.execute(_Q_INSERT_INTERCEPT_LOG, {
                 "error_record_id": error_record_id,
                 "intercept_type": intercept_type,
                 "intercept_action": intercept_action,
@@ -380,29 +482,16 @@ class ErrorFirewallService:
                 "match_confidence": match_confidence,
                 "session_id": session_id
             })
-            self.db_session.commit()
 
             # 更新拦截计数
             if intercept_action == "blocked":
-                self._update_blocked_count(error_record_id)
+                self.db_session.execute(_Q_INCREMENT_BLOCKED, {"id": error_record_id})
 
-        except Exception as e:
-            self.db_session.rollback()
-            logger.error(f"记录拦截日志失败: {e}")
-
-    def _update_blocked_count(self, error_record_id: int):
-        """更新错误的拦截计数"""
-        try:
-            query = text("""
-                UPDATE error_records
-                SET blocked_count = blocked_count + 1
-                WHERE id = :id
-            """)
-            self.db_session.execute(query, {"id": error_record_id})
             self.db_session.commit()
+
         except Exception as e:
             self.db_session.rollback()
-            logger.error(f"更新拦截计数失败: {e}")
+            logger.error(f"记录拦截日志失败: {e}")
 
     # ============================================
     # 统计查询
@@ -547,6 +636,28 @@ class ErrorFirewallService:
         content = f"{error_type}:{sorted_pattern}"
         return hashlib.md5(content.encode()).hexdigest()
 
+    @staticmethod
+    def _pattern_key_hashes(pattern: Dict[str, Any]) -> List[int]:
+        """
+        计算模式中每个键值对的63位哈希，用于索引预筛
+
+        每个键值对分别按精确比较标记 (数值统一为float，30 / 30.0 / True==1)
+        和小写字符串各生成一个哈希，评分中精确或忽略大小写相等的键值对
+        至少共享一个哈希，因此预筛不会漏掉可匹配的记录。
+
+        Args:
+            pattern: 错误模式或操作参数
+
+        Returns:
+            去重后的哈希列表
+        """
+        hashes = set()
+        for key, value in pattern.items():
+            for token in match_tokens(value):
+                digest = hashlib.blake2b(f"{key}={token}".encode(), digest_size=8).digest()
+                hashes.add(int.from_bytes(digest, "big") & 0x7FFFFFFFFFFFFFFF)
+        return sorted(hashes)
+
     # ============================================
     # WebSocket通知
     # ============================================
@@ -559,33 +670,31 @@ class ErrorFirewallService:
         solution: Optional[str]
     ):
         """推送错误记录通知"""
-        try:
-            from .websocket_service import notify_channel, Channels
-
-            def async_notify():
-                try:
-                    loop = asyncio.new_event_loop()
-                    asyncio.set_event_loop(loop)
-                    loop.run_until_complete(
-                        notify_channel(
-                            Channels.ERROR_FIREWALL,
-                            "error_recorded",
-                            {
-                                "error_id": error_id,
-                                "error_type": error_type,
-                                "error_scene": error_scene,
-                                "solution": solution,
-                                "status": "recorded"
-                            }
-                        )
+        if not _WS_AVAILABLE:
+            return
+
+        def async_notify():
+            try:
+                loop = asyncio.new_event_loop()
+                asyncio.set_event_loop(loop)
+                loop.run_until_complete(
+                    _notify_channel(
+                        _Channels.ERROR_FIREWALL,
+                        "error_recorded",
+                        {
+                            "error_id": error_id,
+                            "error_type": error_type,
+                            "error_scene": error_scene,
+                            "solution": solution,
+                            "status": "recorded"
+                        }
                     )
-                    loop.close()
-                except Exception as e:
-                    logger.debug(f"WebSocket推送失败: {e}")
+                )
+                loop.close()
+            except Exception as e:
+                logger.debug(f"WebSocket推送失败: {e}")
 
-            threading.Thread(target=async_notify, daemon=True).start()
-        except ImportError:
-            pass
+        threading.Thread(target=async_notify, daemon=True).start()
 
     def _notify_error_intercepted(
         self,
@@ -595,45 +704,47 @@ class ErrorFirewallService:
         action: str
     ):
         """推送错误拦截通知"""
-        try:
-            from .websocket_service import notify_channel, Channels
-
-            def async_notify():
-                try:
-                    loop = asyncio.new_event_loop()
-                    asyncio.set_event_loop(loop)
-                    loop.run_until_complete(
-                        notify_channel(
-                            Channels.ERROR_FIREWALL,
-                            "error_intercepted",
-                            {
-                                "error_id": error_id,
-                                "operation_type": operation_type,
-                                "solution": solution,
-                                "action": action,
-                                "status": "intercepted"
-                            }
-                        )
+        if not _WS_AVAILABLE:
+            return
+
+        def async_notify():
+            try:
+                loop = asyncio.new_event_loop()
+                asyncio.set_event_loop(loop)
+                loop.run_until_complete(
+                    _notify_channel(
+                        _Channels.ERROR_FIREWALL,
+                        "error_intercepted",
+                        {
+                            "error_id": error_id,
+                            "operation_type": operation_type,
+                            "solution": solution,
+                            "action": action,
+                            "status": "intercepted"
+                        }
                     )
-                    loop.close()
-                except Exception as e:
-                    logger.debug(f"WebSocket推送失败: {e}")
+                )
+                loop.close()
+            except Exception as e:
+                logger.debug(f"WebSocket推送失败: {e}")
 
-            threading.Thread(target=async_notify, daemon=True).start()
-        except ImportError:
-            pass
+        threading.Thread(target=async_notify, daemon=True).start()
 
 
 # ============================================
 # 单例模式
 # ============================================
 _error_firewall_instance: Optional[ErrorFirewallService] = None
+_init_lock = threading.Lock()
 
 
 def get_error_firewall_service(db_session: Session = None) -> ErrorFirewallService:
     """
     获取错误防火墙服务单例
 
+    初始化完成后走无锁快速路径；首次创建时使用双重检查锁，
+    避免并发冷启动时构造出两个实例。
+
     Args:
         db_session: 数据库会话
 
@@ -642,9 +753,13 @@ def get_error_firewall_service(db_session: Session = None) -> ErrorFirewallServi
     """
     global _error_firewall_instance
 
-    if _error_firewall_instance is None:
-        if db_session is None:
-            raise ValueError("首次创建错误防火墙服务需要提供db_session")
-        _error_firewall_instance = ErrorFirewallService(db_session)
+    instance = _error_firewall_instance
+    if instance is not None:
+        return instance
 
-    return _error_firewall_instance
+    with _init_lock:
+        if _error_firewall_instance is None:
+            if db_session is None:
+                raise ValueError("首次创建错误防火墙服务需要提供db_session")
+            _error_firewall_instance = ErrorFirewallService(db_session)
+        return _error_firewall_instance
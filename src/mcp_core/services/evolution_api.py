@@ -3,15 +3,43 @@
 提供学习系统、图谱生成、协同控制的HTTP接口
 """
 
-from fastapi import APIRouter, HTTPException, BackgroundTasks, Depends, status
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, HTTPException, Depends, Header, Query, status
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel, Field
-from typing import List, Dict, Any, Optional
+from sqlalchemy import text
+from typing import List, Dict, Any, Iterator, Optional, Tuple
 from datetime import datetime
+from itertools import chain
 import asyncio
+import time
+
+import numpy as np
+
+try:
+    import orjson  # noqa: F401  (列式输出的numpy数组由orjson直接序列化)
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+try:
+    import zstandard
+    HAS_ZSTD = True
+except ImportError:
+    HAS_ZSTD = False
 
 from ..services.learning_system import get_learning_system, CodingSession
 from ..services.graph_generator import get_graph_generator
+from ..services.graph_worker import (
+    CACHE_RAW,
+    CACHE_ZSTD,
+    generate_graph_job,
+    get_graph_worker_pool,
+    graph_cache_key,
+    graph_etag_key,
+    graph_stats_key,
+    json_dumps,
+    shutdown_graph_worker_pool,
+)
 from ..services.collaboration_controller import (
     get_collaboration_controller,
     AIAgent,
@@ -24,8 +52,236 @@ from ..common.logger import get_logger
 
 logger = get_logger(__name__)
 
+class FastJSONResponse(JSONResponse):
+    """使用 json_dumps 渲染的JSON响应 (orjson可用时替代标准库json)"""
+
+    def render(self, content: Any) -> bytes:
+        return json_dumps(content)
+
+
 # 创建路由器
-router = APIRouter(prefix="/api/evolution", tags=["evolution"])
+router = APIRouter(
+    prefix="/api/evolution",
+    tags=["evolution"],
+    default_response_class=FastJSONResponse
+)
+
+# 服务关闭时停止图谱生成进程 (进程退出时另由 atexit 兜底)
+router.add_event_handler("shutdown", shutdown_graph_worker_pool)
+
+# 锁类型/级别按值查找表 (避免每次请求走 Enum.__call__)
+_LOCK_TYPES = {member.value: member for member in LockType}
+_LOCK_LEVELS = {member.value: member for member in LockLevel}
+
+# acquire_lock 成功响应体模板，各槽位填入已编码的JSON值
+_LOCK_ACQUIRED_TEMPLATE = (
+    b'{"success":true,"lock_id":%b,"status":%b,"acquired_at":%b,"expires_at":%b}'
+)
+
+
+# ============================================
+# 预编译查询 (显式列并在SQL中重命名为响应字段，避免 SELECT * 与逐字段改名)
+# ============================================
+
+# (响应字段, 数据库列)
+_NODE_COLUMNS = (
+    ("id", "node_id"), ("type", "node_type"), ("name", "node_name"),
+    ("path", "node_path"), ("complexity", "complexity_score"),
+    ("importance", "importance_score"), ("x", "layout_x"), ("y", "layout_y"),
+    ("cluster", "cluster_id")
+)
+_EDGE_COLUMNS = (
+    ("id", "edge_id"), ("source", "source_node_id"), ("target", "target_node_id"),
+    ("type", "edge_type"), ("weight", "weight")
+)
+_NUMERIC_FIELDS = frozenset({"complexity", "importance", "x", "y", "weight"})
+
+_Q_GRAPH_NODES = text(
+    f"SELECT {', '.join(f'{c} AS `{name}`' for name, c in _NODE_COLUMNS)} "
+    "FROM graph_nodes WHERE project_id = :project_id"
+)
+_Q_GRAPH_EDGES = text(
+    f"SELECT {', '.join(f'{c} AS `{name}`' for name, c in _EDGE_COLUMNS)} "
+    "FROM graph_edges WHERE project_id = :project_id"
+)
+_Q_GRAPH_EXISTS = text("SELECT 1 FROM graph_nodes WHERE project_id = :project_id LIMIT 1")
+# node_id 为主键，无需 DISTINCT；由 idx_project_type_scores 覆盖，仅扫描索引
+_Q_GRAPH_STATISTICS = text("""
+    SELECT
+        COUNT(*) as total_nodes,
+        COUNT(CASE WHEN node_type = 'class' THEN 1 END) as class_count,
+        COUNT(CASE WHEN node_type = 'function' THEN 1 END) as function_count,
+        AVG(complexity_score) as avg_complexity,
+        MAX(importance_score) as max_importance
+    FROM graph_nodes
+    WHERE project_id = :project_id
+""")
+_Q_PROJECT_EXPERIENCES = text("""
+    SELECT
+        experience_id,
+        context_type,
+        problem_description,
+        solution_description,
+        reusability_score,
+        success_rate,
+        time_spent,
+        created_at
+    FROM coding_experiences
+    WHERE project_id = :project_id
+    ORDER BY reusability_score DESC, created_at DESC
+    LIMIT :limit
+""")
+
+
+def _fetch_rows_sync(graph_generator, stmt, params: Dict[str, Any]) -> List[Any]:
+    """在独立会话(连接)中执行查询，供线程池调用"""
+    with graph_generator.SessionLocal() as session:
+        return session.execute(stmt, params).fetchall()
+
+
+async def _fetch_rows(graph_generator, stmt, params: Dict[str, Any]) -> List[Any]:
+    """
+    执行只读查询而不阻塞事件循环
+
+    优先使用异步驱动会话；不可用时在线程池中执行同步查询。
+    """
+    if graph_generator.AsyncSessionLocal is not None:
+        async with graph_generator.AsyncSessionLocal() as session:
+            return (await session.execute(stmt, params)).fetchall()
+
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, _fetch_rows_sync, graph_generator, stmt, params)
+
+
+# 流式读取时每批从服务端游标拉取的行数
+_STREAM_YIELD_PER = 1000
+
+
+def _stream_rows(session, stmt, project_id: str) -> Iterator[bytes]:
+    """通过服务端游标分批读取，每批编码为逗号分隔的JSON片段 (列名即响应字段)"""
+    result = session.execute(
+        stmt,
+        {"project_id": project_id},
+        execution_options={"stream_results": True, "yield_per": _STREAM_YIELD_PER}
+    )
+    first = True
+    for partition in result.mappings().partitions():
+        chunk = b",".join(json_dumps(dict(mapping)) for mapping in partition)
+        yield chunk if first else b"," + chunk
+        first = False
+
+
+def _stream_project_graph(graph_generator, project_id: str) -> Iterator[bytes]:
+    """
+    以流式JSON输出项目图谱，内存占用受 yield_per 限制
+
+    输出字段与缓存命中时一致: {"project_id", "graph": {"nodes", "edges"}, "success"}
+    首批节点在输出任何内容之前读取，调用方先取出第一个片段，查询失败时仍可返回500；
+    已开始输出后出错则闭合已打开的数组，以 "success": false 与 "error" 结尾，不留下截断的JSON
+    """
+    with graph_generator.SessionLocal() as session:
+        nodes = _stream_rows(session, _Q_GRAPH_NODES, project_id)
+        first = next(nodes, b"")
+        yield b'{"project_id":' + json_dumps(project_id) + b',"graph":{"nodes":[' + first
+        try:
+            yield from nodes
+            yield b'],"edges":['
+            yield from _stream_rows(session, _Q_GRAPH_EDGES, project_id)
+            yield b']},"success":true}'
+        except Exception as e:
+            logger.error(f"流式输出图谱中断: {project_id}: {e}")
+            yield b']},"success":false,"error":' + json_dumps(str(e)) + b'}'
+
+
+def _rows_to_columns(rows: List[Any], columns) -> Dict[str, Any]:
+    """
+    将行转置为列 (SoA)，不为每行构造字典
+
+    数值列转为float64数组由orjson直接序列化 (NULL -> NaN -> null)，其余列保持元组。
+    """
+    fields = [name for name, _ in columns]
+    cols = list(zip(*rows)) if rows else [() for _ in fields]
+
+    data = {}
+    for name, values in zip(fields, cols):
+        if HAS_ORJSON and name in _NUMERIC_FIELDS:
+            data[name] = np.array(values, dtype=np.float64)
+        else:
+            data[name] = values
+    return data
+
+
+async def _fetch_graph_columns(graph_generator, project_id: str) -> Dict[str, Any]:
+    """并发读取节点与边并组装列式图谱 {"nodes": {字段: 列}, "edges": {字段: 列}}"""
+    params = {"project_id": project_id}
+    node_rows, edge_rows = await asyncio.gather(
+        _fetch_rows(graph_generator, _Q_GRAPH_NODES, params),
+        _fetch_rows(graph_generator, _Q_GRAPH_EDGES, params)
+    )
+    return {
+        "nodes": _rows_to_columns(node_rows, _NODE_COLUMNS),
+        "edges": _rows_to_columns(edge_rows, _EDGE_COLUMNS)
+    }
+
+
+def _split_graph_cache(data: bytes) -> Tuple[bool, bytes]:
+    """
+    拆分缓存值
+
+    Returns:
+        (是否zstd压缩, 内容)
+    """
+    tag, content = data[:1], data[1:]
+    if tag == CACHE_ZSTD:
+        return True, content
+    if tag == CACHE_RAW:
+        return False, content
+    return False, data  # 无标记的旧缓存
+
+
+def _graph_etag_header(etag: Optional[bytes]) -> Optional[Dict[str, str]]:
+    """ETag响应头 (弱校验，同一内容的压缩/未压缩表示共用)"""
+    if not etag:
+        return None
+    return {"ETag": f'W/"{etag.decode()}"', "Vary": "Accept-Encoding"}
+
+
+def _etag_matches(if_none_match: Optional[str], etag: Optional[bytes]) -> bool:
+    """If-None-Match 是否命中当前ETag"""
+    if not if_none_match or not etag:
+        return False
+    current = f'"{etag.decode()}"'
+    return any(
+        tag.strip().removeprefix("W/") in (current, "*")
+        for tag in if_none_match.split(",")
+    )
+
+
+# 统计字段及其类型，Hash中统一以字符串存储
+_STAT_FIELDS = (
+    ("total_nodes", int), ("class_count", int), ("function_count", int),
+    ("avg_complexity", float), ("max_importance", float)
+)
+
+
+def _decode_graph_statistics(raw: Dict[bytes, bytes]) -> Optional[Dict[str, Any]]:
+    """解码 HGETALL 结果，字段不全时视为未命中"""
+    stats = {}
+    for name, cast in _STAT_FIELDS:
+        value = raw.get(name.encode())
+        if value is None:
+            return None
+        stats[name] = cast(value.decode())
+    return stats
+
+
+def _log_graph_job_result(future) -> None:
+    """记录后台图谱生成结果"""
+    try:
+        logger.info(f"图谱生成完成: {future.result()}")
+    except Exception as e:
+        logger.error(f"图谱生成失败: {e}")
+
 
 # ============================================
 # 请求/响应模型
@@ -125,7 +381,7 @@ async def learn_from_session(request: LearnFromSessionRequest):
         # 执行学习
         result = learning_system.learn_from_session(session)
 
-        return JSONResponse(
+        return FastJSONResponse(
             status_code=status.HTTP_200_OK,
             content={
                 "success": True,
@@ -170,7 +426,7 @@ async def get_coding_suggestions(request: GetSuggestionsRequest):
                 "reasoning": suggestion.reasoning
             })
 
-        return JSONResponse(
+        return FastJSONResponse(
             status_code=status.HTTP_200_OK,
             content={
                 "success": True,
@@ -194,38 +450,25 @@ async def get_project_experiences(project_id: str, limit: int = 100):
 
         with learning_system.SessionLocal() as session:
             result = session.execute(
-                """
-                SELECT
-                    experience_id,
-                    context_type,
-                    problem_description,
-                    solution_description,
-                    reusability_score,
-                    success_rate,
-                    time_spent,
-                    created_at
-                FROM coding_experiences
-                WHERE project_id = :project_id
-                ORDER BY reusability_score DESC, created_at DESC
-                LIMIT :limit
-                """,
+                _Q_PROJECT_EXPERIENCES,
                 {"project_id": project_id, "limit": limit}
             )
 
             experiences = []
-            for row in result:
+            for (experience_id, context_type, problem, solution,
+                 reusability, success_rate, time_spent, created_at) in result:
                 experiences.append({
-                    "id": row.experience_id,
-                    "type": row.context_type,
-                    "problem": row.problem_description,
-                    "solution": row.solution_description,
-                    "reusability": row.reusability_score,
-                    "success_rate": row.success_rate,
-                    "time_spent": row.time_spent,
-                    "created_at": row.created_at.isoformat() if row.created_at else None
+                    "id": experience_id,
+                    "type": context_type,
+                    "problem": problem,
+                    "solution": solution,
+                    "reusability": reusability,
+                    "success_rate": success_rate,
+                    "time_spent": time_spent,
+                    "created_at": created_at.isoformat() if created_at else None
                 })
 
-        return JSONResponse(
+        return FastJSONResponse(
             status_code=status.HTTP_200_OK,
             content={
                 "success": True,
@@ -247,39 +490,22 @@ async def get_project_experiences(project_id: str, limit: int = 100):
 # ============================================
 
 @router.post("/graph/generate")
-async def generate_project_graph(
-    request: GenerateGraphRequest,
-    background_tasks: BackgroundTasks
-):
+async def generate_project_graph(request: GenerateGraphRequest):
     """生成项目知识图谱"""
     try:
-        graph_generator = get_graph_generator()
-
-        # 配置生成器
-        graph_generator.max_depth = request.max_depth
-        graph_generator.min_importance = request.min_importance
-
-        # 在后台生成图谱(可能耗时)
-        def generate_graph_task():
-            try:
-                graph, visualization = graph_generator.generate_graph(
-                    request.project_path,
-                    request.project_id
-                )
-                # 存储结果到Redis
-                import json
-                graph_generator.redis_client.set(
-                    f"graph:{graph.project_id}",
-                    json.dumps(visualization),
-                    ex=86400  # 缓存24小时
-                )
-                logger.info(f"图谱生成完成: {graph.project_id}")
-            except Exception as e:
-                logger.error(f"图谱生成失败: {e}")
-
-        background_tasks.add_task(generate_graph_task)
+        # 在独立进程中生成图谱(CPU密集)，不占用API进程的事件循环与线程
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(
+            get_graph_worker_pool(),
+            generate_graph_job,
+            request.project_path,
+            request.project_id,
+            request.max_depth,
+            request.min_importance
+        )
+        future.add_done_callback(_log_graph_job_result)
 
-        return JSONResponse(
+        return FastJSONResponse(
             status_code=status.HTTP_202_ACCEPTED,
             content={
                 "success": True,
@@ -296,86 +522,65 @@ async def generate_project_graph(
         )
 
 @router.get("/graph/{project_id}")
-async def get_project_graph(project_id: str):
+async def get_project_graph(
+    project_id: str,
+    layout: str = Query("rows", description="rows: 节点/边对象数组; columns: 按字段的列数组"),
+    if_none_match: Optional[str] = Header(None),
+    accept_encoding: Optional[str] = Header(None)
+):
     """获取项目图谱"""
     try:
         graph_generator = get_graph_generator()
 
-        # 先从缓存获取
-        import json
-        cached = graph_generator.redis_client.get(f"graph:{project_id}")
-        if cached:
-            visualization = json.loads(cached)
-            return JSONResponse(
-                status_code=status.HTTP_200_OK,
-                content={
+        if layout == "columns":
+            # 列式输出直接读库，整张图只产生每列一个序列而非每行一个字典
+            graph = await _fetch_graph_columns(graph_generator, project_id)
+            if not len(graph["nodes"]["id"]):
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail=f"图谱不存在: {project_id}"
+                )
+            return Response(
+                content=json_dumps({
                     "success": True,
                     "project_id": project_id,
-                    "graph": visualization
-                }
+                    "layout": "columns",
+                    "graph": graph
+                }),
+                media_type="application/json"
             )
 
-        # 从数据库获取
-        with graph_generator.SessionLocal() as session:
-            # 获取节点
-            nodes_result = session.execute(
-                """
-                SELECT * FROM graph_nodes
-                WHERE project_id = :project_id
-                """,
-                {"project_id": project_id}
-            )
-
-            nodes = []
-            for row in nodes_result:
-                nodes.append({
-                    "id": row.node_id,
-                    "type": row.node_type,
-                    "name": row.node_name,
-                    "path": row.node_path,
-                    "complexity": row.complexity_score,
-                    "importance": row.importance_score,
-                    "x": row.layout_x,
-                    "y": row.layout_y,
-                    "cluster": row.cluster_id
-                })
-
-            # 获取边
-            edges_result = session.execute(
-                """
-                SELECT * FROM graph_edges
-                WHERE project_id = :project_id
-                """,
-                {"project_id": project_id}
-            )
-
-            edges = []
-            for row in edges_result:
-                edges.append({
-                    "id": row.edge_id,
-                    "source": row.source_node_id,
-                    "target": row.target_node_id,
-                    "type": row.edge_type,
-                    "weight": row.weight
-                })
-
-        if not nodes:
+        # 先从缓存获取 (内容与ETag一次MGET)
+        cached, etag = graph_generator.redis_client.client.mget(
+            graph_cache_key(project_id), graph_etag_key(project_id)
+        )
+        compressed, body = _split_graph_cache(cached) if cached else (False, None)
+        if body and (not compressed or HAS_ZSTD):
+            headers = _graph_etag_header(etag)
+            if _etag_matches(if_none_match, etag):
+                return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+            # 缓存即完整响应体，直接透传，不做JSON解码与重新编码
+            if compressed:
+                if accept_encoding and "zstd" in accept_encoding:
+                    headers = {**(headers or {}), "Content-Encoding": "zstd"}
+                else:
+                    body = zstandard.ZstdDecompressor().decompress(body)
+            return Response(content=body, media_type="application/json", headers=headers)
+
+        # 图谱不存在时需在开始流式输出之前返回404
+        exists = await _fetch_rows(graph_generator, _Q_GRAPH_EXISTS, {"project_id": project_id})
+        if not exists:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"图谱不存在: {project_id}"
             )
 
-        return JSONResponse(
-            status_code=status.HTTP_200_OK,
-            content={
-                "success": True,
-                "project_id": project_id,
-                "graph": {
-                    "nodes": nodes,
-                    "edges": edges
-                }
-            }
-        )
+        # 从数据库流式输出: 同步生成器由Starlette在线程池中迭代，不阻塞事件循环
+        # 先在线程池中取出首个片段 (含首批节点)，查询失败时在发送200之前返回500
+        stream = _stream_project_graph(graph_generator, project_id)
+        first = await asyncio.get_running_loop().run_in_executor(None, next, stream)
+        return StreamingResponse(chain((first,), stream), media_type="application/json")
 
     except HTTPException:
         raise
@@ -387,47 +592,60 @@ async def get_project_graph(project_id: str):
         )
 
 @router.get("/graph/{project_id}/statistics")
-async def get_graph_statistics(project_id: str):
+async def get_graph_statistics(
+    project_id: str,
+    if_none_match: Optional[str] = Header(None)
+):
     """获取图谱统计信息"""
     try:
         graph_generator = get_graph_generator()
 
-        with graph_generator.SessionLocal() as session:
-            result = session.execute(
-                """
-                SELECT
-                    COUNT(DISTINCT node_id) as total_nodes,
-                    COUNT(DISTINCT CASE WHEN node_type = 'class' THEN node_id END) as class_count,
-                    COUNT(DISTINCT CASE WHEN node_type = 'function' THEN node_id END) as function_count,
-                    AVG(complexity_score) as avg_complexity,
-                    MAX(importance_score) as max_importance
-                FROM graph_nodes
-                WHERE project_id = :project_id
-                """,
-                {"project_id": project_id}
-            ).first()
-
-            if not result or not result.total_nodes:
-                raise HTTPException(
-                    status_code=status.HTTP_404_NOT_FOUND,
-                    detail=f"图谱不存在: {project_id}"
-                )
+        # 优先读取生成图谱时写入的统计Hash，统计随图谱生成，沿用图谱ETag
+        pipe = graph_generator.redis_client.client.pipeline(transaction=False)
+        pipe.hgetall(graph_stats_key(project_id))
+        pipe.get(graph_etag_key(project_id))
+        raw_stats, etag = pipe.execute()
+
+        cached = _decode_graph_statistics(raw_stats)
+        if cached:
+            headers = _graph_etag_header(etag)
+            if _etag_matches(if_none_match, etag):
+                return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
 
-            return JSONResponse(
+            return FastJSONResponse(
                 status_code=status.HTTP_200_OK,
                 content={
                     "success": True,
                     "project_id": project_id,
-                    "statistics": {
-                        "total_nodes": result.total_nodes,
-                        "class_count": result.class_count,
-                        "function_count": result.function_count,
-                        "avg_complexity": float(result.avg_complexity) if result.avg_complexity else 0,
-                        "max_importance": float(result.max_importance) if result.max_importance else 0
-                    }
-                }
+                    "statistics": cached
+                },
+                headers=headers
+            )
+
+        rows = await _fetch_rows(graph_generator, _Q_GRAPH_STATISTICS, {"project_id": project_id})
+        result = rows[0] if rows else None
+
+        if not result or not result.total_nodes:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"图谱不存在: {project_id}"
             )
 
+        return FastJSONResponse(
+            status_code=status.HTTP_200_OK,
+            content={
+                "success": True,
+                "project_id": project_id,
+                "statistics": {
+                    "total_nodes": result.total_nodes,
+                    "class_count": result.class_count,
+                    "function_count": result.function_count,
+                    "avg_complexity": float(result.avg_complexity or 0.0),
+                    "max_importance": float(result.max_importance or 0.0)
+                }
+            }
+        )
+
     except HTTPException:
         raise
     except Exception as e:
@@ -457,21 +675,21 @@ async def assign_collaborative_task(request: AssignTaskRequest):
             estimated_time=request.estimated_time
         )
 
-        # 创建代理
-        agents = []
-        for agent_id in request.agent_ids:
-            agent = AIAgent(
+        # 创建并批量注册代理
+        agents = [
+            AIAgent(
                 agent_id=agent_id,
                 name=f"Agent_{agent_id}",
                 capabilities=[request.task_type]
             )
-            agents.append(agent)
-            controller.agents[agent_id] = agent
+            for agent_id in request.agent_ids
+        ]
+        controller.register_agents(agents)
 
         # 分配任务
         result = controller.assign_task(task, agents)
 
-        return JSONResponse(
+        return FastJSONResponse(
             status_code=status.HTTP_200_OK,
             content={
                 "success": result["success"],
@@ -503,8 +721,13 @@ async def acquire_lock(request: AcquireLockRequest):
         controller = get_collaboration_controller()
 
         # 转换锁类型和级别
-        lock_type = LockType(request.lock_type)
-        lock_level = LockLevel(request.lock_level)
+        lock_type = _LOCK_TYPES.get(request.lock_type)
+        lock_level = _LOCK_LEVELS.get(request.lock_level)
+        if lock_type is None or lock_level is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"无效的锁类型或级别: {request.lock_type}/{request.lock_level}"
+            )
 
         # 请求锁
         lock = controller.request_lock(
@@ -520,18 +743,15 @@ async def acquire_lock(request: AcquireLockRequest):
         )
 
         if lock:
-            return JSONResponse(
-                status_code=status.HTTP_200_OK,
-                content={
-                    "success": True,
-                    "lock_id": lock.lock_id,
-                    "status": lock.status.value,
-                    "acquired_at": lock.acquired_at.isoformat() if lock.acquired_at else None,
-                    "expires_at": lock.expires_at.isoformat() if lock.expires_at else None
-                }
+            body = _LOCK_ACQUIRED_TEMPLATE % (
+                json_dumps(lock.lock_id),
+                json_dumps(lock.status.value),
+                json_dumps(lock.acquired_at),
+                json_dumps(lock.expires_at)
             )
+            return Response(content=body, media_type="application/json")
         else:
-            return JSONResponse(
+            return FastJSONResponse(
                 status_code=status.HTTP_409_CONFLICT,
                 content={
                     "success": False,
@@ -539,6 +759,8 @@ async def acquire_lock(request: AcquireLockRequest):
                 }
             )
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"获取锁失败: {e}")
         raise HTTPException(
@@ -555,7 +777,7 @@ async def release_lock(lock_id: str):
         success = controller.release_lock(lock_id)
 
         if success:
-            return JSONResponse(
+            return FastJSONResponse(
                 status_code=status.HTTP_200_OK,
                 content={
                     "success": True,
@@ -563,7 +785,7 @@ async def release_lock(lock_id: str):
                 }
             )
         else:
-            return JSONResponse(
+            return FastJSONResponse(
                 status_code=status.HTTP_404_NOT_FOUND,
                 content={
                     "success": False,
@@ -595,7 +817,7 @@ async def check_conflicts(request: CheckConflictsRequest):
         # 检查冲突
         result = controller.prevent_conflicts(request.agent_id, intended_changes)
 
-        return JSONResponse(
+        return FastJSONResponse(
             status_code=status.HTTP_200_OK,
             content={
                 "success": True,
@@ -632,7 +854,7 @@ async def get_collaboration_progress():
         # 同步获取进度
         progress = await controller.synchronize_progress()
 
-        return JSONResponse(
+        return FastJSONResponse(
             status_code=status.HTTP_200_OK,
             content={
                 "success": True,
@@ -653,20 +875,22 @@ async def get_active_locks():
     try:
         controller = get_collaboration_controller()
 
-        locks = []
-        for lock_id, lock in controller.locks.items():
-            locks.append({
+        # datetime与Enum交由响应编码器处理 (orjson在C层格式化，结果与isoformat()一致)
+        locks = [
+            {
                 "lock_id": lock.lock_id,
                 "agent_id": lock.agent_id,
                 "resource_id": lock.resource_id,
-                "lock_type": lock.lock_type.value,
-                "status": lock.status.value,
+                "lock_type": lock.lock_type,
+                "status": lock.status,
                 "intent": lock.intent,
-                "acquired_at": lock.acquired_at.isoformat() if lock.acquired_at else None,
-                "expires_at": lock.expires_at.isoformat() if lock.expires_at else None
-            })
+                "acquired_at": lock.acquired_at,
+                "expires_at": lock.expires_at
+            }
+            for lock in controller.locks.values()
+        ]
 
-        return JSONResponse(
+        return FastJSONResponse(
             status_code=status.HTTP_200_OK,
             content={
                 "success": True,
@@ -686,31 +910,44 @@ async def get_active_locks():
 # 健康检查
 # ============================================
 
+# 健康检查结果缓存 (仅缓存健康状态): (monotonic时间, 响应体)
+HEALTH_CACHE_TTL = 1.0
+_health_cache: Tuple[float, Optional[bytes]] = (0.0, None)
+
+
 @router.get("/health")
 async def health_check():
     """健康检查"""
+    global _health_cache
+
+    # 高频探活(如k8s每秒探测)在有效期内直接返回上次编码好的响应体
+    now = time.monotonic()
+    cached_at, cached_body = _health_cache
+    if cached_body is not None and now - cached_at < HEALTH_CACHE_TTL:
+        return Response(content=cached_body, media_type="application/json")
+
     try:
         # 检查各个服务
         learning_system = get_learning_system()
         graph_generator = get_graph_generator()
         controller = get_collaboration_controller()
 
-        return JSONResponse(
-            status_code=status.HTTP_200_OK,
-            content={
-                "status": "healthy",
-                "services": {
-                    "learning_system": "ok",
-                    "graph_generator": "ok",
-                    "collaboration_controller": "ok"
-                },
-                "timestamp": datetime.now().isoformat()
-            }
-        )
+        body = json_dumps({
+            "status": "healthy",
+            "services": {
+                "learning_system": "ok",
+                "graph_generator": "ok",
+                "collaboration_controller": "ok"
+            },
+            "timestamp": datetime.now().isoformat()
+        })
+        _health_cache = (now, body)
+
+        return Response(content=body, media_type="application/json")
 
     except Exception as e:
         logger.error(f"健康检查失败: {e}")
-        return JSONResponse(
+        return FastJSONResponse(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             content={
                 "status": "unhealthy",
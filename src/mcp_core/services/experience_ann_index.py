@@ -0,0 +1,344 @@
+"""
+经验向量近似最近邻(ANN)索引
+基于FAISS，内积度量(向量归一化后等价于余弦相似度)
+
+支持三种索引类型:
+- hnsw: 查询快，构建较慢，适合规模较大且写入不频繁的语料
+- ivf:  构建只需秒级，按 nlist/nprobe 剪枝，适合频繁写入的中小语料
+- flat: 精确检索，无需训练
+"""
+
+import hashlib
+import json
+import math
+import os
+import threading
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from ..common.logger import get_logger
+
+try:
+    import faiss
+    HAS_FAISS = True
+except ImportError:
+    HAS_FAISS = False
+
+logger = get_logger(__name__)
+
+ANN_KINDS = ("hnsw", "ivf", "flat")
+
+# HNSW 参数
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 100
+HNSW_EF_SEARCH = 64
+
+# IVF 参数: 向量数达到下限后首次训练，此后每新增N条在后台重新训练
+IVF_MIN_TRAIN_SIZE = 256
+IVF_RETRAIN_INTERVAL = 1000
+
+# 重复添加的经验在索引中留下旧向量 (HNSW不支持删除)，旧向量数超过下限且占比超过该值时在后台重建压缩
+COMPACT_MIN_STALE = 64
+COMPACT_STALE_RATIO = 0.2
+
+
+def experience_faiss_id(experience_id: str) -> int:
+    """
+    经验ID -> FAISS int64 ID
+
+    使用稳定哈希 (内置 hash() 每个进程随机化，无法跨重启复用持久化的索引)
+    """
+    digest = hashlib.blake2b(experience_id.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big") & 0x7FFF_FFFF_FFFF_FFFF
+
+
+def index_kind(index) -> str:
+    """已构建索引 (IndexIDMap2) 的实际类型"""
+    base = faiss.downcast_index(index.index)
+    if isinstance(base, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(base, faiss.IndexIVF):
+        return "ivf"
+    return "flat"
+
+
+def latest_positions(ids: np.ndarray) -> np.ndarray:
+    """每个ID最后一次添加的位置 (按添加顺序)，用于去除重复添加留下的旧向量"""
+    _, last = np.unique(ids[::-1], return_index=True)
+    return np.sort(len(ids) - 1 - last)
+
+
+def ivf_params(n: int) -> Tuple[int, int]:
+    """
+    按向量数计算IVF参数
+
+    Returns:
+        (nlist, nprobe): nlist = max(2*sqrt(N), 20)，nprobe = min(nlist/4, 10)
+    """
+    nlist = min(max(int(2 * math.sqrt(n)), 20), n)
+    nprobe = max(1, min(nlist // 4, 10))
+    return nlist, nprobe
+
+
+class ExperienceANNIndex:
+    """经验向量ANN索引 (线程安全)"""
+
+    def __init__(self, index_path: str, kind: str = "hnsw"):
+        """
+        初始化索引
+
+        Args:
+            index_path: 索引文件路径，ID映射存放于同名 .ids.json
+            kind: 索引类型 hnsw / ivf / flat
+        """
+        if kind not in ANN_KINDS:
+            raise ValueError(f"不支持的ANN索引类型: {kind}")
+
+        self.index_path = index_path
+        self.ids_path = f"{index_path}.ids.json"
+        self.kind = kind
+
+        self.index = None
+        self.id_map: Dict[int, str] = {}
+        self._lock = threading.Lock()
+
+        # IVF训练状态
+        self._trained = False
+        self._inserts_since_train = 0
+        # 后台重建 (IVF训练/压缩) 进行中
+        self._training = False
+        # 重复添加留下的旧向量数 (检索时多取这么多条以保证去重后仍有k条)
+        self._stale = 0
+
+        if HAS_FAISS:
+            self.load()
+
+    @property
+    def available(self) -> bool:
+        """FAISS可用且索引非空"""
+        return self.index is not None and self.index.ntotal > 0
+
+    def __len__(self) -> int:
+        return self.index.ntotal if self.index is not None else 0
+
+    def _create_index(self, dim: int):
+        """创建初始索引 (IVF在训练前先使用精确索引承接写入)"""
+        if self.kind == "hnsw":
+            base = faiss.IndexHNSWFlat(dim, HNSW_M, faiss.METRIC_INNER_PRODUCT)
+            base.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+            base.hnsw.efSearch = HNSW_EF_SEARCH
+        else:
+            base = faiss.IndexFlatIP(dim)
+        return faiss.IndexIDMap2(base)
+
+    @staticmethod
+    def _as_matrix(embedding: np.ndarray) -> np.ndarray:
+        """转为 (1, dim) float32 并L2归一化"""
+        matrix = np.ascontiguousarray(embedding, dtype=np.float32).reshape(1, -1).copy()
+        faiss.normalize_L2(matrix)
+        return matrix
+
+    def add(self, experience_id: str, embedding: np.ndarray) -> None:
+        """
+        添加经验向量
+
+        HNSW 不支持删除，同一经验重复添加时旧向量留在索引中 (计入旧向量数)，
+        检索结果按ID去重，旧向量过多时在后台重建压缩。
+
+        Args:
+            experience_id: 经验ID
+            embedding: 经验嵌入向量
+        """
+        if not HAS_FAISS:
+            return
+
+        matrix = self._as_matrix(embedding)
+        faiss_id = experience_faiss_id(experience_id)
+
+        with self._lock:
+            if self.index is None:
+                self.index = self._create_index(matrix.shape[1])
+            if faiss_id in self.id_map:
+                self._stale += 1
+            self.index.add_with_ids(matrix, np.array([faiss_id], dtype=np.int64))
+            self.id_map[faiss_id] = experience_id
+            self._inserts_since_train += 1
+            should_rebuild = self._should_rebuild()
+            if should_rebuild:
+                self._training = True
+
+        if should_rebuild:
+            threading.Thread(target=self._rebuild, daemon=True).start()
+
+    def _should_rebuild(self) -> bool:
+        """是否需要(重新)训练IVF或压缩旧向量 (调用方持有锁)"""
+        if self._training:
+            return False
+        if self._stale >= COMPACT_MIN_STALE and self._stale > self.index.ntotal * COMPACT_STALE_RATIO:
+            return True
+        if self.kind != "ivf" or self.index.ntotal < IVF_MIN_TRAIN_SIZE:
+            return False
+        return not self._trained or self._inserts_since_train >= IVF_RETRAIN_INTERVAL
+
+    @staticmethod
+    def _snapshot(index, start: int = 0, count: int = -1) -> Tuple[np.ndarray, np.ndarray]:
+        """取出索引中 [start, start+count) 的向量与ID"""
+        if count < 0:
+            count = index.ntotal - start
+        vectors = index.index.reconstruct_n(start, count)
+        ids = faiss.vector_to_array(index.id_map)[start:start + count].copy()
+        return vectors, ids
+
+    def _build_index(self, vectors: np.ndarray, ids: np.ndarray):
+        """
+        按配置的类型构建索引 (IVF向量数达到训练下限时训练)
+
+        Returns:
+            (索引, IVF是否已训练)
+        """
+        dim = vectors.shape[1]
+        if self.kind == "ivf" and len(vectors) >= IVF_MIN_TRAIN_SIZE:
+            nlist, nprobe = ivf_params(len(vectors))
+            quantizer = faiss.IndexFlatIP(dim)
+            ivf = faiss.IndexIVFFlat(quantizer, dim, nlist, faiss.METRIC_INNER_PRODUCT)
+            ivf.train(vectors)
+            ivf.nprobe = nprobe
+            ivf.make_direct_map()
+            index = faiss.IndexIDMap2(ivf)
+            trained = True
+        else:
+            index = self._create_index(dim)
+            trained = False
+        index.add_with_ids(vectors, ids)
+        return index, trained
+
+    @staticmethod
+    def _count_stale(index) -> int:
+        """索引中重复ID留下的旧向量数"""
+        return index.ntotal - len(np.unique(faiss.vector_to_array(index.id_map)))
+
+    def _rebuild(self) -> None:
+        """
+        后台重建索引并替换当前索引: 每个经验只保留最后一次添加的向量，IVF同时(重新)训练；
+        重建期间的写入在替换前补齐
+        """
+        try:
+            with self._lock:
+                old_index = self.index
+                snapshot_size = old_index.ntotal
+                vectors, ids = self._snapshot(old_index, 0, snapshot_size)
+
+            keep = latest_positions(ids)
+            new_index, trained = self._build_index(vectors[keep], ids[keep])
+
+            with self._lock:
+                # 补齐重建期间新增的向量
+                pending = old_index.ntotal - snapshot_size
+                if pending:
+                    new_index.add_with_ids(*self._snapshot(old_index, snapshot_size, pending))
+                self.index = new_index
+                self._trained = trained
+                self._inserts_since_train = pending
+                self._stale = self._count_stale(new_index)
+
+            logger.info(
+                f"经验ANN索引重建完成: {new_index.ntotal} 条 (移除旧向量 {snapshot_size - len(keep)} 条)"
+            )
+
+        except Exception as e:
+            logger.error(f"经验ANN索引重建失败: {e}")
+        finally:
+            with self._lock:
+                self._training = False
+
+    def search(self, query_embedding: np.ndarray, k: int) -> List[Tuple[str, float]]:
+        """
+        检索最相似的经验
+
+        Args:
+            query_embedding: 查询向量
+            k: 返回数量
+
+        Returns:
+            [(经验ID, 相似度)]，按相似度降序
+        """
+        if not self.available:
+            return []
+
+        query = self._as_matrix(query_embedding)
+        with self._lock:
+            # 每个旧向量至多占去一个结果位，多取旧向量数条即可保证去重后仍有k条
+            scores, ids = self.index.search(query, min(k + self._stale, self.index.ntotal))
+
+        results: Dict[str, float] = {}
+        for score, faiss_id in zip(scores[0], ids[0]):
+            if faiss_id < 0:
+                continue
+            experience_id = self.id_map.get(int(faiss_id))
+            if experience_id is not None and experience_id not in results:
+                results[experience_id] = float(score)
+
+        return list(results.items())[:k]
+
+    def save(self) -> None:
+        """持久化索引与ID映射"""
+        if self.index is None:
+            return
+
+        os.makedirs(os.path.dirname(self.index_path) or ".", exist_ok=True)
+        with self._lock:
+            faiss.write_index(self.index, self.index_path)
+            with open(self.ids_path, "w", encoding="utf-8") as f:
+                json.dump({str(k): v for k, v in self.id_map.items()}, f)
+
+        logger.info(f"经验ANN索引已保存: {self.index_path} ({len(self)} 条)")
+
+    def load(self) -> bool:
+        """
+        加载已持久化的索引
+
+        Returns:
+            是否加载成功
+        """
+        if not (os.path.exists(self.index_path) and os.path.exists(self.ids_path)):
+            return False
+
+        try:
+            index = faiss.read_index(self.index_path)
+            with open(self.ids_path, "r", encoding="utf-8") as f:
+                id_map = {int(k): v for k, v in json.load(f).items()}
+        except Exception as e:
+            logger.warning(f"加载经验ANN索引失败，将重新构建: {e}")
+            return False
+
+        base = faiss.downcast_index(index.index)
+        if isinstance(base, faiss.IndexHNSW):
+            base.hnsw.efSearch = HNSW_EF_SEARCH
+        elif isinstance(base, faiss.IndexIVF):
+            base.nprobe = ivf_params(index.ntotal)[1]
+            base.make_direct_map()
+
+        stored_kind = index_kind(index)
+        stale = self._count_stale(index)
+        # 未训练的IVF索引以Flat承接写入，不算类型不符
+        kind_mismatch = stored_kind != self.kind and not (stored_kind == "flat" and self.kind == "ivf")
+        if kind_mismatch or (stale >= COMPACT_MIN_STALE and stale > index.ntotal * COMPACT_STALE_RATIO):
+            logger.info(
+                f"经验ANN索引按配置重建: 已存类型 {stored_kind}，配置类型 {self.kind}，旧向量 {stale} 条"
+            )
+            vectors, ids = self._snapshot(index)
+            keep = latest_positions(ids)
+            index, trained = self._build_index(vectors[keep], ids[keep])
+            stale = 0
+        else:
+            trained = stored_kind == "ivf"
+
+        with self._lock:
+            self.index = index
+            self.id_map = id_map
+            self._trained = trained
+            self._stale = stale
+
+        logger.info(f"经验ANN索引已加载: {self.index_path} ({len(self)} 条)")
+        return True
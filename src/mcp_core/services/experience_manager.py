@@ -3,15 +3,23 @@
 支持多级缓存、智能推荐、经验融合
 """
 
+import os
+import re
+import math
 import json
 import pickle
 import hashlib
-from typing import List, Dict, Any, Optional, Tuple
-from dataclasses import dataclass, field, asdict
+import heapq
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from operator import itemgetter
+from typing import List, Dict, Any, Optional, Set, FrozenSet, Tuple, Union, Callable, Iterable
+from dataclasses import dataclass, field, fields, asdict, replace
 from datetime import datetime, timedelta
-from collections import defaultdict, deque
+from collections import defaultdict, OrderedDict
 import numpy as np
-from sqlalchemy import create_engine, select, and_, or_, desc, func
+from sqlalchemy import create_engine, select, and_, or_, desc, func, text, bindparam
 from sqlalchemy.orm import Session, sessionmaker
 import redis
 
@@ -19,9 +27,112 @@ from ..common.config import get_settings
 from ..common.logger import get_logger
 from ..services.embedding_service import get_embedding_service
 from ..services.redis_client import get_redis_client
+from ..services.experience_ann_index import ExperienceANNIndex
+from ..services.embedding_codec import encode_embedding, decode_embedding
+
+try:
+    import simsimd
+    HAS_SIMSIMD = True
+except ImportError:
+    HAS_SIMSIMD = False
+
+try:
+    import msgpack
+    HAS_MSGPACK = True
+except ImportError:
+    HAS_MSGPACK = False
+
+try:
+    from xxhash import xxh3_64_hexdigest
+    HAS_XXHASH = True
+except ImportError:
+    HAS_XXHASH = False
 
 logger = get_logger(__name__)
 
+# 关键词提取 (\w+ 的匹配结果与 \b\w+\b 相同)
+_WORD_RE = re.compile(r"\w+")
+_STOPWORDS = frozenset({
+    'the', 'is', 'at', 'which', 'on', 'and', 'a', 'an', 'as', 'are',
+    'was', 'were', 'been', 'be', 'to', 'for', 'in', 'of'
+})
+
+# 经验写入 (ON DUPLICATE 子句使用 VALUES() 引用行值，PyMySQL 可将 executemany 合并为多行INSERT)
+_UPSERT_EXPERIENCE = text("""
+    INSERT INTO coding_experiences (
+        experience_id, project_id, session_id,
+        context_type, problem_description, solution_description,
+        reusability_score, success_rate,
+        context_embedding, metadata
+    ) VALUES (
+        :exp_id, :project_id, :session_id,
+        :category, :problem, :solution,
+        :reusability, :effectiveness,
+        :embedding, :metadata
+    )
+    ON DUPLICATE KEY UPDATE
+        solution_description = VALUES(solution_description),
+        reusability_score = VALUES(reusability_score),
+        success_rate = VALUES(success_rate),
+        updated_at = NOW()
+""")
+
+# 向量扫描回退每次从服务端游标读取的行数
+SCAN_CHUNK_SIZE = 256
+
+# 推理说明固定部分 (% 格式化直接走C实现，比 f-string 的 .2% 格式说明符快)
+_format_reasoning_base = "相关性评分: %.2f%% | 历史成功率: %.2f%% | 已被使用 %d 次".__mod__
+
+# 风险评估字段 (assess_risks_fast 元组顺序)
+RISK_FIELDS = ("compatibility", "complexity", "reliability", "prerequisites")
+
+# 置信度使用次数档位系数: <3, 3~10, >10
+_USAGE_TIER_MULT = np.array([0.9, 1.0, 1.1], dtype=np.float64)
+
+# 重排序权重: 相关度, 效果, 可复用性, 可靠性, 上下文匹配, 使用频率, 时间衰减
+_RERANK_WEIGHTS = np.array([0.3, 0.2, 0.15, 0.15, 0.1, 0.05, 0.05], dtype=np.float32)
+
+
+def normalize_embedding(embedding: np.ndarray) -> np.ndarray:
+    """L2归一化为float32单位向量，归一化后余弦相似度即内积"""
+    vec = np.asarray(embedding, dtype=np.float32).ravel()
+    return vec / (np.linalg.norm(vec) + 1e-12)
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """逐行L2归一化 (零向量保持为零)"""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+
+
+def quantize_embedding(embedding: np.ndarray) -> Tuple[np.ndarray, float]:
+    """
+    按向量对称量化为int8
+
+    Args:
+        embedding: 浮点向量
+
+    Returns:
+        (int8向量, 缩放系数)，原向量 ≈ int8向量 * 缩放系数
+    """
+    vec = np.asarray(embedding, dtype=np.float32).ravel()
+    scale = float(np.abs(vec).max()) / 127.0 if vec.size else 0.0
+    if scale == 0.0:
+        return np.zeros(vec.shape, dtype=np.int8), 0.0
+    return np.clip(np.rint(vec / scale), -127, 127).astype(np.int8), scale
+
+
+def pack_quantized(quantized: np.ndarray, scale: float) -> bytes:
+    """量化向量序列化: float32缩放系数 + int8数据"""
+    return np.float32(scale).tobytes() + quantized.tobytes()
+
+
+def unpack_quantized(data: bytes) -> Tuple[np.ndarray, float]:
+    """pack_quantized 的逆操作"""
+    return np.frombuffer(data, dtype=np.int8, offset=4), float(np.frombuffer(data[:4], dtype=np.float32)[0])
+
+
 # ============================================
 # 数据模型
 # ============================================
@@ -79,6 +190,29 @@ class Experience:
     expires_at: Optional[datetime] = None
     version: int = 1
 
+    # 嵌入向量缓存 (L2归一化)，不写入metadata与Redis经验对象
+    embedding: Optional[np.ndarray] = field(default=None, repr=False, compare=False)
+
+    # 以下为由标签/关键词派生的字段，构造时生成，变更后调用 refresh_derived 刷新
+
+    # 关键词+标签集合
+    terms: FrozenSet[str] = field(default=frozenset(), init=False, repr=False, compare=False)
+
+    # 标签位图 (按管理器分配的标签ID置位，首次使用时生成)
+    tag_bits: Optional[int] = field(default=None, init=False, repr=False, compare=False)
+
+    # 推理说明中展示的前5个标签
+    tags_label: str = field(default="", init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        self.refresh_derived()
+
+    def refresh_derived(self) -> None:
+        """标签/关键词变更后重新生成派生字段"""
+        self.terms = frozenset(self.keywords).union(self.tags)
+        self.tag_bits = None
+        self.tags_label = ", ".join(self.tags[:5])
+
 @dataclass
 class ExperienceCluster:
     """经验聚类"""
@@ -99,7 +233,85 @@ class ExperienceRecommendation:
     confidence: float
     reasoning: str
     expected_benefit: Dict[str, Any]
-    risk_assessment: Dict[str, Any]
+    # 各项风险，按 RISK_FIELDS 顺序
+    risks: Tuple[float, float, float, float]
+
+    @property
+    def risk_assessment(self) -> Dict[str, Any]:
+        """风险评估字典 (访问时才构建)"""
+        return dict(zip(RISK_FIELDS, self.risks))
+
+
+# Redis缓存的经验对象编码 (嵌入向量以量化字节单独缓存，不在此编码)
+_CACHED_FIELDS = tuple(f.name for f in fields(Experience) if f.init and f.name != "embedding")
+_DATETIME_FIELDS = ("created_at", "updated_at", "expires_at")
+_DERIVED_FIELDS = tuple(f.name for f in fields(Experience) if not f.init)
+
+
+def pack_experience(experience: Experience) -> bytes:
+    """
+    经验 -> Redis缓存字节
+
+    安装msgpack时编码为msgpack map(日期为ISO字符串)，否则回退到pickle
+    """
+    if not HAS_MSGPACK:
+        return pickle.dumps(replace(experience, embedding=None))
+
+    data = {name: getattr(experience, name) for name in _CACHED_FIELDS}
+    for name in _DATETIME_FIELDS:
+        if data[name] is not None:
+            data[name] = data[name].isoformat()
+    return msgpack.packb(data, use_bin_type=True, default=str)
+
+
+def unpack_experience(payload: bytes) -> Experience:
+    """pack_experience 的逆操作，兼容pickle格式的旧缓存"""
+    if payload[:1] == b"\x80" or not HAS_MSGPACK:
+        experience = pickle.loads(payload)
+        # 旧版本写入的对象可能缺少派生字段
+        experience.refresh_derived()
+        return experience
+
+    data = msgpack.unpackb(payload, raw=False)
+    for name in _DATETIME_FIELDS:
+        if data.get(name) is not None:
+            data[name] = datetime.fromisoformat(data[name])
+    return Experience(**data)
+
+class ExperienceLRUCache(OrderedDict):
+    """经验内存LRU缓存 (线程安全): 读取即提升为最近使用，超出容量时淘汰最久未用项"""
+
+    def __init__(self, maxsize: int, on_evict: Optional[Callable[[str], None]] = None):
+        """
+        Args:
+            maxsize: 最大容量
+            on_evict: 淘汰回调，参数为被淘汰的经验ID
+        """
+        super().__init__()
+        self.maxsize = maxsize
+        self.on_evict = on_evict
+        self.lock = threading.RLock()
+
+    def __getitem__(self, key: str) -> Experience:
+        with self.lock:
+            value = super().__getitem__(key)
+            self.move_to_end(key)
+            return value
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self.lock:
+            if key in self:
+                return self[key]
+            return default
+
+    def __setitem__(self, key: str, value: Experience) -> None:
+        with self.lock:
+            super().__setitem__(key, value)
+            self.move_to_end(key)
+            while len(self) > self.maxsize:
+                old_key, _ = self.popitem(last=False)
+                if self.on_evict:
+                    self.on_evict(old_key)
 
 # ============================================
 # 经验管理系统
@@ -121,17 +333,55 @@ class ExperienceManagementSystem:
         self.redis_client = get_redis_client()
 
         # 内存缓存(LRU)
-        self.memory_cache: Dict[str, Experience] = {}
-        self.cache_order: deque = deque(maxlen=1000)
+        self.memory_cache = ExperienceLRUCache(maxsize=1000, on_evict=self._drop_cache_embedding)
+        # 内存缓存与嵌入矩阵共用一把锁 (淘汰回调在缓存锁内修改矩阵)
+        self._cache_lock = self.memory_cache.lock
+
+        # 缓存经验的int8量化嵌入矩阵及缩放系数 (行号与 cache_ids 对应)，用于批量相似度计算
+        self.cache_matrix: Optional[np.ndarray] = None
+        self.cache_scales: Optional[np.ndarray] = None
+        self.cache_ids: List[str] = []
+        self._cache_rows: Dict[str, int] = {}
 
         # 经验索引
         self.experience_index: Dict[str, Set[str]] = defaultdict(set)
         self.tag_index: Dict[str, Set[str]] = defaultdict(set)
         self.category_index: Dict[str, Set[str]] = defaultdict(set)
+        # 后台入库线程写入索引时检索线程可能正在读取，读写均在锁内进行
+        self._index_lock = threading.Lock()
+
+        # 标签ID (单调分配)，用于标签位图
+        self._tag_ids: Dict[str, int] = {}
+        self._tag_id_lock = threading.Lock()
 
         # 经验聚类
         self.clusters: Dict[str, ExperienceCluster] = {}
 
+        # 向量ANN索引 (HNSW/IVF/Flat)，FAISS不可用或索引为空时回退到数据库扫描
+        self.ann_index = ExperienceANNIndex(
+            os.path.join(settings.vector_db.faiss_index_path, "experiences.index"),
+            kind=settings.vector_db.experience_ann_kind
+        )
+        self.ann_persist_interval = 100  # 每新增N条向量持久化一次
+        self._ann_unsaved = 0
+
+        # 倒排索引预过滤: 候选数不超过该值时跳过ANN，直接对候选计算相似度
+        self.vector_prefilter_max = 2000
+
+        # 数据库写缓冲
+        self.write_batch_size = 64
+        self._write_buffer: List[Tuple[Dict[str, Any], str, np.ndarray]] = []
+        self._write_lock = threading.Lock()
+
+        # 多路检索线程池 (各路检索为独立的数据库/Redis I/O)
+        self._io_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="experience-retrieval")
+
+        # 后台入库队列 (submit_experience)，工作线程首次提交时启动
+        self._ingest_queue: "queue.Queue[Experience]" = queue.Queue()
+        self._ingest_thread: Optional[threading.Thread] = None
+        self._ingest_lock = threading.Lock()
+        self._ingest_failed: List[Experience] = []
+
         # 配置
         self.cache_ttl = 3600  # 1小时
         self.min_effectiveness = 0.6
@@ -143,12 +393,13 @@ class ExperienceManagementSystem:
     # 核心功能
     # ============================================
 
-    def store_experience(self, experience: Experience) -> str:
+    def store_experience(self, experience: Experience, flush: bool = True) -> str:
         """
         存储经验
 
         Args:
             experience: 经验实体
+            flush: 是否立即落库；批量导入时传 False，结束后调用 flush_writes(force=True)
 
         Returns:
             经验ID
@@ -170,6 +421,8 @@ class ExperienceManagementSystem:
                 experience = merged
                 logger.info(f"融合 {len(similar)} 个相似经验")
 
+            experience.embedding = embedding
+
             # 5. 评估经验价值
             self.evaluate_experience(experience)
 
@@ -177,7 +430,7 @@ class ExperienceManagementSystem:
             self.save_to_database(experience, embedding)
 
             # 7. 更新缓存
-            self.update_caches(experience)
+            self.update_caches(experience, embedding)
 
             # 8. 更新索引
             self.update_indexes(experience)
@@ -185,6 +438,9 @@ class ExperienceManagementSystem:
             # 9. 触发聚类更新
             self.update_clusters_async(experience)
 
+            if flush:
+                self.flush_writes(force=True)
+
             logger.info(f"存储经验: {experience.experience_id}")
 
             return experience.experience_id
@@ -193,6 +449,82 @@ class ExperienceManagementSystem:
             logger.error(f"存储经验失败: {e}")
             raise
 
+    def submit_experience(self, experience: Experience) -> str:
+        """
+        异步存储经验: 分配ID后入队立即返回，嵌入计算、相似融合与落库由后台线程完成
+
+        处理完成前经验不在缓存与索引中，检索不会返回；
+        与已有经验融合时最终保留的ID可能与返回值不同 (同 store_experience)；
+        存储失败的经验保留待重试，由 wait_for_ingest 返回其ID
+
+        Args:
+            experience: 经验实体
+
+        Returns:
+            经验ID
+        """
+        if not experience.experience_id:
+            experience.experience_id = self.generate_experience_id(experience)
+
+        with self._ingest_lock:
+            if self._ingest_thread is None or not self._ingest_thread.is_alive():
+                self._ingest_thread = threading.Thread(
+                    target=self._ingest_worker, name="experience-ingest", daemon=True
+                )
+                self._ingest_thread.start()
+
+        self._ingest_queue.put(experience)
+        return experience.experience_id
+
+    def wait_for_ingest(self) -> List[str]:
+        """
+        阻塞直到已提交的经验全部处理并落库
+
+        写缓冲中仍有未落库的记录时 (后台落库失败) 在此重试，失败则抛出异常
+
+        Returns:
+            存储失败、保留待重试的经验ID列表 (见 retry_failed_ingest)
+        """
+        self._ingest_queue.join()
+        self.flush_writes(force=True)
+
+        with self._ingest_lock:
+            return [experience.experience_id for experience in self._ingest_failed]
+
+    def retry_failed_ingest(self) -> int:
+        """
+        重新提交后台存储失败的经验
+
+        Returns:
+            重新提交的条数
+        """
+        with self._ingest_lock:
+            failed, self._ingest_failed = self._ingest_failed, []
+
+        for experience in failed:
+            self.submit_experience(experience)
+        return len(failed)
+
+    def _ingest_worker(self) -> None:
+        """后台入库线程: 逐条存储，队列排空时统一落库"""
+        while True:
+            experience = self._ingest_queue.get()
+            try:
+                self.store_experience(experience, flush=False)
+            except Exception as e:
+                logger.error(f"后台存储经验失败 {experience.experience_id} (已保留待重试): {e}")
+                with self._ingest_lock:
+                    self._ingest_failed.append(experience)
+
+            try:
+                if self._ingest_queue.empty():
+                    self.flush_writes(force=True)
+            except Exception as e:
+                # 失败的批次已放回写缓冲，下次落库 (或 wait_for_ingest) 时重试
+                logger.error(f"经验落库失败，保留在写缓冲待重试: {e}")
+            finally:
+                self._ingest_queue.task_done()
+
     def retrieve_experience(
         self,
         query: str,
@@ -212,9 +544,12 @@ class ExperienceManagementSystem:
         Returns:
             推荐列表
         """
+        # 上下文匹配度 {经验ID: 匹配度}: 经验可能在两次检索之间被修改，只在本次检索内复用
+        match_cache: Dict[str, float] = {}
+
         try:
             # 1. 查询向量化
-            query_embedding = self.embedding_service.encode_single(query)
+            query_embedding = normalize_embedding(self.embedding_service.encode_single(query))
 
             # 2. 多路检索
             candidates = self.multi_path_retrieval(
@@ -225,16 +560,25 @@ class ExperienceManagementSystem:
             )
 
             # 3. 重排序
-            ranked = self.rerank_experiences(candidates, query, context)
+            ranked = self.rerank_experiences(candidates, query, context, match_cache=match_cache)
 
-            # 4. 生成推荐
+            # 4. 生成推荐 (置信度整批计算)
+            top = ranked[:top_k]
+            confidences = self.calculate_confidences(
+                [experience for experience, _ in top],
+                np.array([score for _, score in top], dtype=np.float64),
+                context,
+                match_cache=match_cache
+            )
             recommendations = []
-            for experience, score in ranked[:top_k]:
+            for (experience, score), confidence in zip(top, confidences):
                 recommendation = self.generate_recommendation(
                     experience,
                     score,
                     query,
-                    context
+                    context,
+                    confidence=float(confidence),
+                    match_cache=match_cache
                 )
                 recommendations.append(recommendation)
 
@@ -283,13 +627,13 @@ class ExperienceManagementSystem:
             if self.should_evolve(experience):
                 # 7. 创建新版本
                 new_version = self.create_evolved_version(experience)
-                self.store_experience(new_version)
+                self.store_experience(new_version, flush=False)
 
                 # 8. 建立演化链
                 experience.child_experiences.append(new_version.experience_id)
                 new_version.parent_experience = experience.experience_id
 
-            # 9. 更新存储
+            # 9. 更新存储 (与新版本一起批量落库)
             self.update_experience(experience)
 
             logger.info(f"经验演化: {experience_id}")
@@ -353,26 +697,25 @@ class ExperienceManagementSystem:
         context: Dict[str, Any],
         filters: Optional[Dict[str, Any]]
     ) -> List[Tuple[Experience, float]]:
-        """多路径检索"""
-        candidates = []
-
+        """多路径检索 (各路并发执行)"""
         # 1. 向量检索
-        vector_results = self.vector_search(query_embedding, limit=50)
-        candidates.extend(vector_results)
+        futures = [self._io_pool.submit(self.vector_search, query_embedding, 50, context)]
 
         # 2. 关键词检索
-        keyword_results = self.keyword_search(query_text, limit=30)
-        candidates.extend(keyword_results)
+        futures.append(self._io_pool.submit(self.keyword_search, query_text, 30))
 
         # 3. 标签检索
         if context.get("tags"):
-            tag_results = self.tag_search(context["tags"], limit=20)
-            candidates.extend(tag_results)
+            futures.append(self._io_pool.submit(self.tag_search, context["tags"], 20))
 
         # 4. 类别检索
         if context.get("category"):
-            category_results = self.category_search(context["category"], limit=20)
-            candidates.extend(category_results)
+            futures.append(self._io_pool.submit(self.category_search, context["category"], 20))
+
+        # 按提交顺序汇总，保证同分结果的合并顺序稳定
+        candidates = []
+        for future in futures:
+            candidates.extend(future.result())
 
         # 5. 应用过滤器
         if filters:
@@ -386,15 +729,93 @@ class ExperienceManagementSystem:
     def vector_search(
         self,
         query_embedding: np.ndarray,
+        limit: int = 50,
+        context: Optional[Dict[str, Any]] = None
+    ) -> List[Tuple[Experience, float]]:
+        """
+        向量相似度检索
+
+        上下文带有标签/类别且倒排索引命中的经验不多时，对命中经验精确计算相似度，
+        与ANN索引结果合并 (语义相近但标签不匹配的经验不被预过滤排除)；
+        ANN索引不可用时，预过滤结果不足 limit 条才回退到数据库扫描。
+        """
+        hits: Dict[str, Tuple[Experience, float]] = {}
+
+        candidate_ids = self.prefilter_candidates(context or {})
+        if candidate_ids and len(candidate_ids) <= self.vector_prefilter_max:
+            for experience, sim in self.vector_search_candidates(query_embedding, candidate_ids, limit):
+                hits[experience.experience_id] = (experience, sim)
+
+        if self.ann_index.available:
+            ann_hits = [
+                (exp_id, sim) for exp_id, sim in self.ann_index.search(query_embedding, limit) if sim > 0.5
+            ]
+            experiences = self.get_experiences([exp_id for exp_id, _ in ann_hits if exp_id not in hits])
+            for exp_id, sim in ann_hits:
+                if exp_id in experiences:
+                    hits[exp_id] = (experiences[exp_id], sim)
+        elif len(hits) < limit:
+            for experience, sim in self.vector_search_scan(query_embedding, limit):
+                hits.setdefault(experience.experience_id, (experience, sim))
+
+        return heapq.nlargest(limit, hits.values(), key=itemgetter(1))
+
+    def prefilter_candidates(self, context: Dict[str, Any]) -> Set[str]:
+        """按上下文标签/类别从倒排索引取候选经验ID"""
+        candidate_ids = self.lookup_index(self.tag_index, context.get("tags") or ())
+
+        category = context.get("category")
+        if category is not None:
+            candidate_ids |= self.lookup_index(self.category_index, (category,))
+
+        return candidate_ids
+
+    def lookup_index(self, index: Dict[str, Set[str]], keys: Iterable[str]) -> Set[str]:
+        """在索引锁内合并各键命中的经验ID (返回副本，调用方可在锁外使用)"""
+        candidate_ids: Set[str] = set()
+        with self._index_lock:
+            for key in keys:
+                ids = index.get(key)
+                if ids:
+                    candidate_ids.update(ids)
+        return candidate_ids
+
+    def vector_search_candidates(
+        self,
+        query_embedding: np.ndarray,
+        candidate_ids: Set[str],
         limit: int = 50
     ) -> List[Tuple[Experience, float]]:
-        """向量相似度检索"""
+        """只对候选经验批量计算向量相似度"""
+        experiences = [
+            experience for experience in self.get_experiences(list(candidate_ids)).values()
+            if experience.embedding is not None and experience.embedding.shape == query_embedding.shape
+        ]
+        if not experiences:
+            return []
+
+        similarities = self.batch_similarity(
+            query_embedding, np.stack([experience.embedding for experience in experiences])
+        )
+        hits = [(experiences[i], float(similarities[i])) for i in np.flatnonzero(similarities > 0.5)]
+
+        return heapq.nlargest(limit, hits, key=itemgetter(1))
+
+    def vector_search_scan(
+        self,
+        query_embedding: np.ndarray,
+        limit: int = 50
+    ) -> List[Tuple[Experience, float]]:
+        """向量相似度检索 (数据库线性扫描，ANN索引不可用时的冷启动回退)"""
         results = []
+        query_embedding = np.ascontiguousarray(query_embedding, dtype=np.float32)
 
+        exp_ids: List[str] = []
+        similarities: List[np.ndarray] = []
         with self.SessionLocal() as session:
-            # 从数据库检索
+            # 服务端游标分块读取，每块解析后立即批量计算，计算与后续块的网络传输重叠
             rows = session.execute(
-                """
+                text("""
                 SELECT
                     experience_id,
                     context_embedding,
@@ -403,31 +824,54 @@ class ExperienceManagementSystem:
                 WHERE context_embedding IS NOT NULL
                 ORDER BY created_at DESC
                 LIMIT :limit
-                """,
+                """).execution_options(stream_results=True),
                 {"limit": limit * 2}  # 多获取一些用于计算
-            )
-
-            for row in rows:
-                try:
-                    # 计算相似度
-                    context_emb = json.loads(row.context_embedding)
-                    solution_emb = json.loads(row.solution_embedding)
-
-                    # 综合相似度
-                    context_sim = self.calculate_similarity(query_embedding, context_emb)
-                    solution_sim = self.calculate_similarity(query_embedding, solution_emb)
-                    similarity = (context_sim + solution_sim) / 2
-
-                    if similarity > 0.5:
-                        experience = self.get_experience(row.experience_id)
-                        if experience:
-                            results.append((experience, similarity))
-
-                except Exception as e:
-                    logger.debug(f"计算相似度失败: {e}")
+            ).yield_per(SCAN_CHUNK_SIZE)
+
+            for chunk in rows.partitions():
+                chunk_ids: List[str] = []
+                context_embs: List[np.ndarray] = []
+                solution_embs: List[np.ndarray] = []
+                for row in chunk:
+                    try:
+                        context_emb = decode_embedding(row.context_embedding)
+                        # 未写入解决方案向量时仅用上下文向量
+                        solution_emb = decode_embedding(row.solution_embedding)
+                        if solution_emb is None:
+                            solution_emb = context_emb
+                        if context_emb.shape != query_embedding.shape or solution_emb.shape != query_embedding.shape:
+                            continue
+                    except Exception as e:
+                        logger.debug(f"解析嵌入向量失败: {e}")
+                        continue
+
+                    chunk_ids.append(row.experience_id)
+                    context_embs.append(context_emb)
+                    solution_embs.append(solution_emb)
+
+                if not chunk_ids:
+                    continue
 
-            # 排序
-            results.sort(key=lambda x: x[1], reverse=True)
+                # 综合相似度 (库中可能有归一化之前写入的向量，按行归一化后再取内积)
+                exp_ids.extend(chunk_ids)
+                similarities.append((
+                    self.batch_similarity(query_embedding, normalize_rows(np.stack(context_embs)))
+                    + self.batch_similarity(query_embedding, normalize_rows(np.stack(solution_embs)))
+                ) / 2)
+
+        if not exp_ids:
+            return results
+
+        similarities = np.concatenate(similarities)
+        hits = np.flatnonzero(similarities > 0.5)
+        experiences = self.get_experiences([exp_ids[i] for i in hits])
+        for i in hits:
+            experience = experiences.get(exp_ids[i])
+            if experience:
+                results.append((experience, float(similarities[i])))
+
+        # 排序
+        results.sort(key=lambda x: x[1], reverse=True)
 
         return results[:limit]
 
@@ -438,25 +882,17 @@ class ExperienceManagementSystem:
     ) -> List[Tuple[Experience, float]]:
         """关键词检索"""
         keywords = self.extract_keywords(query_text)
-        results = []
 
-        for keyword in keywords:
-            if keyword in self.tag_index:
-                for exp_id in self.tag_index[keyword]:
-                    experience = self.get_experience(exp_id)
-                    if experience:
-                        score = self.calculate_keyword_score(experience, keywords)
-                        results.append((experience, score))
+        # 先收集候选ID再批量获取，得分只取决于经验本身，命中多个关键词时只计算一次
+        candidate_ids = self.lookup_index(self.tag_index, keywords)
 
-        # 去重和排序
-        unique_results = {}
-        for exp, score in results:
-            if exp.experience_id not in unique_results or unique_results[exp.experience_id][1] < score:
-                unique_results[exp.experience_id] = (exp, score)
+        query_terms = frozenset(keywords)
+        best = [
+            (experience, self.calculate_keyword_score(experience, query_terms))
+            for experience in self.get_experiences(list(candidate_ids)).values()
+        ]
 
-        sorted_results = sorted(unique_results.values(), key=lambda x: x[1], reverse=True)
-
-        return sorted_results[:limit]
+        return heapq.nlargest(limit, best, key=itemgetter(1))
 
     def tag_search(
         self,
@@ -464,27 +900,17 @@ class ExperienceManagementSystem:
         limit: int = 20
     ) -> List[Tuple[Experience, float]]:
         """标签检索"""
-        results = []
-
-        for tag in tags:
-            if tag in self.tag_index:
-                for exp_id in self.tag_index[tag]:
-                    experience = self.get_experience(exp_id)
-                    if experience:
-                        # 计算标签匹配度
-                        common_tags = set(experience.tags) & set(tags)
-                        score = len(common_tags) / len(tags)
-                        results.append((experience, score))
+        query_tags = set(tags)
 
-        # 去重
-        unique_results = {}
-        for exp, score in results:
-            if exp.experience_id not in unique_results or unique_results[exp.experience_id][1] < score:
-                unique_results[exp.experience_id] = (exp, score)
+        candidate_ids = self.lookup_index(self.tag_index, tags)
 
-        sorted_results = sorted(unique_results.values(), key=lambda x: x[1], reverse=True)
+        # 计算标签匹配度
+        best = [
+            (experience, len(query_tags.intersection(experience.tags)) / len(tags))
+            for experience in self.get_experiences(list(candidate_ids)).values()
+        ]
 
-        return sorted_results[:limit]
+        return heapq.nlargest(limit, best, key=itemgetter(1))
 
     def category_search(
         self,
@@ -494,21 +920,17 @@ class ExperienceManagementSystem:
         """类别检索"""
         results = []
 
-        if category in self.category_index:
-            for exp_id in self.category_index[category]:
-                experience = self.get_experience(exp_id)
-                if experience:
-                    # 基础分数
-                    score = 0.7
+        candidate_ids = self.lookup_index(self.category_index, (category,))
+        for experience in self.get_experiences(list(candidate_ids)).values():
+            # 基础分数
+            score = 0.7
 
-                    # 根据效果调整
-                    score += experience.effectiveness * 0.3
+            # 根据效果调整
+            score += experience.effectiveness * 0.3
 
-                    results.append((experience, score))
+            results.append((experience, score))
 
-        results.sort(key=lambda x: x[1], reverse=True)
-
-        return results[:limit]
+        return heapq.nlargest(limit, results, key=itemgetter(1))
 
     # ============================================
     # 重排序与推荐
@@ -518,63 +940,84 @@ class ExperienceManagementSystem:
         self,
         candidates: List[Tuple[Experience, float]],
         query: str,
-        context: Dict[str, Any]
+        context: Dict[str, Any],
+        match_cache: Optional[Dict[str, float]] = None
     ) -> List[Tuple[Experience, float]]:
-        """重排序经验"""
-        reranked = []
-
-        for experience, initial_score in candidates:
-            # 计算多维度分数
-            relevance = initial_score
-            effectiveness = experience.effectiveness
-            reusability = experience.reusability
-            reliability = experience.reliability
-
-            # 上下文匹配
-            context_match = self.calculate_context_match(experience, context)
-
-            # 时间衰减
-            time_decay = self.calculate_time_decay(experience)
-
-            # 使用频率
-            usage_factor = min(1.0, experience.usage_count / 100)
-
-            # 综合分数
-            final_score = (
-                relevance * 0.3 +
-                effectiveness * 0.2 +
-                reusability * 0.15 +
-                reliability * 0.15 +
-                context_match * 0.1 +
-                usage_factor * 0.05 +
-                time_decay * 0.05
-            )
+        """重排序经验 (全部候选组成特征矩阵，一次矩阵乘法得到综合分数)"""
+        if not candidates:
+            return []
+
+        experiences = [experience for experience, _ in candidates]
+        now = datetime.now()
 
-            reranked.append((experience, final_score))
+        features = np.empty((len(candidates), len(_RERANK_WEIGHTS)), dtype=np.float32)
+        # 相关度
+        features[:, 0] = [score for _, score in candidates]
+        # 效果、可复用性、可靠性
+        features[:, 1:4] = [(e.effectiveness, e.reusability, e.reliability) for e in experiences]
+        # 上下文匹配
+        features[:, 4] = self.calculate_context_matches(experiences, context, match_cache)
+        # 使用频率
+        features[:, 5] = np.minimum(1.0, np.array([e.usage_count for e in experiences], dtype=np.float32) / 100)
+        # 时间衰减 (与 calculate_time_decay 相同，整批共用同一个 now)
+        ages = np.array([(now - e.updated_at).days for e in experiences], dtype=np.float32)
+        features[:, 6] = np.exp(-0.01 * ages)
 
-        reranked.sort(key=lambda x: x[1], reverse=True)
+        # 综合分数
+        scores = features @ _RERANK_WEIGHTS
+        order = np.argsort(-scores, kind="stable")
 
-        return reranked
+        return [(experiences[i], float(scores[i])) for i in order]
 
     def generate_recommendation(
         self,
         experience: Experience,
         score: float,
         query: str,
-        context: Dict[str, Any]
+        context: Dict[str, Any],
+        confidence: Optional[float] = None,
+        match_cache: Optional[Dict[str, float]] = None
     ) -> ExperienceRecommendation:
-        """生成推荐"""
-        # 分析预期收益
-        expected_benefit = self.analyze_expected_benefit(experience, context)
+        """
+        生成推荐
 
-        # 风险评估
-        risk_assessment = self.assess_risks(experience, context)
+        收益、风险、置信度在一次计算中完成，经验属性只读取一次，
+        结果与 analyze_expected_benefit / assess_risks / calculate_confidence 一致
 
-        # 生成推理说明
-        reasoning = self.generate_reasoning(experience, score, query, context)
+        Args:
+            experience: 经验实体
+            score: 相关度分数
+            query: 查询文本
+            context: 上下文信息
+            confidence: 由 calculate_confidences 批量算出时直接传入
+            match_cache: 本次检索的上下文匹配度缓存
 
-        # 计算置信度
-        confidence = self.calculate_confidence(experience, score, context)
+        Returns:
+            推荐
+        """
+        effectiveness = experience.effectiveness
+        reliability = experience.reliability
+
+        # 预期收益
+        expected_benefit = {
+            "time_saved": experience.average_time_saved,
+            "success_probability": effectiveness,
+            "quality_improvement": reliability,
+            "reusability": experience.reusability
+        }
+
+        # 风险评估 (保存元组，字典在访问 risk_assessment 时才构建)
+        risks = self.assess_risks_fast(experience, context)
+
+        # 置信度
+        if confidence is None:
+            usage_count = experience.usage_count
+            usage_mult = 1.1 if usage_count > 10 else (0.9 if usage_count < 3 else 1.0)
+            context_match = self.calculate_context_match(experience, context, match_cache)
+            confidence = min(1.0, score * usage_mult * effectiveness * (0.5 + context_match * 0.5))
+
+        # 推理说明
+        reasoning = self.generate_reasoning(experience, score, query, context)
 
         return ExperienceRecommendation(
             experience=experience,
@@ -582,7 +1025,7 @@ class ExperienceManagementSystem:
             confidence=confidence,
             reasoning=reasoning,
             expected_benefit=expected_benefit,
-            risk_assessment=risk_assessment
+            risks=risks
         )
 
     # ============================================
@@ -684,7 +1127,10 @@ class ExperienceManagementSystem:
     def generate_experience_id(self, experience: Experience) -> str:
         """生成经验ID"""
         content = f"{experience.title}_{experience.category}_{datetime.now()}"
-        return hashlib.md5(content.encode()).hexdigest()[:16]
+        # 16位十六进制，与原 md5[:16] 长度一致
+        if HAS_XXHASH:
+            return xxh3_64_hexdigest(content.encode())
+        return hashlib.blake2b(content.encode(), digest_size=8).hexdigest()
 
     def calculate_experience_embedding(self, experience: Experience) -> np.ndarray:
         """计算经验嵌入"""
@@ -694,7 +1140,13 @@ class ExperienceManagementSystem:
         # 添加标签和关键词
         text += " ".join(experience.tags) + " " + " ".join(experience.keywords)
 
-        return self.embedding_service.encode_single(text)
+        return normalize_embedding(self.embedding_service.encode_single(text))
+
+    def get_experience_embedding(self, experience: Experience) -> np.ndarray:
+        """获取经验嵌入，未缓存时计算并挂到经验对象上"""
+        if experience.embedding is None:
+            experience.embedding = self.calculate_experience_embedding(experience)
+        return experience.embedding
 
     def find_similar_experiences(
         self,
@@ -702,21 +1154,37 @@ class ExperienceManagementSystem:
         threshold: float = 0.8
     ) -> List[Experience]:
         """查找相似经验"""
-        similar = []
+        # 补齐未进入嵌入矩阵的缓存经验(如从Redis加载的)，优先使用Redis中的量化嵌入
+        with self._cache_lock:
+            missing = [(exp_id, exp) for exp_id, exp in self.memory_cache.items() if exp_id not in self._cache_rows]
 
-        # 从缓存查找
-        for exp_id, exp in self.memory_cache.items():
+        for exp_id, exp in missing:
             try:
-                exp_embedding = self.calculate_experience_embedding(exp)
-                similarity = self.calculate_similarity(embedding, exp_embedding)
+                packed = None if exp.embedding is not None else \
+                    self.redis_client.client.get(f"experience_emb:{exp_id}")
+                if packed:
+                    quantized, scale = unpack_quantized(packed)
+                else:
+                    quantized, scale = quantize_embedding(self.get_experience_embedding(exp))
+                with self._cache_lock:
+                    if exp_id in self.memory_cache:
+                        self._put_cache_quantized(exp_id, quantized, scale)
+            except Exception as e:
+                logger.debug(f"计算经验嵌入失败: {e}")
 
-                if similarity > threshold:
-                    similar.append(exp)
+        with self._cache_lock:
+            if not self.cache_ids:
+                return []
 
-            except Exception as e:
-                logger.debug(f"计算相似度失败: {e}")
+            # 从缓存查找: 一次批量计算与全部缓存经验的相似度
+            count = len(self.cache_ids)
+            sims = self.batch_similarity(embedding, self.cache_matrix[:count], self.cache_scales[:count])
 
-        return similar
+            return [
+                self.memory_cache[self.cache_ids[i]]
+                for i in np.flatnonzero(sims > threshold)
+                if self.cache_ids[i] in self.memory_cache
+            ]
 
     def evaluate_experience(self, experience: Experience) -> None:
         """评估经验价值"""
@@ -752,79 +1220,191 @@ class ExperienceManagementSystem:
             experience.reliability = 0.8  # 默认值
 
     def save_to_database(self, experience: Experience, embedding: np.ndarray) -> None:
-        """保存到数据库"""
-        with self.SessionLocal() as session:
-            session.execute(
-                """
-                INSERT INTO coding_experiences (
-                    experience_id, project_id, session_id,
-                    context_type, problem_description, solution_description,
-                    reusability_score, success_rate,
-                    context_embedding, metadata
-                ) VALUES (
-                    :exp_id, :project_id, :session_id,
-                    :category, :problem, :solution,
-                    :reusability, :effectiveness,
-                    :embedding, :metadata
-                )
-                ON DUPLICATE KEY UPDATE
-                    solution_description = :solution,
-                    reusability_score = :reusability,
-                    success_rate = :effectiveness,
-                    updated_at = NOW()
-                """,
-                {
-                    "exp_id": experience.experience_id,
-                    "project_id": experience.project_id or "default",
-                    "session_id": f"exp_{experience.experience_id}",
-                    "category": experience.category,
-                    "problem": experience.problem,
-                    "solution": experience.solution,
-                    "reusability": experience.reusability,
-                    "effectiveness": experience.effectiveness,
-                    "embedding": json.dumps(embedding.tolist()),
-                    "metadata": json.dumps(asdict(experience))
-                }
-            )
-            session.commit()
+        """保存到数据库 (先进入写缓冲，达到批量大小时自动落库)"""
+        params = {
+            "exp_id": experience.experience_id,
+            "project_id": experience.project_id or "default",
+            "session_id": f"exp_{experience.experience_id}",
+            "category": experience.category,
+            "problem": experience.problem,
+            "solution": experience.solution,
+            "reusability": experience.reusability,
+            "effectiveness": experience.effectiveness,
+            "embedding": encode_embedding(embedding),
+            "metadata": json.dumps(self.experience_metadata(experience))
+        }
 
-    def update_caches(self, experience: Experience) -> None:
-        """更新缓存"""
-        # 内存缓存
-        self.memory_cache[experience.experience_id] = experience
-        self.cache_order.append(experience.experience_id)
+        with self._write_lock:
+            self._write_buffer.append((params, experience.experience_id, embedding))
+
+        self.flush_writes()
+
+    def flush_writes(self, force: bool = False) -> int:
+        """
+        将写缓冲批量落库 (一次 executemany + 一次提交)
+
+        Args:
+            force: 为 False 时仅在缓冲达到 write_batch_size 时落库
+
+        Returns:
+            落库条数
+        """
+        with self._write_lock:
+            if not self._write_buffer:
+                return 0
+            if not force and len(self._write_buffer) < self.write_batch_size:
+                return 0
+            batch, self._write_buffer = self._write_buffer, []
+
+        try:
+            with self.SessionLocal() as session:
+                session.execute(_UPSERT_EXPERIENCE, [params for params, _, _ in batch])
+                session.commit()
+        except Exception as e:
+            # 落库失败时整批放回缓冲头部 (缓存与索引已更新，必须保证最终入库)，下次落库重试
+            with self._write_lock:
+                self._write_buffer[:0] = batch
+            logger.error(f"经验批量落库失败 ({len(batch)} 条，已放回写缓冲): {e}")
+            raise
+
+        # 提交后写入ANN索引
+        for _, experience_id, embedding in batch:
+            self.ann_index.add(experience_id, embedding)
+        self._ann_unsaved += len(batch)
+        if self._ann_unsaved >= self.ann_persist_interval:
+            self.save_ann_index()
+
+        return len(batch)
+
+    def experience_metadata(self, experience: Experience) -> Dict[str, Any]:
+        """经验 -> metadata 字典 (嵌入向量单独存储，日期为ISO字符串)"""
+        data = asdict(replace(experience, embedding=None))
+        data.pop("embedding")
+        for name in _DERIVED_FIELDS:
+            data.pop(name)
+        for name in _DATETIME_FIELDS:
+            if data[name] is not None:
+                data[name] = data[name].isoformat()
+        return data
+
+    def experience_from_metadata(self, data: Dict[str, Any]) -> Experience:
+        """experience_metadata 的逆操作"""
+        for name in _DATETIME_FIELDS:
+            if isinstance(data.get(name), str):
+                data[name] = datetime.fromisoformat(data[name])
+        return Experience(**data)
+
+    def save_ann_index(self) -> None:
+        """持久化ANN索引 (服务关闭前应调用一次)"""
+        try:
+            self.ann_index.save()
+            self._ann_unsaved = 0
+        except Exception as e:
+            logger.error(f"保存经验ANN索引失败: {e}")
+
+    def update_caches(
+        self,
+        experience: Experience,
+        embedding: Optional[np.ndarray] = None,
+        pipe=None
+    ) -> None:
+        """
+        更新缓存
 
-        # 如果超过缓存大小，移除最旧的
-        if len(self.memory_cache) > 1000:
-            if self.cache_order:
-                old_id = self.cache_order.popleft()
-                if old_id in self.memory_cache:
-                    del self.memory_cache[old_id]
+        Args:
+            experience: 经验实体
+            embedding: 经验嵌入，缺省时使用 experience.embedding
+            pipe: Redis pipeline，批量写入时由调用方统一执行
+        """
+        redis_conn = pipe if pipe is not None else self.redis_client.client
+
+        if embedding is None:
+            embedding = experience.embedding
+
+        # 内存缓存
+        with self._cache_lock:
+            self.memory_cache[experience.experience_id] = experience
+            if embedding is not None:
+                quantized, scale = self._put_cache_embedding(experience.experience_id, embedding)
+
+        if embedding is not None:
+            redis_conn.set(
+                f"experience_emb:{experience.experience_id}",
+                pack_quantized(quantized, scale),
+                ex=self.cache_ttl
+            )
 
         # Redis缓存
-        self.redis_client.set(
+        redis_conn.set(
             f"experience:{experience.experience_id}",
-            pickle.dumps(experience),
+            pack_experience(experience),
             ex=self.cache_ttl
         )
 
+    def _put_cache_embedding(
+        self,
+        experience_id: str,
+        embedding: np.ndarray
+    ) -> Tuple[np.ndarray, float]:
+        """量化嵌入并写入矩阵，返回 (int8向量, 缩放系数)"""
+        quantized, scale = quantize_embedding(embedding)
+        self._put_cache_quantized(experience_id, quantized, scale)
+        return quantized, scale
+
+    def _put_cache_quantized(self, experience_id: str, quantized: np.ndarray, scale: float) -> None:
+        """写入/覆盖嵌入矩阵中的一行，容量不足时倍增"""
+        row = self._cache_rows.get(experience_id)
+
+        if row is None:
+            row = len(self.cache_ids)
+            if self.cache_matrix is None or self.cache_matrix.shape[1] != quantized.shape[0]:
+                # 首次写入或嵌入维度变化: 重建矩阵
+                self.cache_matrix = np.empty((1024, quantized.shape[0]), dtype=np.int8)
+                self.cache_scales = np.empty(1024, dtype=np.float32)
+                self.cache_ids = []
+                self._cache_rows = {}
+                row = 0
+            elif row == len(self.cache_matrix):
+                self.cache_matrix = np.concatenate([self.cache_matrix, np.empty_like(self.cache_matrix)])
+                self.cache_scales = np.concatenate([self.cache_scales, np.empty_like(self.cache_scales)])
+            self.cache_ids.append(experience_id)
+            self._cache_rows[experience_id] = row
+
+        self.cache_matrix[row] = quantized
+        self.cache_scales[row] = scale
+
+    def _drop_cache_embedding(self, experience_id: str) -> None:
+        """从嵌入矩阵移除一行 (与末行交换，O(1))"""
+        row = self._cache_rows.pop(experience_id, None)
+        if row is None:
+            return
+
+        last_id = self.cache_ids.pop()
+        if last_id != experience_id:
+            self.cache_matrix[row] = self.cache_matrix[len(self.cache_ids)]
+            self.cache_scales[row] = self.cache_scales[len(self.cache_ids)]
+            self.cache_ids[row] = last_id
+            self._cache_rows[last_id] = row
+
     def update_indexes(self, experience: Experience) -> None:
         """更新索引"""
         exp_id = experience.experience_id
+        experience.refresh_derived()
 
-        # 标签索引
-        for tag in experience.tags:
-            self.tag_index[tag].add(exp_id)
+        with self._index_lock:
+            # 标签索引
+            for tag in experience.tags:
+                self.tag_index[tag].add(exp_id)
 
-        # 关键词索引
-        for keyword in experience.keywords:
-            self.tag_index[keyword].add(exp_id)
+            # 关键词索引
+            for keyword in experience.keywords:
+                self.tag_index[keyword].add(exp_id)
 
-        # 类别索引
-        self.category_index[experience.category].add(exp_id)
+            # 类别索引
+            self.category_index[experience.category].add(exp_id)
 
-        # 类型索引
-        self.experience_index[experience.experience_type].add(exp_id)
+            # 类型索引
+            self.experience_index[experience.experience_type].add(exp_id)
 
     def update_clusters_async(self, experience: Experience) -> None:
         """异步更新聚类"""
@@ -833,48 +1413,97 @@ class ExperienceManagementSystem:
 
     def get_experience(self, experience_id: str) -> Optional[Experience]:
         """获取经验"""
-        # 从内存缓存
-        if experience_id in self.memory_cache:
-            return self.memory_cache[experience_id]
-
-        # 从Redis缓存
-        cached = self.redis_client.get(f"experience:{experience_id}")
-        if cached:
-            experience = pickle.loads(cached)
-            self.memory_cache[experience_id] = experience
+        # 从内存缓存 (get 在缓存锁内完成查找，避免检查与读取之间被并发淘汰)
+        experience = self.memory_cache.get(experience_id)
+        if experience is not None:
             return experience
 
+        return self.get_experiences([experience_id]).get(experience_id)
+
+    def get_experiences(self, experience_ids: List[str]) -> Dict[str, Experience]:
+        """
+        批量获取经验: 内存缓存 -> 一次Redis MGET -> 一次数据库 IN 查询
+
+        Args:
+            experience_ids: 经验ID列表
+
+        Returns:
+            {经验ID: 经验}，不存在的ID不出现在结果中
+        """
+        found: Dict[str, Experience] = {}
+        redis_miss: List[str] = []
+
+        # 从内存缓存
+        for exp_id in dict.fromkeys(experience_ids):
+            experience = self.memory_cache.get(exp_id)
+            if experience is not None:
+                found[exp_id] = experience
+            else:
+                redis_miss.append(exp_id)
+
+        if not redis_miss:
+            return found
+
+        # 从Redis缓存: 经验对象与量化嵌入在同一次MGET中取回
+        values = self.redis_client.client.mget(
+            [f"experience:{i}" for i in redis_miss] + [f"experience_emb:{i}" for i in redis_miss]
+        )
+        db_miss: List[str] = []
+        for exp_id, cached, packed in zip(redis_miss, values, values[len(redis_miss):]):
+            if not cached:
+                db_miss.append(exp_id)
+                continue
+            experience = unpack_experience(cached)
+            if packed:
+                # 挂上量化嵌入的反量化结果，避免重新计算
+                quantized, scale = unpack_quantized(packed)
+                experience.embedding = quantized.astype(np.float32) * scale
+            self.memory_cache[exp_id] = experience
+            found[exp_id] = experience
+
+        if not db_miss:
+            return found
+
         # 从数据库
         with self.SessionLocal() as session:
-            result = session.execute(
-                """
-                SELECT metadata
+            rows = session.execute(
+                text("""
+                SELECT experience_id, metadata, context_embedding
                 FROM coding_experiences
-                WHERE experience_id = :exp_id
-                """,
-                {"exp_id": experience_id}
-            ).first()
+                WHERE experience_id IN :exp_ids
+                """).bindparams(bindparam("exp_ids", expanding=True)),
+                {"exp_ids": db_miss}
+            )
 
-            if result and result.metadata:
-                data = json.loads(result.metadata)
-                experience = Experience(**data)
-                self.update_caches(experience)
-                return experience
+            pipe = self.redis_client.client.pipeline(transaction=False)
+            for row in rows:
+                if row.metadata:
+                    experience = self.experience_from_metadata(json.loads(row.metadata))
+                    embedding = decode_embedding(row.context_embedding)
+                    # 库中可能有归一化之前写入的向量
+                    experience.embedding = None if embedding is None else normalize_embedding(embedding)
+                    self.update_caches(experience, pipe=pipe)
+                    found[row.experience_id] = experience
+            pipe.execute()
 
-        return None
+        return found
 
     def update_experience(self, experience: Experience) -> None:
         """更新经验"""
         experience.updated_at = datetime.now()
+        experience.refresh_derived()
 
         # 重新计算嵌入
         embedding = self.calculate_experience_embedding(experience)
+        experience.embedding = embedding
 
         # 更新数据库
         self.save_to_database(experience, embedding)
 
         # 更新缓存
-        self.update_caches(experience)
+        self.update_caches(experience, embedding)
+
+        self.flush_writes(force=True)
 
     def record_retrieval(
         self,
@@ -985,11 +1614,7 @@ class ExperienceManagementSystem:
 
     def extract_keywords(self, text: str) -> List[str]:
         """提取关键词"""
-        import re
-        words = re.findall(r'\b\w+\b', text.lower())
-        stopwords = {'the', 'is', 'at', 'which', 'on', 'and', 'a', 'an', 'as', 'are', 'was', 'were', 'been', 'be', 'to', 'for', 'in', 'of'}
-        keywords = [w for w in words if w not in stopwords and len(w) > 2]
-        return list(set(keywords))[:20]
+        return list({w for w in _WORD_RE.findall(text.lower()) if len(w) > 2 and w not in _STOPWORDS})[:20]
 
     def calculate_similarity(
         self,
@@ -1000,7 +1625,7 @@ class ExperienceManagementSystem:
         if isinstance(vec2, list):
             vec2 = np.array(vec2)
 
-        # 余弦相似度
+        # 余弦相似度 (任意向量，不要求已归一化)
         dot_product = np.dot(vec1, vec2)
         norm_product = np.linalg.norm(vec1) * np.linalg.norm(vec2)
 
@@ -1009,20 +1634,59 @@ class ExperienceManagementSystem:
 
         return float(dot_product / norm_product)
 
+    def batch_similarity(
+        self,
+        query: np.ndarray,
+        matrix: np.ndarray,
+        scales: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """
+        批量计算查询向量与矩阵各行的相似度 (内积)
+
+        要求查询与各行均已L2归一化，此时内积即余弦相似度: 嵌入在进入系统时统一归一化
+        (查询与经验向量计算后、数据库读取后)，int8缓存由归一化向量量化而来
+
+        Args:
+            query: 查询向量 (dim,)
+            matrix: 候选向量矩阵 (N, dim)，float32 或 int8 量化矩阵
+            scales: int8 矩阵各行的缩放系数 (N,)
+
+        Returns:
+            相似度数组 (N,)
+        """
+        if len(matrix) == 0:
+            return np.empty(0, dtype=np.float32)
+
+        if matrix.dtype == np.int8:
+            # int8内积还原: (q_i8 · r_i8) * q_scale * r_scale
+            quantized, scale = quantize_embedding(query)
+            matrix = np.ascontiguousarray(matrix)
+            if HAS_SIMSIMD:
+                dots = np.asarray(simsimd.cdist(quantized[None, :], matrix, metric="dot"))[0]
+            else:
+                dots = matrix.astype(np.int32) @ quantized.astype(np.int32)
+            return (dots * (scale * scales)).astype(np.float32)
+
+        query = np.ascontiguousarray(query, dtype=np.float32).reshape(1, -1)
+        matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+
+        if HAS_SIMSIMD:
+            return np.asarray(simsimd.cdist(query, matrix, metric="dot"), dtype=np.float32)[0]
+
+        return matrix @ query[0]
+
     def calculate_keyword_score(
         self,
         experience: Experience,
-        keywords: List[str]
+        keywords: Iterable[str]
     ) -> float:
-        """计算关键词得分"""
-        exp_keywords = set(experience.keywords + experience.tags)
-        query_keywords = set(keywords)
+        """计算关键词得分 (批量调用时传入预先构建的 frozenset)"""
+        query_keywords = keywords if isinstance(keywords, frozenset) else frozenset(keywords)
 
         if not query_keywords:
             return 0.0
 
-        intersection = exp_keywords & query_keywords
-        return len(intersection) / len(query_keywords)
+        return len(experience.terms & query_keywords) / len(query_keywords)
 
     def apply_filters(
         self,
@@ -1057,25 +1721,53 @@ class ExperienceManagementSystem:
         candidates: List[Tuple[Experience, float]]
     ) -> List[Tuple[Experience, float]]:
         """合并结果"""
-        merged = {}
+        merged: Dict[str, Tuple[Experience, float]] = {}
 
-        for experience, score in candidates:
-            exp_id = experience.experience_id
-            if exp_id not in merged:
-                merged[exp_id] = (experience, score)
-            else:
-                # 取最高分
-                if score > merged[exp_id][1]:
-                    merged[exp_id] = (experience, score)
+        for candidate in candidates:
+            exp_id = candidate[0].experience_id
+            # 取最高分
+            current = merged.setdefault(exp_id, candidate)
+            if candidate[1] > current[1]:
+                merged[exp_id] = candidate
 
         return list(merged.values())
 
+    def tag_bits(self, tags: Iterable[str], assign: bool = False) -> int:
+        """
+        标签集合 -> 位图
+
+        只有经验自身的标签 (assign=True) 分配新ID；查询标签不分配，
+        未出现在任何经验中的标签不会与经验匹配，直接忽略，ID表不随查询增长
+        """
+        bits = 0
+        for tag in tags:
+            tag_id = self._tag_ids.get(tag)
+            if tag_id is None:
+                if not assign:
+                    continue
+                with self._tag_id_lock:
+                    tag_id = self._tag_ids.setdefault(tag, len(self._tag_ids))
+            bits |= 1 << tag_id
+        return bits
+
+    def experience_tag_bits(self, experience: Experience) -> int:
+        """经验标签位图 (缓存在经验对象上)，须先于查询位图计算，以便查询标签取到ID"""
+        if experience.tag_bits is None:
+            experience.tag_bits = self.tag_bits(experience.tags, assign=True)
+        return experience.tag_bits
+
     def calculate_context_match(
         self,
         experience: Experience,
-        context: Dict[str, Any]
+        context: Dict[str, Any],
+        match_cache: Optional[Dict[str, float]] = None
     ) -> float:
-        """计算上下文匹配度"""
+        """计算上下文匹配度 (传入 match_cache 时在同一次检索内按经验ID复用)"""
+        if match_cache is not None:
+            cached = match_cache.get(experience.experience_id)
+            if cached is not None:
+                return cached
+
         match_score = 0.0
         factors = 0
 
@@ -1086,9 +1778,9 @@ class ExperienceManagementSystem:
 
         # 标签匹配
         if context.get("tags"):
-            common_tags = set(experience.tags) & set(context["tags"])
+            common_tags = (self.experience_tag_bits(experience) & self.tag_bits(context["tags"])).bit_count()
             if common_tags:
-                match_score += len(common_tags) / len(context["tags"])
+                match_score += common_tags / len(context["tags"])
                 factors += 1
 
         # 项目匹配
@@ -1096,18 +1788,78 @@ class ExperienceManagementSystem:
             match_score += 0.5
             factors += 1
 
-        if factors == 0:
-            return 0.5  # 默认值
+        # 无任何匹配因素时取默认值0.5
+        match = match_score / factors if factors else 0.5
+        if match_cache is not None:
+            match_cache[experience.experience_id] = match
+        return match
 
-        return match_score / factors
+    def calculate_context_matches(
+        self,
+        experiences: List[Experience],
+        context: Dict[str, Any],
+        match_cache: Optional[Dict[str, float]] = None
+    ) -> np.ndarray:
+        """
+        批量计算上下文匹配度 (float64，运算顺序同 calculate_context_match，逐条结果一致)
+
+        传入 match_cache 时按经验ID复用
+        """
+        if match_cache is not None:
+            cached = [match_cache.get(e.experience_id) for e in experiences]
+            if None not in cached:
+                return np.array(cached, dtype=np.float64)
+
+        category = context.get("category")
+        project_id = context.get("project_id")
+        tags = context.get("tags")
+
+        # 类别匹配、项目匹配
+        category_hit = np.array([e.category == category for e in experiences], dtype=np.float64)
+        project_hit = np.array([e.project_id == project_id for e in experiences], dtype=np.float64)
+
+        # 标签匹配
+        if tags:
+            experience_bits = [self.experience_tag_bits(e) for e in experiences]
+            mask = self.tag_bits(tags)
+            tag_ratio = np.array(
+                [(bits & mask).bit_count() for bits in experience_bits], dtype=np.float64
+            ) / len(tags)
+        else:
+            tag_ratio = np.zeros(len(experiences), dtype=np.float64)
+        tag_hit = (tag_ratio > 0).astype(np.float64)
 
-    def calculate_time_decay(self, experience: Experience) -> float:
-        """计算时间衰减"""
-        age_days = (datetime.now() - experience.updated_at).days
+        match_score = category_hit + tag_ratio + project_hit * 0.5
+        factors = category_hit + tag_hit + project_hit
 
-        # 指数衰减
+        # 无任何匹配因素时取默认值0.5
+        result = np.full(len(experiences), 0.5, dtype=np.float64)
+        np.divide(match_score, factors, out=result, where=factors > 0)
+
+        if match_cache is not None:
+            match_cache.update(zip((e.experience_id for e in experiences), result.tolist()))
+        return result
+
+    def calculate_time_decay(
+        self,
+        experience: Experience,
+        now: Optional[datetime] = None
+    ) -> float:
+        """
+        计算时间衰减
+
+        Args:
+            experience: 经验实体
+            now: 当前时间，批量计算时由调用方传入同一时刻
+
+        Returns:
+            衰减系数
+        """
+        age_days = ((now or datetime.now()) - experience.updated_at).days
+
+        # 指数衰减 (标量使用 math.exp，避免NumPy标量开销)
         decay_rate = 0.01
-        return np.exp(-decay_rate * age_days)
+        return math.exp(-decay_rate * age_days)
 
     def analyze_expected_benefit(
         self,
@@ -1127,22 +1879,23 @@ class ExperienceManagementSystem:
         experience: Experience,
         context: Dict[str, Any]
     ) -> Dict[str, Any]:
-        """风险评估"""
-        risks = {
-            "compatibility": 0.0,
-            "complexity": experience.complexity,
-            "reliability": 1 - experience.reliability
-        }
-
-        # 兼容性风险
-        if experience.project_id != context.get("project_id"):
-            risks["compatibility"] = 0.3
+        """风险评估 (各经验返回相同的字段，无风险的项为0)"""
+        return dict(zip(RISK_FIELDS, self.assess_risks_fast(experience, context)))
 
-        # 先决条件风险
-        if len(experience.prerequisites) > 3:
-            risks["prerequisites"] = 0.5
-
-        return risks
+    def assess_risks_fast(
+        self,
+        experience: Experience,
+        context: Dict[str, Any]
+    ) -> Tuple[float, float, float, float]:
+        """风险评估，按 RISK_FIELDS 顺序返回元组 (不构建字典)"""
+        return (
+            # 兼容性风险: 跨项目
+            0.3 * (experience.project_id != context.get("project_id")),
+            experience.complexity,
+            1 - experience.reliability,
+            # 先决条件风险: 超过3项
+            0.5 * (len(experience.prerequisites) > 3)
+        )
 
     def generate_reasoning(
         self,
@@ -1152,19 +1905,18 @@ class ExperienceManagementSystem:
         context: Dict[str, Any]
     ) -> str:
         """生成推理说明"""
-        reasoning = []
-
-        reasoning.append(f"相关性评分: {score:.2%}")
-        reasoning.append(f"历史成功率: {experience.effectiveness:.2%}")
-        reasoning.append(f"已被使用 {experience.usage_count} 次")
+        reasoning = _format_reasoning_base(
+            (score * 100, experience.effectiveness * 100, experience.usage_count)
+        )
 
         if experience.tags:
-            reasoning.append(f"相关标签: {', '.join(experience.tags[:5])}")
+            reasoning += " | 相关标签: " + experience.tags_label
 
-        if experience.average_time_saved > 0:
-            reasoning.append(f"平均节省时间: {experience.average_time_saved:.1f}分钟")
+        time_saved = experience.average_time_saved
+        if time_saved > 0:
+            reasoning += " | 平均节省时间: %.1f分钟" % time_saved
 
-        return " | ".join(reasoning)
+        return reasoning
 
     def calculate_confidence(
         self,
@@ -1191,6 +1943,41 @@ class ExperienceManagementSystem:
 
         return min(1.0, confidence)
 
+    def calculate_confidences(
+        self,
+        experiences: List[Experience],
+        scores: np.ndarray,
+        context: Dict[str, Any],
+        match_cache: Optional[Dict[str, float]] = None
+    ) -> np.ndarray:
+        """
+        批量计算置信度 (float64，运算顺序同 calculate_confidence，逐条结果一致)
+
+        Args:
+            experiences: 经验列表
+            scores: 各经验的相关度分数 (N,)
+            context: 上下文信息
+            match_cache: 本次检索的上下文匹配度缓存
+
+        Returns:
+            置信度数组 (N,)
+        """
+        if not experiences:
+            return np.empty(0, dtype=np.float64)
+
+        # 按列取出所需属性
+        effectiveness = np.array([e.effectiveness for e in experiences], dtype=np.float64)
+        usage_counts = np.array([e.usage_count for e in experiences], dtype=np.int64)
+        context_matches = self.calculate_context_matches(experiences, context, match_cache)
+
+        # 使用次数调整: 按档位查表 (<3 下调，3~10 不变，>10 上调)，原地计算
+        tiers = (usage_counts >= 3).view(np.int8) + (usage_counts > 10).view(np.int8)
+        confidence = _USAGE_TIER_MULT[tiers]
+        confidence *= np.asarray(scores, dtype=np.float64)
+        confidence *= effectiveness
+        confidence *= context_matches * 0.5 + 0.5
+        return np.minimum(confidence, 1.0, out=confidence)
+
     def combine_solutions(self, solutions: List[str]) -> str:
         """组合多个解决方案"""
         # 简单实现：选择最长的
@@ -1202,13 +1989,13 @@ class ExperienceManagementSystem:
         improvements: List[str]
     ) -> str:
         """将改进应用到解决方案"""
-        # 简单实现：添加改进说明
-        improved = solution
-        if improvements:
-            improved += "\n\n改进建议:\n"
-            for imp in improvements[:5]:
-                improved += f"- {imp}\n"
-        return improved
+        # 简单实现：添加改进说明 (拼接片段后一次 join)
+        if not improvements:
+            return solution
+
+        parts = [solution, "\n\n改进建议:\n"]
+        parts.extend(f"- {imp}\n" for imp in improvements[:5])
+        return "".join(parts)
 
 
 # ============================================
@@ -1216,10 +2003,13 @@ class ExperienceManagementSystem:
 # ============================================
 
 _experience_manager_instance: Optional[ExperienceManagementSystem] = None
+_experience_manager_lock = threading.Lock()
 
 def get_experience_manager() -> ExperienceManagementSystem:
-    """获取经验管理系统单例"""
+    """获取经验管理系统单例 (双重检查加锁，初始化后无锁读取)"""
     global _experience_manager_instance
     if _experience_manager_instance is None:
-        _experience_manager_instance = ExperienceManagementSystem()
+        with _experience_manager_lock:
+            if _experience_manager_instance is None:
+                _experience_manager_instance = ExperienceManagementSystem()
     return _experience_manager_instance
\ No newline at end of file
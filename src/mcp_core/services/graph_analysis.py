@@ -0,0 +1,296 @@
+"""
+图谱生成 - 单文件代码分析任务
+分析进程池的子进程只导入本模块 (及各语言分析器)，不加载嵌入模型、Numba内核等图谱生成依赖
+"""
+
+import atexit
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, List, Optional, Tuple
+
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+try:
+    from xxhash import xxh3_128_hexdigest
+    HAS_XXHASH = True
+except ImportError:
+    HAS_XXHASH = False
+
+from ..common.logger import get_logger
+from ..code_analyzer import CodeEntity, CodeRelation
+
+logger = get_logger(__name__)
+
+# 磁盘缓存: <内容键>.json 为分析结果，<stat键>.key 记录修改时间/大小对应的内容键
+ANALYSIS_CACHE_SUFFIX = ".json"
+ANALYSIS_KEY_SUFFIX = ".key"
+_CONTENT_KEY_RE = re.compile(r"[0-9a-f]{32}")
+# 淘汰后保留的大小占上限的比例 (留出余量，避免每次生成都触发淘汰)
+ANALYSIS_CACHE_PRUNE_RATIO = 0.8
+
+# 分析进程池 (进程内单例，首次使用时创建，跨多次图谱生成复用)
+_analysis_pool: Optional[ProcessPoolExecutor] = None
+_analysis_pool_lock = threading.Lock()
+
+
+def _analysis_json_default(value: Any) -> Any:
+    """分析结果中JSON不支持的元数据值 (如Java修饰符集合)"""
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    return str(value)
+
+
+def encode_analysis(result: Tuple[List[CodeEntity], List[CodeRelation]]) -> bytes:
+    """
+    单文件分析结果 -> JSON字节 (实体/关系按数据类字段字典编码)
+
+    共享缓存中的数据不可信，不使用pickle，读取时只还原为 CodeEntity / CodeRelation
+    """
+    entities, relations = result
+    payload = [[vars(entity) for entity in entities], [vars(relation) for relation in relations]]
+    if HAS_ORJSON:
+        return orjson.dumps(payload, default=_analysis_json_default)
+    return json.dumps(payload, default=_analysis_json_default).encode()
+
+
+def decode_analysis(data: bytes) -> Tuple[List[CodeEntity], List[CodeRelation]]:
+    """encode_analysis 的逆操作"""
+    entities, relations = orjson.loads(data) if HAS_ORJSON else json.loads(data)
+    return (
+        [CodeEntity(**entity) for entity in entities],
+        [CodeRelation(**relation) for relation in relations]
+    )
+
+
+def content_digest(data: bytes) -> str:
+    """文件内容摘要，用作分析结果缓存键"""
+    if HAS_XXHASH:
+        return xxh3_128_hexdigest(data)
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def analysis_cache_key(file_path: str, project_path: str, analyzer_class: type, content: str) -> str:
+    """单文件分析结果缓存键 (分析结果只取决于文件内容、路径与分析器，三者均计入)"""
+    return content_digest(
+        f"{analyzer_class.__name__}\0{project_path}\0{file_path}\0{content}".encode()
+    )
+
+
+def stat_cache_key(file_path: str, project_path: str, analyzer_class: type, st: os.stat_result) -> str:
+    """按文件元数据 (修改时间、大小) 计算的快速键，命中时无需读取和摘要文件内容"""
+    return content_digest(
+        f"{analyzer_class.__name__}\0{project_path}\0{file_path}\0{st.st_mtime_ns}\0{st.st_size}".encode()
+    )
+
+
+def _write_cache_file(path: str, data: bytes) -> None:
+    """先写临时文件再原子替换，避免并发分析读到半写入的缓存"""
+    tmp_file = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_file, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_file, path)
+
+
+def resolve_source_key(
+    file_path: str,
+    project_path: str,
+    analyzer_class: type,
+    cache_dir: str
+) -> Tuple[str, Optional[str]]:
+    """
+    计算文件的分析缓存键
+
+    修改时间与大小未变时直接读取已记录的内容键 (stat快速路径)，否则读取文件计算内容摘要并记录
+
+    Args:
+        file_path: 文件路径
+        project_path: 项目路径
+        analyzer_class: 分析器类
+        cache_dir: 缓存目录
+
+    Returns:
+        (内容键, 文件内容: 走快速路径时为 None)
+    """
+    alias_file = os.path.join(
+        cache_dir, stat_cache_key(file_path, project_path, analyzer_class, os.stat(file_path)) + ANALYSIS_KEY_SUFFIX
+    )
+    try:
+        with open(alias_file, 'rb') as f:
+            key = f.read().decode('ascii', 'replace')
+        # 内容键用作文件名，只接受摘要格式
+        if _CONTENT_KEY_RE.fullmatch(key):
+            return key, None
+    except FileNotFoundError:
+        pass
+
+    with open(file_path, 'r', encoding='utf-8') as f:
+        content = f.read()
+    key = analysis_cache_key(file_path, project_path, analyzer_class, content)
+
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        _write_cache_file(alias_file, key.encode())
+    except OSError as e:
+        logger.debug(f"写入分析缓存键失败 {alias_file}: {e}")
+
+    return key, content
+
+
+def analyze_source_file(
+    file_path: str,
+    project_path: str,
+    analyzer_class: type,
+    cache_dir: str,
+    key: Optional[str] = None,
+    content: Optional[str] = None
+) -> Tuple[List[CodeEntity], List[CodeRelation]]:
+    """
+    分析单个文件，结果按内容键以JSON缓存到磁盘
+
+    Args:
+        file_path: 文件路径
+        project_path: 项目路径
+        analyzer_class: 分析器类
+        cache_dir: 缓存目录
+        key: 已计算的内容键 (为 None 时经 resolve_source_key 计算)
+        content: 已读取的文件内容 (为 None 且缓存未命中时读取文件)
+
+    Returns:
+        (实体列表, 关系列表)
+    """
+    if key is None:
+        key, content = resolve_source_key(file_path, project_path, analyzer_class, cache_dir)
+
+    cache_file = os.path.join(cache_dir, key + ANALYSIS_CACHE_SUFFIX)
+    try:
+        with open(cache_file, 'rb') as f:
+            result = decode_analysis(f.read())
+        # 刷新修改时间，淘汰时按最久未用处理
+        os.utime(cache_file)
+        return result
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        logger.debug(f"读取分析缓存失败 {cache_file}: {e}")
+
+    if content is None:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            content = f.read()
+
+    result = analyzer_class(file_path, project_path).analyze(content)
+
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        _write_cache_file(cache_file, encode_analysis(result))
+    except OSError as e:
+        logger.debug(f"写入分析缓存失败 {cache_file}: {e}")
+
+    return result
+
+
+def prune_analysis_cache(cache_dir: str, max_bytes: int) -> int:
+    """
+    磁盘缓存超出上限时按修改时间淘汰最旧的条目，直到降至上限的 ANALYSIS_CACHE_PRUNE_RATIO
+
+    Args:
+        cache_dir: 缓存目录
+        max_bytes: 缓存总大小上限
+
+    Returns:
+        删除的文件数
+    """
+    entries = []
+    total = 0
+    try:
+        with os.scandir(cache_dir) as it:
+            for entry in it:
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue
+                entries.append((st.st_mtime_ns, st.st_size, entry.path))
+                total += st.st_size
+    except FileNotFoundError:
+        return 0
+
+    if total <= max_bytes:
+        return 0
+
+    target = max_bytes * ANALYSIS_CACHE_PRUNE_RATIO
+    removed = 0
+    entries.sort()
+    for _, size, path in entries:
+        if total <= target:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+        removed += 1
+
+    logger.info(f"分析缓存淘汰 {removed} 个文件: {cache_dir}")
+    return removed
+
+
+def resolve_task(task: Tuple[str, str, type, str]) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+    """线程池任务: 返回 (内容键, 文件内容, 错误信息)，读取失败不中断整批"""
+    try:
+        key, content = resolve_source_key(*task)
+        return key, content, None
+    except Exception as e:
+        return None, None, str(e)
+
+
+def analyze_task(
+    task: Tuple[Any, ...]
+) -> Tuple[Optional[Tuple[List[CodeEntity], List[CodeRelation]]], Optional[str]]:
+    """进程池任务: 返回 (分析结果, 错误信息)，异常在子进程内捕获以免中断整批"""
+    try:
+        return analyze_source_file(*task), None
+    except Exception as e:
+        return None, str(e)
+
+
+def get_analysis_pool(max_workers: int) -> ProcessPoolExecutor:
+    """
+    获取分析进程池 (懒创建，进程内复用)
+
+    以spawn方式启动: 父进程可能已编译 parallel=True 的 Numba 内核或持有连接与线程，
+    fork后会死锁；子进程只需导入本模块，启动开销在进程生命周期内只付一次
+
+    Args:
+        max_workers: 首次创建时的进程数
+
+    Returns:
+        进程池
+    """
+    global _analysis_pool
+    with _analysis_pool_lock:
+        if _analysis_pool is None:
+            _analysis_pool = ProcessPoolExecutor(
+                max_workers=max_workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _analysis_pool
+
+
+def shutdown_analysis_pool(wait: bool = True) -> None:
+    """关闭分析进程池 (服务关闭时调用；子进程异常退出后也用于重建)"""
+    global _analysis_pool
+    with _analysis_pool_lock:
+        pool, _analysis_pool = _analysis_pool, None
+    if pool is not None:
+        pool.shutdown(wait=wait, cancel_futures=True)
+
+
+atexit.register(shutdown_analysis_pool)
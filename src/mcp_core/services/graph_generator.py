@@ -4,34 +4,164 @@
 """
 
 import os
+import re
+import sys
 import json
 import hashlib
 import ast
 import networkx as nx
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import islice
 from pathlib import Path
 from datetime import datetime
-from typing import List, Dict, Any, Optional, Tuple, Set
-from dataclasses import dataclass, asdict
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple, Set
+from dataclasses import dataclass
 import numpy as np
-from sqlalchemy import create_engine, select, and_, or_, desc, func
+from sqlalchemy import create_engine, select, and_, or_, desc, func, text
 from sqlalchemy.orm import Session, sessionmaker
 
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+try:
+    import scipy.sparse as sp
+    HAS_SCIPY = True
+except ImportError:
+    HAS_SCIPY = False
+
+try:
+    from numba import njit, prange
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
+
+try:
+    import igraph as ig
+    HAS_IGRAPH = True
+except ImportError:
+    HAS_IGRAPH = False
+
+try:
+    import aiomysql  # noqa: F401  (异步MySQL驱动)
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+    HAS_ASYNC_DB = True
+except ImportError:
+    HAS_ASYNC_DB = False
+
 from ..models.base import Base
 from ..common.config import get_settings
 from ..common.logger import get_logger
 from ..code_analyzer import PythonCodeAnalyzer, CodeEntity, CodeRelation
 from ..java_analyzer import JavaCodeAnalyzer
 from ..multi_lang_analyzer import MultiLanguageAnalyzer
+from ..services.embedding_codec import encode_embedding
+from ..services.graph_analysis import (
+    analyze_task,
+    decode_analysis,
+    encode_analysis,
+    get_analysis_pool,
+    prune_analysis_cache,
+    resolve_task,
+    shutdown_analysis_pool,
+)
 from ..services.embedding_service import get_embedding_service
 from ..services.redis_client import get_redis_client
 
 logger = get_logger(__name__)
 
+# 语义增强: 去除首尾空白后短于该长度的节点文本不做嵌入
+MIN_EMBEDDING_TEXT_LENGTH = 8
+
+# 关键词提取
+_WORD_RE = re.compile(r'\b\w+\b')
+_KEYWORD_STOPWORDS = frozenset({
+    'the', 'is', 'at', 'which', 'on', 'and', 'a', 'an', 'as', 'are', 'was', 'were', 'in', 'of', 'to'
+})
+
+# 代码复杂度标记 (按子串计数; 'elif ' 置于 'if ' 之前，先匹配较长者)
+_COMPLEXITY_TOKENS = ('elif ', 'if ', 'else:', 'for ', 'while ', 'try:', 'except ')
+_COMPLEXITY_TOKEN_RE = re.compile('|'.join(map(re.escape, _COMPLEXITY_TOKENS)))
+
+# 架构/设计模式识别用到的节点名称关键词 (小写子串匹配)
+_LAYER_KEYWORDS = {
+    "presentation": ("ui", "view", "frontend", "web"),
+    "business": ("service", "business", "logic", "domain"),
+    "data": ("repository", "dao", "database", "model")
+}
+_PATTERN_KEYWORDS = frozenset(
+    ("model", "view", "controller", "service", "singleton", "factory", "observer", "listener")
+    + tuple(kw for keywords in _LAYER_KEYWORDS.values() for kw in keywords)
+)
+# 预筛: 一次扫描判断名称是否含任一关键词 (绝大多数名称不含，命中后再逐个确认)
+_PATTERN_KEYWORD_RE = re.compile("|".join(map(re.escape, sorted(_PATTERN_KEYWORDS))))
+
+# Redis共享分析缓存: 多个实例/重复生成之间复用单文件分析结果，按批 MGET
+ANALYSIS_REDIS_PREFIX = "graph:analysis:"
+ANALYSIS_REDIS_TTL = 86400
+ANALYSIS_REDIS_BATCH_SIZE = 256
+
+# 图谱写入: 语句在模块加载时构造一次，按批 executemany，每批不超过 STORE_BATCH_SIZE 行以免超出 max_allowed_packet
+STORE_BATCH_SIZE = 500
+
+_Q_UPSERT_NODE = text("""
+    INSERT INTO graph_nodes (
+        node_id, project_id, node_type, node_name,
+        node_path, qualified_name, file_path,
+        line_start, line_end,
+        properties, docstring, signature,
+        complexity_score, importance_score, stability_score,
+        in_degree, out_degree, centrality,
+        layout_x, layout_y, layout_z,
+        cluster_id, color, size,
+        embedding
+    ) VALUES (
+        :node_id, :project_id, :node_type, :node_name,
+        :node_path, :qualified_name, :file_path,
+        :line_start, :line_end,
+        :properties, :docstring, :signature,
+        :complexity, :importance, :stability,
+        :in_degree, :out_degree, :centrality,
+        :x, :y, :z,
+        :cluster_id, :color, :size,
+        :embedding
+    )
+    ON DUPLICATE KEY UPDATE
+        properties = VALUES(properties),
+        complexity_score = VALUES(complexity_score),
+        importance_score = VALUES(importance_score),
+        stability_score = VALUES(stability_score),
+        layout_x = VALUES(layout_x), layout_y = VALUES(layout_y), layout_z = VALUES(layout_z),
+        cluster_id = VALUES(cluster_id),
+        updated_at = NOW()
+""")
+
+_Q_UPSERT_EDGE = text("""
+    INSERT INTO graph_edges (
+        edge_id, project_id,
+        source_node_id, target_node_id, edge_type,
+        weight, confidence,
+        metadata, edge_style, edge_color
+    ) VALUES (
+        :edge_id, :project_id,
+        :source, :target, :edge_type,
+        :weight, :confidence,
+        :metadata, :style, :color
+    )
+    ON DUPLICATE KEY UPDATE
+        weight = VALUES(weight),
+        metadata = VALUES(metadata),
+        updated_at = NOW()
+""")
+
 # ============================================
 # 数据模型
 # ============================================
 
-@dataclass
+@dataclass(slots=True)
 class GraphNode:
     """图谱节点"""
     node_id: str
@@ -45,8 +175,9 @@ class GraphNode:
     cluster_id: Optional[str] = None
     color: str = "#4A90E2"
     size: float = 1.0
+    embedding: Optional[np.ndarray] = None  # 完整语义嵌入 (float32)，只写入数据库BLOB列
 
-@dataclass
+@dataclass(slots=True)
 class GraphEdge:
     """图谱边"""
     edge_id: str
@@ -69,6 +200,204 @@ class ProjectGraph:
     statistics: Dict[str, Any]
     metadata: Dict[str, Any]
 
+@dataclass(slots=True)
+class GraphArrays:
+    """图谱的列式(SoA)表示，供批量指标计算使用 (节点按首次出现顺序编号，重复边只保留最后一条，与DiGraph一致)"""
+    node_ids: List[str]
+    node_index: Dict[str, int]
+    sources: np.ndarray  # (E,) int32，按源节点排序
+    targets: np.ndarray  # (E,) int32
+    weights: np.ndarray  # (E,) float32
+    indptr: np.ndarray   # (N+1,) int32，CSR行指针: 节点i的出边为 [indptr[i], indptr[i+1])
+    # 节点指标列 (calculate_importance_metrics 填充，未计算时为 None)
+    importance: Optional[np.ndarray] = None  # (N,) float64，PageRank
+    size: Optional[np.ndarray] = None        # (N,) float64，节点显示大小
+    stability: Optional[np.ndarray] = None   # (N,) float64，入度/出度
+    layer: Optional[np.ndarray] = None       # (N,) int64，分层层级
+    layout: Optional[np.ndarray] = None      # (N, 2) float64，布局平面坐标 (已应用缩放与层级约束)
+
+    @property
+    def num_nodes(self) -> int:
+        return len(self.node_ids)
+
+    def in_degree(self) -> np.ndarray:
+        """各节点入度"""
+        return np.bincount(self.targets, minlength=self.num_nodes)
+
+    def out_degree(self) -> np.ndarray:
+        """各节点出度"""
+        return np.diff(self.indptr)
+
+def json_text(obj: Any) -> str:
+    """序列化为JSON文本，写入JSON列 (优先orjson，在C层直接编码numpy)"""
+    if HAS_ORJSON:
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY).decode()
+    return json.dumps(obj)
+
+def batched(iterable: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    """按固定大小切分为列表批次 (最后一批可能不足)"""
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+if HAS_NUMBA:
+    # 显式签名: 导入时即完成编译，首次布局不承担JIT延迟
+    @njit(
+        "void(float64[:, ::1], int32[::1], int32[::1], float32[::1], float64, float64[:, ::1])",
+        cache=True, fastmath=True, nogil=True, parallel=True
+    )
+    def _fr_displacement_numba(pos, indptr, targets, weights, k, out):
+        """
+        Fruchterman-Reingold 单轮位移 (与 networkx 一致: 斥力 k²/d，引力 A_ij·d²/k，距离下限0.01)
+
+        按节点并行，逐节点流式扫描坐标，不构造 N×N 距离矩阵
+        """
+        n = pos.shape[0]
+        k2 = k * k
+        for i in prange(n):
+            xi = pos[i, 0]
+            yi = pos[i, 1]
+            dx = 0.0
+            dy = 0.0
+            # 斥力: 全部节点对
+            for j in range(n):
+                ddx = xi - pos[j, 0]
+                ddy = yi - pos[j, 1]
+                dist = max(np.sqrt(ddx * ddx + ddy * ddy), 0.01)
+                f = k2 / (dist * dist)
+                dx += ddx * f
+                dy += ddy * f
+            # 引力: 出边 (CSR)
+            for e in range(indptr[i], indptr[i + 1]):
+                j = targets[e]
+                ddx = xi - pos[j, 0]
+                ddy = yi - pos[j, 1]
+                dist = max(np.sqrt(ddx * ddx + ddy * ddy), 0.01)
+                f = weights[e] * dist / k
+                dx -= ddx * f
+                dy -= ddy * f
+            out[i, 0] = dx
+            out[i, 1] = dy
+
+def spring_layout_csr(
+    arrays: GraphArrays,
+    k: float,
+    iterations: int = 50,
+    scale: float = 1.0,
+    threshold: float = 1e-4
+) -> np.ndarray:
+    """
+    力导向布局 (Numba编译的Fruchterman-Reingold，对应 nx.spring_layout 的参数与缩放)
+
+    Args:
+        arrays: 列式图谱
+        k: 节点最优间距
+        iterations: 最大迭代次数
+        scale: 布局缩放
+        threshold: 平均位移低于该值时提前停止
+
+    Returns:
+        (N, 2) float64 坐标，行序与 arrays.node_ids 一致
+    """
+    n = arrays.num_nodes
+    if n <= 1:
+        return np.zeros((n, 2), dtype=np.float64)
+
+    pos = np.random.rand(n, 2)
+    displacement = np.empty_like(pos)
+    # 初始温度为坐标范围的1/10，每轮线性降温
+    t = max(np.ptp(pos[:, 0]), np.ptp(pos[:, 1])) * 0.1
+    dt = t / (iterations + 1)
+
+    for _ in range(iterations):
+        _fr_displacement_numba(pos, arrays.indptr, arrays.targets, arrays.weights, float(k), displacement)
+        length = np.maximum(np.sqrt((displacement * displacement).sum(axis=1)), 0.01)
+        delta_pos = displacement * (t / length)[:, None]
+        pos += delta_pos
+        t -= dt
+        if np.linalg.norm(delta_pos) / n < threshold:
+            break
+
+    pos -= pos.mean(axis=0)
+    lim = np.abs(pos).max()
+    if lim > 0:
+        pos *= scale / lim
+    return pos
+
+def louvain_partition(arrays: GraphArrays) -> Dict[str, int]:
+    """
+    Louvain社区发现 (igraph C实现)
+
+    与 community.best_partition(DiGraph.to_undirected()) 对应: 按无向加权图计算，
+    互为反向的两条边合并为一条并保留首条边的权重
+
+    Args:
+        arrays: 列式图谱
+
+    Returns:
+        {节点ID: 社区编号}
+    """
+    graph = ig.Graph(
+        n=arrays.num_nodes,
+        edges=np.column_stack((arrays.sources, arrays.targets)).tolist(),
+        directed=False,
+        edge_attrs={"weight": arrays.weights.tolist()}
+    )
+    graph.simplify(multiple=True, loops=False, combine_edges="first")
+    membership = graph.community_multilevel(weights="weight").membership
+    return dict(zip(arrays.node_ids, membership))
+
+def concat_lists(parts: List[List[Any]]) -> List[Any]:
+    """拼接多个列表 (按总长度一次分配，避免逐段 extend 反复扩容)"""
+    merged = [None] * sum(map(len, parts))
+    position = 0
+    for part in parts:
+        merged[position:position + len(part)] = part
+        position += len(part)
+    return merged
+
+def pagerank_csr(
+    arrays: GraphArrays,
+    alpha: float = 0.85,
+    max_iter: int = 100,
+    tol: float = 1.0e-6
+) -> np.ndarray:
+    """
+    加权PageRank (稀疏矩阵幂迭代，与 nx.pagerank(weight="weight") 结果一致)
+
+    Args:
+        arrays: 列式图谱
+        alpha: 阻尼系数
+        max_iter: 最大迭代次数
+        tol: 收敛阈值 (按节点数放大后与L1误差比较)
+
+    Returns:
+        各节点PageRank值 (N,)，按 arrays.node_index 编号
+    """
+    n = arrays.num_nodes
+    if n == 0:
+        return np.empty(0, dtype=np.float64)
+
+    matrix = sp.csr_matrix(
+        (arrays.weights.astype(np.float64), arrays.targets, arrays.indptr), shape=(n, n)
+    )
+
+    # 按出边权重和做行归一化，无出边的节点将得分均分给所有节点
+    out_weight = np.asarray(matrix.sum(axis=1)).ravel()
+    dangling = out_weight == 0
+    scale = np.divide(1.0, out_weight, out=np.zeros(n), where=~dangling)
+    matrix = sp.diags(scale) @ matrix
+    transition = matrix.T.tocsr()
+
+    x = np.full(n, 1.0 / n)
+    for _ in range(max_iter):
+        last = x
+        x = alpha * (transition @ last + last[dangling].sum() / n) + (1 - alpha) / n
+        if np.abs(x - last).sum() < n * tol:
+            return x / x.sum()
+
+    raise nx.PowerIterationFailedConvergence(max_iter)
+
 # ============================================
 # 项目图谱生成器
 # ============================================
@@ -76,12 +405,76 @@ class ProjectGraph:
 class ProjectGraphGenerator:
     """项目图谱生成器 - 让人和AI都懂项目"""
 
+    # 节点/边的可视化属性与权重 (类级常量，避免每次调用重建字典)
+    _NODE_COLORS = {
+        "module": "#FF6B6B",
+        "class": "#4ECDC4",
+        "function": "#45B7D1",
+        "method": "#96CEB4",
+        "variable": "#FFEAA7",
+        "import": "#DDA0DD"
+    }
+    _NODE_SIZES = {
+        "module": 3.0,
+        "class": 2.5,
+        "function": 2.0,
+        "method": 1.8,
+        "variable": 1.0
+    }
+    _EDGE_STYLES = {
+        "inherits": "dashed",
+        "implements": "dotted",
+        "calls": "solid",
+        "imports": "solid",
+        "contains": "solid"
+    }
+    _EDGE_COLORS = {
+        "inherits": "#E74C3C",
+        "implements": "#3498DB",
+        "calls": "#2ECC71",
+        "imports": "#F39C12",
+        "contains": "#95A5A6"
+    }
+    # 节点类型的基础层级 (再叠加路径深度)
+    _TYPE_LAYERS = {
+        "module": 0,
+        "class": 1,
+        "function": 2,
+        "method": 2
+    }
+    # 基于关系类型的基础权重
+    _EDGE_WEIGHTS = {
+        "inherits": 3.0,
+        "implements": 2.5,
+        "calls": 1.5,
+        "imports": 1.0,
+        "contains": 2.0,
+        "uses": 1.0
+    }
+
     def __init__(self):
         """初始化图谱生成器"""
         settings = get_settings()
-        self.db_engine = create_engine(settings.database.url)
+        db_settings = settings.database
+        pool_options = {
+            "pool_size": db_settings.pool_size,
+            "max_overflow": db_settings.max_overflow,
+            "pool_timeout": db_settings.pool_timeout,
+            "pool_recycle": db_settings.pool_recycle,
+        }
+        self.db_engine = create_engine(db_settings.url, **pool_options)
         self.SessionLocal = sessionmaker(bind=self.db_engine)
 
+        # 异步会话 (供API读路径使用，不阻塞事件循环；驱动不可用时为None)
+        self.async_db_engine = None
+        self.AsyncSessionLocal = None
+        if HAS_ASYNC_DB and db_settings.url.startswith("mysql+pymysql://"):
+            self.async_db_engine = create_async_engine(
+                db_settings.url.replace("mysql+pymysql://", "mysql+aiomysql://", 1),
+                **pool_options
+            )
+            self.AsyncSessionLocal = async_sessionmaker(self.async_db_engine, expire_on_commit=False)
+
         # 嵌入服务
         self.embedding_service = get_embedding_service()
 
@@ -102,6 +495,17 @@ class ProjectGraphGenerator:
         self.max_depth = 10  # 最大分析深度
         self.min_importance = 0.1  # 最小重要性阈值
         self.clustering_threshold = 0.7  # 聚类阈值
+        # 单文件分析结果磁盘缓存 (目录在初始化时解析为绝对路径，分析子进程共用)
+        self.analysis_cache_dir = os.path.abspath(settings.graph.analysis_cache_dir)
+        self.analysis_cache_max_bytes = settings.graph.analysis_cache_max_mb * 1024 * 1024
+        # 并行分析进程数 (容器内以CPU亲和性为准)
+        self.analysis_workers = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+        # 待分析文件数低于该值时不启用进程池: spawn子进程冷启动约0.5秒，单文件分析约10毫秒
+        self.parallel_min_files = 64
+        # 缓存键计算 (stat/读取/摘要) 与不启用进程池时的分析以线程池重叠文件I/O
+        self.io_workers = min(32, (os.cpu_count() or 1) * 4)
+        self.threaded_min_files = 4  # 文件数低于该值时串行执行
+        self.embedding_batch_size = 64  # 节点语义嵌入批大小
 
         logger.info("项目图谱生成器初始化完成")
 
@@ -142,6 +546,7 @@ class ProjectGraphGenerator:
             logger.info("构建基础图谱...")
             graph_nodes = self.build_nodes(entities, project_id)
             graph_edges = self.build_edges(relations, entities, project_id)
+            graph_arrays = self.build_graph_arrays(graph_nodes, graph_edges)
 
             # 4. 增强语义信息
             logger.info("增强语义信息...")
@@ -149,7 +554,7 @@ class ProjectGraphGenerator:
 
             # 5. 计算重要性指标
             logger.info("计算重要性指标...")
-            self.calculate_importance_metrics(graph_nodes, graph_edges)
+            self.calculate_importance_metrics(graph_nodes, graph_edges, graph_arrays, write_back=False)
 
             # 6. 识别架构模式
             logger.info("识别架构模式...")
@@ -157,15 +562,18 @@ class ProjectGraphGenerator:
 
             # 7. 聚类分析
             logger.info("进行聚类分析...")
-            clusters = self.perform_clustering(graph_nodes, graph_edges)
+            clusters = self.perform_clustering(graph_nodes, graph_edges, graph_arrays)
 
             # 8. 分层布局
             logger.info("计算分层布局...")
-            layers = self.extract_layers(graph_nodes, graph_edges)
+            layers = self.extract_layers(graph_nodes, graph_edges, graph_arrays, write_back=False)
 
             # 9. 生成可视化布局
             logger.info("生成可视化布局...")
-            self.calculate_layout(graph_nodes, graph_edges, clusters, layers)
+            self.calculate_layout(graph_nodes, graph_edges, clusters, layers, graph_arrays, write_back=False)
+
+            # 指标、层级与布局均为列式计算，统一一次写回节点
+            self.write_back_node_columns(graph_nodes, graph_arrays)
 
             # 10. 统计分析
             statistics = self.generate_statistics(graph_nodes, graph_edges)
@@ -201,51 +609,178 @@ class ProjectGraphGenerator:
             raise
 
     def analyze_codebase(self, project_path: str) -> Tuple[List[CodeEntity], List[CodeRelation]]:
-        """分析代码库"""
-        all_entities = []
-        all_relations = []
-
+        """分析代码库 (各文件相互独立，文件较多时多进程并行分析，否则多线程重叠I/O)"""
         # 遍历项目文件
-        for root, dirs, files in os.walk(project_path):
-            # 跳过特定目录
-            dirs[:] = [d for d in dirs if not d.startswith('.') and d != '__pycache__' and d != 'node_modules']
+        tasks = [
+            (file_path, project_path, self.analyzers[ext], self.analysis_cache_dir)
+            for file_path, ext in self._iter_source_files(project_path)
+        ]
+
+        # 计算各文件内容键 (修改时间与大小未变时免读文件)
+        resolved = self._map_io(resolve_task, tasks)
+        results: List[Optional[Tuple[Any, Optional[str]]]] = [
+            None if error is None else (None, error) for _, _, error in resolved
+        ]
 
-            for file in files:
-                file_path = os.path.join(root, file)
-                ext = os.path.splitext(file)[1]
+        # 分析代码 (内容未变的文件直接读取缓存: Redis共享缓存 -> 本地磁盘缓存 -> 重新分析)
+        readable = [index for index, result in enumerate(results) if result is None]
+        if self.redis_client is not None:
+            shared = self.fetch_shared_analyses([resolved[index][0] for index in readable])
+            for index, cached in zip(readable, shared):
+                if cached is not None:
+                    results[index] = (cached, None)
+
+        pending = [index for index in readable if results[index] is None]
+        analyzed = self._run_analysis_tasks(
+            [tasks[index] + (resolved[index][0],) for index in pending],
+            [resolved[index][1] for index in pending]
+        )
 
-                if ext in self.analyzers:
-                    try:
-                        # 读取文件内容
-                        with open(file_path, 'r', encoding='utf-8') as f:
-                            content = f.read()
+        for index, outcome in zip(pending, analyzed):
+            results[index] = outcome
+
+        if self.redis_client is not None:
+            self.store_shared_analyses(
+                (resolved[index][0], results[index][0]) for index in pending if results[index][1] is None
+            )
+
+        entity_parts = []
+        relation_parts = []
+        for task, (result, error) in zip(tasks, results):
+            if error is not None:
+                logger.warning(f"分析文件失败 {task[0]}: {error}")
+                continue
+
+            entity_parts.append(result[0])
+            relation_parts.append(result[1])
+
+        prune_analysis_cache(self.analysis_cache_dir, self.analysis_cache_max_bytes)
+
+        return concat_lists(entity_parts), concat_lists(relation_parts)
+
+    def _map_io(self, func, items: List[Any]) -> List[Any]:
+        """I/O密集任务: 数量较多时以线程池并行，否则串行 (保持输入顺序)"""
+        if len(items) >= self.threaded_min_files and self.io_workers > 1:
+            with ThreadPoolExecutor(max_workers=self.io_workers) as executor:
+                return list(executor.map(func, items))
+        return [func(item) for item in items]
+
+    def _run_analysis_tasks(
+        self,
+        tasks: List[Tuple[Any, ...]],
+        contents: List[Optional[str]]
+    ) -> List[Tuple[Any, Optional[str]]]:
+        """
+        执行单文件分析任务: 文件较多时使用常驻分析进程池，否则线程池/串行
+
+        Args:
+            tasks: 分析任务 (文件路径, 项目路径, 分析器类, 缓存目录, 内容键)
+            contents: 计算内容键时已读取的文件内容 (走stat快速路径时为 None)
+        """
+        if len(tasks) >= self.parallel_min_files and self.analysis_workers > 1:
+            try:
+                # 不向子进程传递文件内容 (避免整份源码经pickle跨进程复制)，磁盘缓存未命中时子进程自行读取
+                return list(get_analysis_pool(self.analysis_workers).map(analyze_task, tasks, chunksize=16))
+            except BrokenProcessPool as e:
+                # 子进程异常退出后进程池不可再用: 丢弃 (下次重建)，本次改用线程池
+                logger.warning(f"分析进程池异常，改用线程池分析: {e}")
+                shutdown_analysis_pool(wait=False)
+
+        return self._map_io(analyze_task, [task + (content,) for task, content in zip(tasks, contents)])
+
+    def _iter_source_files(self, root: str) -> Iterator[Tuple[str, str]]:
+        """
+        遍历项目源文件 (显式栈 + os.scandir，复用目录项缓存的类型信息)
+
+        遍历顺序与 os.walk 自顶向下一致: 先产出当前目录的文件，再按列举顺序深入子目录;
+        跳过隐藏目录、__pycache__、node_modules，不进入符号链接目录
+
+        Yields:
+            (文件路径, 扩展名)
+        """
+        exts = tuple(self.analyzers)
+        stack = [root]
+
+        while stack:
+            try:
+                with os.scandir(stack.pop()) as it:
+                    entries = list(it)
+            except OSError:
+                continue
+
+            subdirs = []
+            for entry in entries:
+                name = entry.name
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+
+                if is_dir:
+                    if (not name.startswith('.') and name != '__pycache__' and name != 'node_modules'
+                            and not entry.is_symlink()):
+                        subdirs.append(entry.path)
+                    continue
 
-                        # 选择合适的分析器
-                        analyzer_class = self.analyzers[ext]
-                        analyzer = analyzer_class(file_path, project_path)
+                if name.endswith(exts):
+                    for ext in exts:
+                        # 与 os.path.splitext 一致: 仅由点号组成的前缀不算扩展名分隔
+                        if name.endswith(ext) and name[:-len(ext)].lstrip('.'):
+                            yield entry.path, ext
+                            break
 
-                        # 分析代码
-                        entities, relations = analyzer.analyze(content)
+            stack.extend(reversed(subdirs))
 
-                        all_entities.extend(entities)
-                        all_relations.extend(relations)
+    def fetch_shared_analyses(self, keys: List[str]) -> List[Optional[Tuple[List[CodeEntity], List[CodeRelation]]]]:
+        """
+        批量查询Redis共享分析缓存 (按批MGET)
+
+        Args:
+            keys: 各文件内容键
 
+        Returns:
+            各文件分析结果，未命中或无法解析时为 None
+        """
+        results: List[Optional[Tuple[List[CodeEntity], List[CodeRelation]]]] = [None] * len(keys)
+        try:
+            for batch in batched(range(len(keys)), ANALYSIS_REDIS_BATCH_SIZE):
+                redis_keys = [ANALYSIS_REDIS_PREFIX + keys[i] for i in batch]
+                for index, cached in zip(batch, self.redis_client.client.mget(redis_keys)):
+                    if cached is None:
+                        continue
+                    try:
+                        results[index] = decode_analysis(cached)
                     except Exception as e:
-                        logger.warning(f"分析文件失败 {file_path}: {e}")
+                        # 无法解析的缓存值视为未命中，重新分析后覆盖
+                        logger.debug(f"解析共享分析缓存失败 {keys[index]}: {e}")
+        except Exception as e:
+            logger.warning(f"读取共享分析缓存失败: {e}")
+
+        return results
 
-        return all_entities, all_relations
+    def store_shared_analyses(self, entries: Iterable[Tuple[str, Any]]) -> None:
+        """批量写入Redis共享分析缓存 (单次往返)"""
+        try:
+            pipe = self.redis_client.client.pipeline(transaction=False)
+            for key, result in entries:
+                pipe.set(ANALYSIS_REDIS_PREFIX + key, encode_analysis(result), ex=ANALYSIS_REDIS_TTL)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"写入共享分析缓存失败: {e}")
 
     def build_nodes(self, entities: List[CodeEntity], project_id: str) -> List[GraphNode]:
         """构建图谱节点"""
         nodes = []
+        # 类型、文件路径、限定名在节点间大量重复，驻留后共享同一字符串对象
+        intern = sys.intern
 
         for entity in entities:
             node = GraphNode(
                 node_id=entity.id,
-                node_type=entity.type,
+                node_type=intern(entity.type),
                 node_name=entity.name,
-                qualified_name=entity.qualified_name,
-                file_path=entity.file_path,
+                qualified_name=intern(entity.qualified_name),
+                file_path=intern(entity.file_path),
                 properties={
                     "line_start": entity.line_number,
                     "line_end": entity.end_line,
@@ -266,11 +801,8 @@ class ProjectGraphGenerator:
 
             nodes.append(node)
 
-            # 添加到NetworkX图
-            self.nx_graph.add_node(
-                entity.id,
-                **asdict(node)
-            )
+            # 添加到NetworkX图 (只保存拓扑，节点数据以 GraphNode 为准)
+            self.nx_graph.add_node(entity.id)
 
         return nodes
 
@@ -282,27 +814,35 @@ class ProjectGraphGenerator:
     ) -> List[GraphEdge]:
         """构建图谱边"""
         edges = []
-        entity_map = {e.id: e for e in entities}
+        entity_ids = {e.id for e in entities}
+        name_index = self.build_entity_name_index(entities)
+        # 同一(源, 目标, 类型)的重复关系只建一条边 (边ID相同，重复写入只会覆盖)
+        seen: Set[Tuple[str, str, str]] = set()
 
         for relation in relations:
             # 验证源和目标节点存在
-            if relation.source_id not in entity_map:
+            if relation.source_id not in entity_ids:
                 # 尝试通过名称查找
-                source_entity = self.find_entity_by_name(relation.source_id, entities)
+                source_entity = name_index.get(relation.source_id)
                 if not source_entity:
                     continue
                 source_id = source_entity.id
             else:
                 source_id = relation.source_id
 
-            if relation.target_id not in entity_map:
-                target_entity = self.find_entity_by_name(relation.target_id, entities)
+            if relation.target_id not in entity_ids:
+                target_entity = name_index.get(relation.target_id)
                 if not target_entity:
                     continue
                 target_id = target_entity.id
             else:
                 target_id = relation.target_id
 
+            key = (source_id, target_id, relation.relation_type)
+            if key in seen:
+                continue
+            seen.add(key)
+
             edge = GraphEdge(
                 edge_id=self.generate_edge_id(source_id, target_id, relation.relation_type),
                 source_id=source_id,
@@ -316,28 +856,85 @@ class ProjectGraphGenerator:
 
             edges.append(edge)
 
-            # 添加到NetworkX图
-            self.nx_graph.add_edge(
-                source_id,
-                target_id,
-                **asdict(edge)
-            )
+            # 添加到NetworkX图 (图算法只需要拓扑与权重)
+            self.nx_graph.add_edge(source_id, target_id, weight=edge.weight)
 
         return edges
 
+    def build_graph_arrays(self, nodes: List[GraphNode], edges: List[GraphEdge]) -> GraphArrays:
+        """
+        构建图谱的列式表示 (节点编号 + CSR邻接)
+
+        Args:
+            nodes: 图谱节点
+            edges: 图谱边
+
+        Returns:
+            列式图谱
+        """
+        node_index: Dict[str, int] = {}
+        for node in nodes:
+            node_index.setdefault(node.node_id, len(node_index))
+
+        # 同一(源, 目标)的重复边以最后一条为准
+        edge_weights: Dict[Tuple[int, int], float] = {}
+        for edge in edges:
+            source = node_index.get(edge.source_id)
+            target = node_index.get(edge.target_id)
+            if source is not None and target is not None:
+                edge_weights[(source, target)] = edge.weight
+
+        num_nodes = len(node_index)
+        pairs = np.array(list(edge_weights), dtype=np.int32).reshape(-1, 2)
+        weights = np.fromiter(edge_weights.values(), dtype=np.float32, count=len(edge_weights))
+
+        order = np.argsort(pairs[:, 0], kind="stable")
+        sources = pairs[order, 0]
+        indptr = np.zeros(num_nodes + 1, dtype=np.int32)
+        np.cumsum(np.bincount(sources, minlength=num_nodes), out=indptr[1:])
+
+        return GraphArrays(
+            node_ids=list(node_index),
+            node_index=node_index,
+            sources=sources,
+            targets=pairs[order, 1],
+            weights=weights[order],
+            indptr=indptr
+        )
+
     # ============================================
     # 增强功能
     # ============================================
 
     def enhance_with_semantics(self, nodes: List[GraphNode]) -> None:
         """增强语义信息"""
-        for node in nodes:
-            # 生成语义嵌入
-            text = f"{node.node_name} {node.properties.get('docstring', '')}"
-            embedding = self.embedding_service.encode_single(text)
+        if not nodes:
+            return
 
-            # 存储嵌入(简化为前10维)
-            node.properties["embedding"] = embedding[:10].tolist()
+        # 生成语义嵌入 (需要编码的节点一次批量编码)
+        texts = [f"{node.node_name} {node.properties.get('docstring') or ''}" for node in nodes]
+        # 过短的文本(无文档的短名称)几乎不含语义信息，不送入模型
+        encode_indices = [i for i, text in enumerate(texts) if len(text.strip()) >= MIN_EMBEDDING_TEXT_LENGTH]
+
+        embeddings: List[Optional[np.ndarray]] = [None] * len(nodes)
+        prefixes: List[List[float]] = [[0.0] * 10 for _ in nodes]
+        if encode_indices:
+            encoded = np.asarray(
+                self.embedding_service.encode_batch(
+                    [texts[i] for i in encode_indices],
+                    batch_size=self.embedding_batch_size
+                ),
+                dtype=np.float32
+            )
+            # 节点属性中的嵌入简化为前10维 (随可视化数据下发)，整块切片后一次转换为列表
+            for i, embedding, prefix in zip(encode_indices, encoded, encoded[:, :10].tolist()):
+                embeddings[i] = embedding
+                prefixes[i] = prefix
+
+        for node, text, embedding, prefix in zip(nodes, texts, embeddings, prefixes):
+            # 完整嵌入以二进制入库 (未编码的节点不存嵌入)，属性中保留前10维 (未编码时为零向量)
+            node.embedding = embedding
+            node.properties["embedding"] = prefix
 
             # 提取关键词
             node.properties["keywords"] = self.extract_keywords(text)
@@ -351,64 +948,106 @@ class ProjectGraphGenerator:
     def calculate_importance_metrics(
         self,
         nodes: List[GraphNode],
-        edges: List[GraphEdge]
+        edges: List[GraphEdge],
+        arrays: Optional[GraphArrays] = None,
+        write_back: bool = True
     ) -> None:
-        """计算重要性指标"""
-        # 使用PageRank算法
-        if self.nx_graph.number_of_nodes() > 0:
-            try:
-                pagerank = nx.pagerank(self.nx_graph, weight='weight')
+        """
+        计算重要性指标 (PageRank与度数基于列式图谱批量计算)
 
-                for node in nodes:
-                    if node.node_id in pagerank:
-                        node.metrics["importance"] = pagerank[node.node_id]
+        write_back 为 False 时只填充 arrays 的指标列，由调用方统一写回节点
+        """
+        if arrays is None:
+            arrays = self.build_graph_arrays(nodes, edges)
+
+        # 使用PageRank算法 (scipy稀疏矩阵迭代，不可用时回退到NetworkX)
+        if arrays.num_nodes > 0:
+            try:
+                if HAS_SCIPY:
+                    arrays.importance = pagerank_csr(arrays)
+                else:
+                    pagerank = nx.pagerank(self.nx_graph, weight='weight')
+                    arrays.importance = np.fromiter(
+                        (pagerank.get(node_id, 0.0) for node_id in arrays.node_ids),
+                        dtype=np.float64,
+                        count=arrays.num_nodes
+                    )
 
-                        # 更新节点大小
-                        node.size = 1 + node.metrics["importance"] * 5
+                # 更新节点大小
+                arrays.size = 1 + arrays.importance * 5
 
             except Exception as e:
                 logger.warning(f"PageRank计算失败: {e}")
 
         # 计算度中心性
-        in_degree = dict(self.nx_graph.in_degree())
-        out_degree = dict(self.nx_graph.out_degree())
+        in_degree = arrays.in_degree()
+        out_degree = arrays.out_degree()
+
+        # 稳定性：入度高、出度低的节点更稳定 (无出边时取入度)
+        arrays.stability = np.where(
+            out_degree > 0,
+            in_degree / np.maximum(out_degree, 1),
+            in_degree.astype(np.float64)
+        )
+
+        if write_back:
+            self.write_back_node_columns(nodes, arrays)
+
+    def write_back_node_columns(self, nodes: List[GraphNode], arrays: GraphArrays) -> None:
+        """将列式计算结果一次写回节点 (每个节点只访问一次，未计算的列跳过)"""
+        in_degree = arrays.in_degree().tolist()
+        out_degree = arrays.out_degree().tolist()
+        importance = arrays.importance.tolist() if arrays.importance is not None else None
+        size = arrays.size.tolist() if arrays.size is not None else None
+        stability = arrays.stability.tolist() if arrays.stability is not None else None
+        layer = arrays.layer.tolist() if arrays.layer is not None else None
+        layout = arrays.layout.tolist() if arrays.layout is not None else None
+        node_index = arrays.node_index
 
         for node in nodes:
-            node_id = node.node_id
-            node.properties["in_degree"] = in_degree.get(node_id, 0)
-            node.properties["out_degree"] = out_degree.get(node_id, 0)
+            index = node_index[node.node_id]
+            if importance is not None:
+                node.metrics["importance"] = importance[index]
+                node.size = size[index]
 
-            # 稳定性：入度高、出度低的节点更稳定
-            if node.properties["out_degree"] > 0:
-                node.metrics["stability"] = node.properties["in_degree"] / node.properties["out_degree"]
-            else:
-                node.metrics["stability"] = float(node.properties["in_degree"])
+            node.properties["in_degree"] = in_degree[index]
+            node.properties["out_degree"] = out_degree[index]
+            if stability is not None:
+                node.metrics["stability"] = stability[index]
+
+            if layer is not None:
+                node.properties["layer"] = layer[index]
+
+            if layout is not None:
+                x, y = layout[index]
+                node.position = (x, y, (layer[index] if layer is not None else 0) * 10)  # Z轴表示层级
 
     def identify_architectural_patterns(
         self,
         nodes: List[GraphNode],
         edges: List[GraphEdge]
     ) -> List[Dict[str, Any]]:
-        """识别架构模式"""
+        """识别架构模式 (节点名称只扫描一次，各检测共享关键词索引)"""
         patterns = []
+        name_index = self.index_name_keywords(nodes)
 
         # 1. 识别MVC模式
-        mvc_pattern = self.detect_mvc_pattern(nodes)
+        mvc_pattern = self.detect_mvc_pattern(nodes, name_index)
         if mvc_pattern:
             patterns.append(mvc_pattern)
 
         # 2. 识别分层架构
-        layered_pattern = self.detect_layered_architecture(nodes)
+        layered_pattern = self.detect_layered_architecture(nodes, name_index)
         if layered_pattern:
             patterns.append(layered_pattern)
 
         # 3. 识别微服务
-        microservice_pattern = self.detect_microservices(nodes, edges)
+        microservice_pattern = self.detect_microservices(nodes, edges, name_index)
         if microservice_pattern:
             patterns.append(microservice_pattern)
 
         # 4. 识别设计模式
-        design_patterns = self.detect_design_patterns(nodes, edges)
+        design_patterns = self.detect_design_patterns(nodes, edges, name_index)
         patterns.extend(design_patterns)
 
         return patterns
@@ -416,16 +1055,22 @@ class ProjectGraphGenerator:
     def perform_clustering(
         self,
         nodes: List[GraphNode],
-        edges: List[GraphEdge]
+        edges: List[GraphEdge],
+        arrays: Optional[GraphArrays] = None
     ) -> List[Dict[str, Any]]:
-        """聚类分析"""
+        """聚类分析 (优先使用igraph的C实现Louvain，未安装时回退到python-louvain)"""
         clusters = []
 
         try:
             # 使用Louvain算法进行社区发现
             if self.nx_graph.number_of_nodes() > 0:
-                import community
-                partition = community.best_partition(self.nx_graph.to_undirected())
+                if HAS_IGRAPH:
+                    if arrays is None:
+                        arrays = self.build_graph_arrays(nodes, edges)
+                    partition = louvain_partition(arrays)
+                else:
+                    import community
+                    partition = community.best_partition(self.nx_graph.to_undirected())
 
                 # 整理聚类结果
                 cluster_map = {}
@@ -434,9 +1079,14 @@ class ProjectGraphGenerator:
                         cluster_map[cluster_id] = []
                     cluster_map[cluster_id].append(node_id)
 
+                cluster_members: Dict[Any, List[GraphNode]] = {}
+                for node in nodes:
+                    if node.node_id in partition:
+                        cluster_members.setdefault(partition[node.node_id], []).append(node)
+
                 # 为每个聚类生成信息
                 for cluster_id, node_ids in cluster_map.items():
-                    cluster_nodes = [n for n in nodes if n.node_id in node_ids]
+                    cluster_nodes = cluster_members.get(cluster_id, [])
 
                     if cluster_nodes:
                         cluster = {
@@ -463,37 +1113,40 @@ class ProjectGraphGenerator:
     def extract_layers(
         self,
         nodes: List[GraphNode],
-        edges: List[GraphEdge]
+        edges: List[GraphEdge],
+        arrays: Optional[GraphArrays] = None,
+        write_back: bool = True
     ) -> List[Dict[str, Any]]:
-        """提取分层结构"""
+        """
+        提取分层结构
+
+        传入 arrays 时同时填充层级列; write_back 为 False 时不写回节点
+        """
         layers = []
 
         # 基于文件路径和模块结构分层
         layer_map = {}
+        layer_column = np.zeros(arrays.num_nodes, dtype=np.int64) if arrays is not None else None
+        type_layers = self._TYPE_LAYERS
+        max_depth = self.max_depth
 
         for node in nodes:
-            # 根据路径深度确定层级
-            path_parts = node.file_path.split(os.sep)
-            depth = len(path_parts) - 1
-
-            # 根据节点类型调整层级
-            if node.node_type == "module":
-                layer = 0
-            elif node.node_type == "class":
-                layer = 1
-            elif node.node_type in ["function", "method"]:
-                layer = 2
-            else:
-                layer = 3
-
-            layer = min(layer + depth, self.max_depth)
+            # 根据路径深度确定层级，再按节点类型调整
+            layer = min(type_layers.get(node.node_type, 3) + node.file_path.count(os.sep), max_depth)
 
             if layer not in layer_map:
                 layer_map[layer] = []
             layer_map[layer].append(node.node_id)
 
+            if layer_column is not None:
+                layer_column[arrays.node_index[node.node_id]] = layer
+
             # 更新节点层级
-            node.properties["layer"] = layer
+            if write_back:
+                node.properties["layer"] = layer
+
+        if arrays is not None:
+            arrays.layer = layer_column
 
         # 生成层级信息
         for layer_idx, node_ids in sorted(layer_map.items()):
@@ -513,39 +1166,53 @@ class ProjectGraphGenerator:
         nodes: List[GraphNode],
         edges: List[GraphEdge],
         clusters: List[Dict[str, Any]],
-        layers: List[Dict[str, Any]]
+        layers: List[Dict[str, Any]],
+        arrays: Optional[GraphArrays] = None,
+        write_back: bool = True
     ) -> None:
-        """计算可视化布局"""
+        """
+        计算可视化布局 (Numba可用时在列式图谱上编译执行，否则使用NetworkX)
+
+        结果写入 arrays 的布局列; write_back 为 False 时不写回节点
+        """
         if self.nx_graph.number_of_nodes() == 0:
             return
 
+        if arrays is None:
+            arrays = self.build_graph_arrays(nodes, edges)
+
         # 使用spring layout作为基础
-        pos = nx.spring_layout(
-            self.nx_graph,
-            k=2,
-            iterations=50,
-            weight='weight',
-            scale=100
-        )
+        if HAS_NUMBA:
+            xy = spring_layout_csr(arrays, k=2, iterations=50, scale=100)
+        else:
+            pos = nx.spring_layout(
+                self.nx_graph,
+                k=2,
+                iterations=50,
+                weight='weight',
+                scale=100
+            )
+            xy = np.array([pos[node_id] for node_id in arrays.node_ids], dtype=np.float64).reshape(-1, 2)
+
+        # 节点层级 (未经 extract_layers 填充时取节点属性)
+        if arrays.layer is None:
+            arrays.layer = np.zeros(arrays.num_nodes, dtype=np.int64)
+            for node in nodes:
+                arrays.layer[arrays.node_index[node.node_id]] = node.properties.get("layer", 0)
 
         # 应用层级约束
         layer_y_positions = {}
         for i, layer in enumerate(layers):
             layer_y_positions[layer["level"]] = i * 50
 
-        # 更新节点位置
-        for node in nodes:
-            node_id = node.node_id
-            if node_id in pos:
-                x, y = pos[node_id]
-                layer = node.properties.get("layer", 0)
-                z = layer * 10  # Z轴表示层级
-
-                # 应用层级Y坐标
-                if layer in layer_y_positions:
-                    y = layer_y_positions[layer] + y * 10
+        # 应用层级Y坐标 (按层级去重后查表，无对应层级的节点保持原Y)
+        levels, inverse = np.unique(arrays.layer, return_inverse=True)
+        base_y = np.array([layer_y_positions.get(level, np.nan) for level in levels.tolist()])[inverse]
+        y = np.where(np.isnan(base_y), xy[:, 1], base_y + xy[:, 1] * 10)
+        arrays.layout = np.column_stack((xy[:, 0] * 100, y))
 
-                node.position = (x * 100, y, z)
+        if write_back:
+            self.write_back_node_columns(nodes, arrays)
 
     # ============================================
     # 可视化生成
@@ -621,47 +1288,53 @@ class ProjectGraphGenerator:
         return heatmap_data
 
     def create_navigation_tree(self, graph: ProjectGraph) -> Dict[str, Any]:
-        """创建导航树"""
+        """创建导航树 (按文件分组后逐文件插入目录树，每个文件只切分一次路径)"""
         tree = {
             "name": "root",
             "children": []
         }
 
-        # 按文件路径组织树结构
-        path_tree = {}
+        # 按文件路径分组节点
+        files: Dict[str, List[Dict[str, Any]]] = {}
         for node in graph.nodes:
-            parts = node.file_path.split(os.sep)
-
-            current = path_tree
-            for part in parts[:-1]:
-                if part not in current:
-                    current[part] = {}
-                current = current[part]
-
-            # 添加节点
-            file_name = parts[-1] if parts else node.node_name
-            if file_name not in current:
-                current[file_name] = []
-            current[file_name].append({
+            files.setdefault(node.file_path, []).append({
                 "id": node.node_id,
                 "name": node.node_name,
                 "type": node.node_type
             })
 
-        # 转换为树形结构
-        def build_tree(data, name="root"):
-            children = []
-            for key, value in data.items():
-                if isinstance(value, dict):
-                    children.append(build_tree(value, key))
-                else:
-                    children.append({
-                        "name": key,
-                        "nodes": value
-                    })
-            return {"name": name, "children": children}
+        # 目录路径 -> 树节点
+        directories: Dict[str, Dict[str, Any]] = {}
+
+        def get_directory(dir_path: str) -> Dict[str, Any]:
+            """获取目录树节点，自下而上找到已存在的祖先后依次补建缺失的目录"""
+            missing = []
+            path = dir_path
+            while path not in directories:
+                missing.append(path)
+                parent_path, sep, _ = path.rpartition(os.sep)
+                if not sep:
+                    parent = tree
+                    break
+                path = parent_path
+            else:
+                parent = directories[path]
+
+            for path in reversed(missing):
+                entry = {"name": path.rpartition(os.sep)[2], "children": []}
+                parent["children"].append(entry)
+                directories[path] = entry
+                parent = entry
+            return parent
+
+        for file_path, file_nodes in files.items():
+            dir_path, sep, file_name = file_path.rpartition(os.sep)
+            parent = get_directory(dir_path) if sep else tree
+            parent["children"].append({
+                "name": file_name,
+                "nodes": file_nodes
+            })
 
-        tree = build_tree(path_tree)
         return tree
 
     # ============================================
@@ -674,106 +1347,61 @@ class ProjectGraphGenerator:
         nodes: List[GraphNode],
         edges: List[GraphEdge]
     ) -> None:
-        """存储图谱到数据库"""
+        """存储图谱到数据库 (节点、边各按批 executemany)"""
+        node_params = (
+            {
+                "node_id": node.node_id,
+                "project_id": project_id,
+                "node_type": node.node_type,
+                "node_name": node.node_name,
+                "node_path": node.file_path,
+                "qualified_name": node.qualified_name,
+                "file_path": node.file_path,
+                "line_start": node.properties.get("line_start"),
+                "line_end": node.properties.get("line_end"),
+                "properties": json_text(node.properties),
+                "docstring": node.properties.get("docstring"),
+                "signature": node.properties.get("signature"),
+                "complexity": node.metrics["complexity"],
+                "importance": node.metrics["importance"],
+                "stability": node.metrics["stability"],
+                "in_degree": node.properties.get("in_degree", 0),
+                "out_degree": node.properties.get("out_degree", 0),
+                "centrality": node.metrics["importance"],
+                "x": node.position[0],
+                "y": node.position[1],
+                "z": node.position[2],
+                "cluster_id": node.cluster_id,
+                "color": node.color,
+                "size": node.size,
+                "embedding": encode_embedding(node.embedding) if node.embedding is not None else None
+            }
+            for node in nodes
+        )
+        edge_params = (
+            {
+                "edge_id": edge.edge_id,
+                "project_id": project_id,
+                "source": edge.source_id,
+                "target": edge.target_id,
+                "edge_type": edge.edge_type,
+                "weight": edge.weight,
+                "confidence": 1.0,
+                "metadata": json_text(edge.properties or {}),
+                "style": edge.style,
+                "color": edge.color
+            }
+            for edge in edges
+        )
+
         with self.SessionLocal() as session:
             # 存储节点
-            for node in nodes:
-                embedding_json = json.dumps(node.properties.get("embedding", []))
-
-                session.execute(
-                    """
-                    INSERT INTO graph_nodes (
-                        node_id, project_id, node_type, node_name,
-                        node_path, qualified_name, file_path,
-                        line_start, line_end,
-                        properties, docstring, signature,
-                        complexity_score, importance_score, stability_score,
-                        in_degree, out_degree, centrality,
-                        layout_x, layout_y, layout_z,
-                        cluster_id, color, size,
-                        embedding
-                    ) VALUES (
-                        :node_id, :project_id, :node_type, :node_name,
-                        :node_path, :qualified_name, :file_path,
-                        :line_start, :line_end,
-                        :properties, :docstring, :signature,
-                        :complexity, :importance, :stability,
-                        :in_degree, :out_degree, :centrality,
-                        :x, :y, :z,
-                        :cluster_id, :color, :size,
-                        :embedding
-                    )
-                    ON DUPLICATE KEY UPDATE
-                        properties = :properties,
-                        complexity_score = :complexity,
-                        importance_score = :importance,
-                        stability_score = :stability,
-                        layout_x = :x, layout_y = :y, layout_z = :z,
-                        cluster_id = :cluster_id,
-                        updated_at = NOW()
-                    """,
-                    {
-                        "node_id": node.node_id,
-                        "project_id": project_id,
-                        "node_type": node.node_type,
-                        "node_name": node.node_name,
-                        "node_path": node.file_path,
-                        "qualified_name": node.qualified_name,
-                        "file_path": node.file_path,
-                        "line_start": node.properties.get("line_start"),
-                        "line_end": node.properties.get("line_end"),
-                        "properties": json.dumps(node.properties),
-                        "docstring": node.properties.get("docstring"),
-                        "signature": node.properties.get("signature"),
-                        "complexity": node.metrics["complexity"],
-                        "importance": node.metrics["importance"],
-                        "stability": node.metrics["stability"],
-                        "in_degree": node.properties.get("in_degree", 0),
-                        "out_degree": node.properties.get("out_degree", 0),
-                        "centrality": node.metrics["importance"],
-                        "x": node.position[0],
-                        "y": node.position[1],
-                        "z": node.position[2],
-                        "cluster_id": node.cluster_id,
-                        "color": node.color,
-                        "size": node.size,
-                        "embedding": embedding_json
-                    }
-                )
+            for batch in batched(node_params, STORE_BATCH_SIZE):
+                session.execute(_Q_UPSERT_NODE, batch)
 
             # 存储边
-            for edge in edges:
-                session.execute(
-                    """
-                    INSERT INTO graph_edges (
-                        edge_id, project_id,
-                        source_node_id, target_node_id, edge_type,
-                        weight, confidence,
-                        metadata, edge_style, edge_color
-                    ) VALUES (
-                        :edge_id, :project_id,
-                        :source, :target, :edge_type,
-                        :weight, :confidence,
-                        :metadata, :style, :color
-                    )
-                    ON DUPLICATE KEY UPDATE
-                        weight = :weight,
-                        metadata = :metadata,
-                        updated_at = NOW()
-                    """,
-                    {
-                        "edge_id": edge.edge_id,
-                        "project_id": project_id,
-                        "source": edge.source_id,
-                        "target": edge.target_id,
-                        "edge_type": edge.edge_type,
-                        "weight": edge.weight,
-                        "confidence": 1.0,
-                        "metadata": json.dumps(edge.properties or {}),
-                        "style": edge.style,
-                        "color": edge.color
-                    }
-                )
+            for batch in batched(edge_params, STORE_BATCH_SIZE):
+                session.execute(_Q_UPSERT_EDGE, batch)
 
             session.commit()
             logger.info(f"存储图谱: {len(nodes)} 节点, {len(edges)} 边")
@@ -796,103 +1424,113 @@ class ProjectGraphGenerator:
 
     def get_node_color(self, node_type: str) -> str:
         """获取节点颜色"""
-        colors = {
-            "module": "#FF6B6B",
-            "class": "#4ECDC4",
-            "function": "#45B7D1",
-            "method": "#96CEB4",
-            "variable": "#FFEAA7",
-            "import": "#DDA0DD"
-        }
-        return colors.get(node_type, "#95A5A6")
+        return self._NODE_COLORS.get(node_type, "#95A5A6")
 
     def get_node_size(self, node_type: str) -> float:
         """获取节点大小"""
-        sizes = {
-            "module": 3.0,
-            "class": 2.5,
-            "function": 2.0,
-            "method": 1.8,
-            "variable": 1.0
-        }
-        return sizes.get(node_type, 1.0)
+        return self._NODE_SIZES.get(node_type, 1.0)
 
     def get_edge_style(self, edge_type: str) -> str:
         """获取边样式"""
-        styles = {
-            "inherits": "dashed",
-            "implements": "dotted",
-            "calls": "solid",
-            "imports": "solid",
-            "contains": "solid"
-        }
-        return styles.get(edge_type, "solid")
+        return self._EDGE_STYLES.get(edge_type, "solid")
 
     def get_edge_color(self, edge_type: str) -> str:
         """获取边颜色"""
-        colors = {
-            "inherits": "#E74C3C",
-            "implements": "#3498DB",
-            "calls": "#2ECC71",
-            "imports": "#F39C12",
-            "contains": "#95A5A6"
-        }
-        return colors.get(edge_type, "#BDC3C7")
+        return self._EDGE_COLORS.get(edge_type, "#BDC3C7")
 
     def calculate_edge_weight(self, relation: CodeRelation) -> float:
         """计算边权重"""
-        # 基于关系类型的基础权重
-        base_weights = {
-            "inherits": 3.0,
-            "implements": 2.5,
-            "calls": 1.5,
-            "imports": 1.0,
-            "contains": 2.0,
-            "uses": 1.0
-        }
-        return base_weights.get(relation.relation_type, 1.0)
+        return self._EDGE_WEIGHTS.get(relation.relation_type, 1.0)
+
+    def build_entity_name_index(self, entities: List[CodeEntity]) -> Dict[str, CodeEntity]:
+        """
+        构建名称/限定名 -> 实体索引
 
-    def find_entity_by_name(self, name: str, entities: List[CodeEntity]) -> Optional[CodeEntity]:
-        """通过名称查找实体"""
+        同名时保留列表中第一个匹配的实体，与逐个扫描的查找顺序一致
+        """
+        index: Dict[str, CodeEntity] = {}
         for entity in entities:
-            if entity.name == name or entity.qualified_name == name:
-                return entity
-        return None
+            index.setdefault(entity.name, entity)
+            index.setdefault(entity.qualified_name, entity)
+        return index
 
     def extract_keywords(self, text: str) -> List[str]:
         """提取关键词"""
-        import re
-        words = re.findall(r'\b\w+\b', text.lower())
-        stopwords = {'the', 'is', 'at', 'which', 'on', 'and', 'a', 'an', 'as', 'are', 'was', 'were', 'in', 'of', 'to'}
-        keywords = [w for w in words if w not in stopwords and len(w) > 2]
-        return list(set(keywords))[:10]
+        words = _WORD_RE.findall(text.lower())
+        keywords = {w for w in words if len(w) > 2 and w not in _KEYWORD_STOPWORDS}
+        return list(keywords)[:10]
 
     def calculate_code_complexity(self, code: str) -> float:
-        """计算代码复杂度"""
+        """计算代码复杂度 (一次正则扫描统计全部控制流标记)"""
         # 简化的复杂度计算
         complexity = 1.0
 
-        # 条件语句
-        complexity += code.count('if ') * 0.5
-        complexity += code.count('elif ') * 0.3
-        complexity += code.count('else:') * 0.2
+        tokens = _COMPLEXITY_TOKEN_RE.findall(code)
+        if not tokens:
+            return complexity
+
+        counts = dict.fromkeys(_COMPLEXITY_TOKENS, 0)
+        for token in tokens:
+            counts[token] += 1
+
+        # 条件语句 ('elif ' 同时计入 'if ')
+        complexity += (counts['if '] + counts['elif ']) * 0.5
+        complexity += counts['elif '] * 0.3
+        complexity += counts['else:'] * 0.2
 
         # 循环
-        complexity += code.count('for ') * 0.8
-        complexity += code.count('while ') * 0.8
+        complexity += counts['for '] * 0.8
+        complexity += counts['while '] * 0.8
 
         # 异常处理
-        complexity += code.count('try:') * 0.3
-        complexity += code.count('except ') * 0.3
+        complexity += counts['try:'] * 0.3
+        complexity += counts['except '] * 0.3
 
         return min(complexity, 10.0)
 
-    def detect_mvc_pattern(self, nodes: List[GraphNode]) -> Optional[Dict[str, Any]]:
+    def index_name_keywords(self, nodes: List[GraphNode]) -> Dict[str, List[int]]:
+        """
+        一次扫描建立节点名称关键词索引
+
+        Returns:
+            {关键词: 名称(小写)包含该关键词的节点下标，升序}
+        """
+        index: Dict[str, List[int]] = {keyword: [] for keyword in _PATTERN_KEYWORDS}
+        search = _PATTERN_KEYWORD_RE.search
+        for i, node in enumerate(nodes):
+            name = node.node_name.lower()
+            if search(name):
+                for keyword in _PATTERN_KEYWORDS:
+                    if keyword in name:
+                        index[keyword].append(i)
+        return index
+
+    def select_by_keywords(
+        self,
+        nodes: List[GraphNode],
+        name_index: Dict[str, List[int]],
+        *keywords: str
+    ) -> List[GraphNode]:
+        """名称包含任一关键词的节点 (保持原顺序)"""
+        if len(keywords) == 1:
+            indices = name_index[keywords[0]]
+        else:
+            indices = sorted(set().union(*(name_index[keyword] for keyword in keywords)))
+        return [nodes[i] for i in indices]
+
+    def detect_mvc_pattern(
+        self,
+        nodes: List[GraphNode],
+        name_index: Optional[Dict[str, List[int]]] = None
+    ) -> Optional[Dict[str, Any]]:
         """检测MVC模式"""
+        if name_index is None:
+            name_index = self.index_name_keywords(nodes)
+
         # 查找Model、View、Controller相关节点
-        models = [n for n in nodes if 'model' in n.node_name.lower()]
-        views = [n for n in nodes if 'view' in n.node_name.lower()]
-        controllers = [n for n in nodes if 'controller' in n.node_name.lower()]
+        models = self.select_by_keywords(nodes, name_index, 'model')
+        views = self.select_by_keywords(nodes, name_index, 'view')
+        controllers = self.select_by_keywords(nodes, name_index, 'controller')
 
         if models and views and controllers:
             return {
@@ -906,22 +1544,20 @@ class ProjectGraphGenerator:
             }
         return None
 
-    def detect_layered_architecture(self, nodes: List[GraphNode]) -> Optional[Dict[str, Any]]:
+    def detect_layered_architecture(
+        self,
+        nodes: List[GraphNode],
+        name_index: Optional[Dict[str, List[int]]] = None
+    ) -> Optional[Dict[str, Any]]:
         """检测分层架构"""
+        if name_index is None:
+            name_index = self.index_name_keywords(nodes)
+
         # 查找典型的分层名称
         layers_found = {}
-        layer_keywords = {
-            "presentation": ["ui", "view", "frontend", "web"],
-            "business": ["service", "business", "logic", "domain"],
-            "data": ["repository", "dao", "database", "model"]
-        }
 
-        for layer_name, keywords in layer_keywords.items():
-            layer_nodes = []
-            for node in nodes:
-                node_lower = node.node_name.lower()
-                if any(kw in node_lower for kw in keywords):
-                    layer_nodes.append(node.node_id)
+        for layer_name, keywords in _LAYER_KEYWORDS.items():
+            layer_nodes = [n.node_id for n in self.select_by_keywords(nodes, name_index, *keywords)]
             if layer_nodes:
                 layers_found[layer_name] = layer_nodes
 
@@ -936,11 +1572,15 @@ class ProjectGraphGenerator:
     def detect_microservices(
         self,
         nodes: List[GraphNode],
-        edges: List[GraphEdge]
+        edges: List[GraphEdge],
+        name_index: Optional[Dict[str, List[int]]] = None
     ) -> Optional[Dict[str, Any]]:
         """检测微服务模式"""
+        if name_index is None:
+            name_index = self.index_name_keywords(nodes)
+
         # 查找服务相关节点
-        services = [n for n in nodes if 'service' in n.node_name.lower()]
+        services = self.select_by_keywords(nodes, name_index, 'service')
 
         if len(services) >= 3:
             # 检查服务间的低耦合
@@ -963,13 +1603,21 @@ class ProjectGraphGenerator:
     def detect_design_patterns(
         self,
         nodes: List[GraphNode],
-        edges: List[GraphEdge]
+        edges: List[GraphEdge],
+        name_index: Optional[Dict[str, List[int]]] = None
     ) -> List[Dict[str, Any]]:
         """检测设计模式"""
+        if name_index is None:
+            name_index = self.index_name_keywords(nodes)
+
         patterns = []
 
-        # Singleton模式
-        singletons = [n for n in nodes if 'singleton' in n.node_name.lower() or 'instance' in n.properties.get('signature', '').lower()]
+        # Singleton模式 (名称含singleton，或签名含instance)
+        singleton_indices = set(name_index['singleton'])
+        singletons = [
+            n for i, n in enumerate(nodes)
+            if i in singleton_indices or 'instance' in (n.properties.get('signature') or '').lower()
+        ]
         if singletons:
             patterns.append({
                 "pattern": "Singleton",
@@ -977,7 +1625,7 @@ class ProjectGraphGenerator:
             })
 
         # Factory模式
-        factories = [n for n in nodes if 'factory' in n.node_name.lower()]
+        factories = self.select_by_keywords(nodes, name_index, 'factory')
         if factories:
             patterns.append({
                 "pattern": "Factory",
@@ -985,7 +1633,7 @@ class ProjectGraphGenerator:
             })
 
         # Observer模式
-        observers = [n for n in nodes if 'observer' in n.node_name.lower() or 'listener' in n.node_name.lower()]
+        observers = self.select_by_keywords(nodes, name_index, 'observer', 'listener')
         if observers:
             patterns.append({
                 "pattern": "Observer",
@@ -1024,10 +1672,11 @@ class ProjectGraphGenerator:
         """计算聚类内聚度"""
         internal_edges = 0
         external_edges = 0
+        members = set(node_ids)
 
         for edge in edges:
-            source_in = edge.source_id in node_ids
-            target_in = edge.target_id in node_ids
+            source_in = edge.source_id in members
+            target_in = edge.target_id in members
 
             if source_in and target_in:
                 internal_edges += 1
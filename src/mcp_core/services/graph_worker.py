@@ -0,0 +1,203 @@
+"""
+图谱生成工作进程 - 后台生成图谱并写入Redis缓存
+工作进程以spawn方式启动，只导入本模块与图谱生成器，不加载API路由、学习系统与协同控制
+"""
+
+import atexit
+import hashlib
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from enum import Enum
+from typing import Any, Dict, Optional, Tuple
+
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    import json
+    HAS_ORJSON = False
+
+try:
+    import zstandard
+    HAS_ZSTD = True
+except ImportError:
+    HAS_ZSTD = False
+
+from ..common.logger import get_logger
+from ..services.graph_generator import get_graph_generator
+
+logger = get_logger(__name__)
+
+# ============================================
+# 响应体与缓存编码
+# ============================================
+
+def _json_default(obj: Any) -> Any:
+    """标准库json回退时的类型转换，输出与orjson一致 (datetime为ISO 8601，Enum取值)"""
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    if isinstance(obj, Enum):
+        return obj.value
+    return str(obj)
+
+
+def json_dumps(obj: Any) -> bytes:
+    """序列化为JSON字节 (优先orjson，在C层直接编码numpy、datetime与Enum)"""
+    if HAS_ORJSON:
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, ensure_ascii=False, default=_json_default).encode("utf-8")
+
+
+def graph_cache_key(project_id: str) -> str:
+    """图谱缓存键 (值为完整的响应体JSON)"""
+    return f"graph:body:{project_id}"
+
+
+def graph_etag_key(project_id: str) -> str:
+    """图谱ETag缓存键 (缓存内容的BLAKE2b摘要)"""
+    return f"graph:etag:{project_id}"
+
+
+def graph_stats_key(project_id: str) -> str:
+    """图谱统计缓存键 (Redis Hash)"""
+    return f"graph:stats:{project_id}"
+
+
+# 图谱缓存值首字节为格式标记，便于日后更换编码
+CACHE_RAW = b"\x00"
+CACHE_ZSTD = b"\x01"
+ZSTD_LEVEL = 3
+
+# 图谱缓存有效期 (秒)
+GRAPH_CACHE_TTL = 86400
+
+
+def compress_graph_body(body: bytes) -> bytes:
+    """压缩图谱响应体用于缓存 (zstd可用时压缩，否则原样加标记)"""
+    if HAS_ZSTD:
+        return CACHE_ZSTD + zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(body)
+    return CACHE_RAW + body
+
+
+def compute_etag(payload: bytes) -> str:
+    """计算缓存内容的ETag (BLAKE2b，比SHA256更快)"""
+    return hashlib.blake2b(payload, digest_size=16).hexdigest()
+
+
+def compute_graph_statistics(graph) -> Dict[str, Any]:
+    """
+    由生成结果直接计算统计信息，口径与 get_graph_statistics 的SQL一致
+
+    节点按 node_id 去重，与入库的 upsert 相同: 类型保留首次写入的值，复杂度与重要性取最后一次写入的值
+    """
+    rows: Dict[str, Tuple[str, float, float]] = {}
+    for node in graph.nodes:
+        stored = rows.get(node.node_id)
+        rows[node.node_id] = (
+            stored[0] if stored is not None else node.node_type,
+            float(node.metrics.get("complexity", 0.0)),
+            float(node.metrics.get("importance", 0.0))
+        )
+
+    node_types = [node_type for node_type, _, _ in rows.values()]
+    complexities = [complexity for _, complexity, _ in rows.values()]
+    importances = [importance for _, _, importance in rows.values()]
+
+    return {
+        "total_nodes": len(rows),
+        "class_count": node_types.count("class"),
+        "function_count": node_types.count("function"),
+        "avg_complexity": sum(complexities) / len(complexities) if complexities else 0.0,
+        "max_importance": max(importances) if importances else 0.0
+    }
+
+
+def encode_graph_body(project_id: str, visualization: Dict[str, Any]) -> bytes:
+    """编码图谱响应体 (含外层信封)，缓存命中时可原样返回"""
+    return json_dumps({
+        "success": True,
+        "project_id": project_id,
+        "graph": visualization
+    })
+
+# ============================================
+# 图谱生成进程池
+# ============================================
+
+# 图谱生成进程数 (每个进程持有独立的生成器、数据库连接与Redis连接)
+GRAPH_WORKER_PROCESSES = 2
+
+_graph_worker_pool: Optional[ProcessPoolExecutor] = None
+_graph_worker_lock = threading.Lock()
+
+
+def _init_graph_worker() -> None:
+    """工作进程初始化: 创建生成器，文件分析改用线程池，不在工作进程内再嵌套分析进程池"""
+    get_graph_generator().analysis_workers = 1
+
+
+def get_graph_worker_pool() -> ProcessPoolExecutor:
+    """获取图谱生成进程池 (懒创建，spawn方式避免fork继承连接与线程)"""
+    global _graph_worker_pool
+    with _graph_worker_lock:
+        if _graph_worker_pool is None:
+            _graph_worker_pool = ProcessPoolExecutor(
+                max_workers=GRAPH_WORKER_PROCESSES,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_graph_worker
+            )
+        return _graph_worker_pool
+
+
+def shutdown_graph_worker_pool(wait: bool = True) -> None:
+    """关闭图谱生成进程池 (服务关闭时调用，未开始的任务直接取消)"""
+    global _graph_worker_pool
+    with _graph_worker_lock:
+        pool, _graph_worker_pool = _graph_worker_pool, None
+    if pool is not None:
+        pool.shutdown(wait=wait, cancel_futures=True)
+
+
+atexit.register(shutdown_graph_worker_pool)
+
+
+def generate_graph_job(
+    project_path: str,
+    project_id: Optional[str],
+    max_depth: int,
+    min_importance: float
+) -> str:
+    """
+    在工作进程中生成图谱并写入Redis缓存
+
+    Args:
+        project_path: 项目路径
+        project_id: 项目ID
+        max_depth: 最大分析深度
+        min_importance: 最小重要性阈值
+
+    Returns:
+        项目ID
+    """
+    graph_generator = get_graph_generator()
+    graph_generator.max_depth = max_depth
+    graph_generator.min_importance = min_importance
+
+    graph, visualization = graph_generator.generate_graph(project_path, project_id)
+
+    # 存储结果与统计信息到Redis (一次往返)
+    stats_key = graph_stats_key(graph.project_id)
+    payload = encode_graph_body(graph.project_id, visualization)
+    pipe = graph_generator.redis_client.client.pipeline(transaction=False)
+    pipe.set(graph_cache_key(graph.project_id), compress_graph_body(payload), ex=GRAPH_CACHE_TTL)
+    pipe.set(graph_etag_key(graph.project_id), compute_etag(payload), ex=GRAPH_CACHE_TTL)
+    pipe.delete(stats_key)
+    pipe.hset(stats_key, mapping={
+        name: str(value) for name, value in compute_graph_statistics(graph).items()
+    })
+    pipe.expire(stats_key, GRAPH_CACHE_TTL)
+    pipe.execute()
+
+    return graph.project_id
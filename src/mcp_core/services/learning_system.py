@@ -18,6 +18,7 @@ from ..common.config import get_settings
 from ..common.logger import get_logger
 from ..services.embedding_service import get_embedding_service
 from ..services.redis_client import get_redis_client
+from ..services.embedding_codec import encode_embedding, decode_embedding
 
 logger = get_logger(__name__)
 
@@ -352,11 +353,11 @@ class CodingLearningSystem:
             experiences = []
             for row in query:
                 # 计算相似度
-                exp_embedding = json.loads(row.context_embedding) if row.context_embedding else None
-                if exp_embedding:
+                exp_embedding = decode_embedding(row.context_embedding)
+                if exp_embedding is not None:
                     similarity = self.embedding_service.calculate_similarity(
                         query_embedding,
-                        np.array(exp_embedding)
+                        exp_embedding
                     )
 
                     if similarity >= self.similarity_threshold:
@@ -680,10 +681,10 @@ class CodingLearningSystem:
         # 生成嵌入向量
         context_embedding = self.embedding_service.encode_single(
             session_data.problem_description
-        ).tolist()
+        )
         solution_embedding = self.embedding_service.encode_single(
             session_data.solution_description
-        ).tolist()
+        )
 
         with self.SessionLocal() as session:
             session.execute(
@@ -725,8 +726,8 @@ class CodingLearningSystem:
                     "coverage": session_data.test_coverage_change,
                     "reusability": experience_value["reusability"],
                     "success": experience_value["quality"],
-                    "context_emb": json.dumps(context_embedding),
-                    "solution_emb": json.dumps(solution_embedding),
+                    "context_emb": encode_embedding(context_embedding),
+                    "solution_emb": encode_embedding(solution_embedding),
                     "metadata": json.dumps({
                         "patterns": [p.pattern_id for p in patterns],
                         "best_practices": best_practices,
@@ -13,9 +13,26 @@ from aiohttp import web
 from ..common.logger import get_context_logger
 from .redis_client import get_redis_client
 
+try:
+    import msgspec
+    HAS_MSGSPEC = True
+except ImportError:
+    HAS_MSGSPEC = False
+
 logger = get_context_logger(__name__)
 
 
+def encode_message(message: Dict[str, Any]) -> str:
+    """
+    将消息编码为JSON文本帧
+
+    前端按JSON文本帧解析，因此保持JSON线格式；安装msgspec时使用其C编码器
+    """
+    if HAS_MSGSPEC:
+        return msgspec.json.encode(message).decode()
+    return json.dumps(message, ensure_ascii=False)
+
+
 # 频道定义
 class Channels:
     """WebSocket频道定义"""
@@ -202,10 +219,13 @@ class WebSocketManager:
         
         count = 0
         disconnected = []
-        
+
+        # 每次广播只编码一次，所有订阅者复用同一帧
+        payload = encode_message(message)
+
         for websocket in self.active_connections[channel].copy():
             try:
-                await websocket.send_json(message)
+                await websocket.send_str(payload)
                 count += 1
                 self.total_messages_sent += 1
             except Exception as e:
@@ -0,0 +1,34 @@
+"""
+嵌入向量编解码单元测试
+"""
+
+import json
+
+import numpy as np
+
+from src.mcp_core.services.embedding_codec import encode_embedding, decode_embedding
+
+
+class TestEmbeddingCodec:
+    """嵌入向量编解码测试类"""
+
+    def test_roundtrip(self):
+        """测试二进制往返"""
+        vec = np.random.default_rng(0).normal(size=768)
+
+        data = encode_embedding(vec)
+
+        assert len(data) == 768 * 4
+        np.testing.assert_allclose(decode_embedding(data), vec, rtol=1e-6)
+
+    def test_legacy_json(self):
+        """测试兼容升级前的JSON数据"""
+        vec = [0.1, -0.2, 0.3]
+
+        np.testing.assert_allclose(decode_embedding(json.dumps(vec)), vec, rtol=1e-6)
+        np.testing.assert_allclose(decode_embedding(json.dumps(vec).encode()), vec, rtol=1e-6)
+
+    def test_empty(self):
+        """测试空值"""
+        assert decode_embedding(None) is None
+        assert decode_embedding(b"") is None
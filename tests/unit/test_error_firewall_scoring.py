@@ -0,0 +1,98 @@
+"""
+错误防火墙批量评分单元测试 (与原逐条匹配算法对照)
+"""
+
+import random
+
+import numpy as np
+import pytest
+
+from src.mcp_core.services import error_firewall_scoring as module
+from src.mcp_core.services.error_firewall_scoring import (
+    blob_to_pattern,
+    encode_pattern,
+    pattern_to_blob,
+    score_patterns,
+    stack_patterns,
+)
+
+# 同一取值的多种写法: 数值/布尔按 == 相等，字符串按大小写区分精确与忽略大小写匹配
+VALUES = [1, 1.0, True, 0, False, 30, "30", "GET", "get", "Get", "/api/users", "/API/Users", None, "None", ["a", "b"]]
+KEYS = ["endpoint", "method", "timeout", "retries", "verify", "headers"]
+
+
+def calculate_match_confidence(operation_params, stored_pattern):
+    """原 ErrorFirewallService._calculate_match_confidence 的逐条实现 (参考结果)"""
+    if not stored_pattern:
+        return 0.0
+
+    matched_keys = 0
+    total_keys = len(stored_pattern)
+
+    for key, value in stored_pattern.items():
+        if key in operation_params:
+            if operation_params[key] == value:
+                matched_keys += 1
+            elif str(operation_params[key]).lower() == str(value).lower():
+                matched_keys += 0.8
+
+    return matched_keys / total_keys if total_keys > 0 else 0.0
+
+
+def random_pattern(rng):
+    """随机模式 (键数0到全部)"""
+    keys = rng.sample(KEYS, rng.randint(0, len(KEYS)))
+    return {key: rng.choice(VALUES) for key in keys}
+
+
+@pytest.fixture
+def cases():
+    """随机操作参数与候选模式"""
+    rng = random.Random(5)
+    operation = {key: rng.choice(VALUES) for key in KEYS[:4]}
+    patterns = [random_pattern(rng) for _ in range(200)]
+    return operation, patterns
+
+
+class TestScorePatterns:
+    """批量评分测试类"""
+
+    def test_numpy_matches_reference(self, cases):
+        """测试NumPy路径与逐条匹配结果一致"""
+        operation, patterns = cases
+        rows = stack_patterns([encode_pattern(p) for p in patterns[:module.NUMBA_MIN_ROWS - 1]])
+
+        scores = score_patterns(operation, *rows)
+
+        assert scores.tolist() == pytest.approx(
+            [calculate_match_confidence(operation, p) for p in patterns[:module.NUMBA_MIN_ROWS - 1]], abs=1e-12
+        )
+
+    def test_numba_matches_reference(self, cases):
+        """测试Numba路径与逐条匹配结果一致"""
+        if not module.HAS_NUMBA:
+            pytest.skip("numba 未安装")
+        operation, patterns = cases
+        rows = stack_patterns([encode_pattern(p) for p in patterns])
+
+        scores = module._score_numba(*encode_pattern(operation), *rows)
+
+        assert scores.tolist() == pytest.approx(
+            [calculate_match_confidence(operation, p) for p in patterns], abs=1e-12
+        )
+
+    def test_blob_round_trip(self, cases):
+        """测试从BLOB还原的编码与直接编码评分相同"""
+        operation, patterns = cases
+        encoded = stack_patterns([encode_pattern(p) for p in patterns])
+        restored = stack_patterns([blob_to_pattern(pattern_to_blob(p)) for p in patterns])
+
+        for direct, from_blob in zip(encoded, restored):
+            np.testing.assert_array_equal(direct, from_blob)
+        assert score_patterns(operation, *restored).tolist() == score_patterns(operation, *encoded).tolist()
+
+    def test_empty_pattern_scores_zero(self):
+        """测试空模式置信度为0"""
+        rows = stack_patterns([encode_pattern({})])
+
+        assert score_patterns({"method": "GET"}, *rows).tolist() == [0.0]
@@ -0,0 +1,53 @@
+"""
+错误防火墙服务单元测试
+"""
+
+from unittest.mock import MagicMock
+
+import pytest
+
+pymysql_cursors = pytest.importorskip("pymysql.cursors")
+
+from sqlalchemy.dialects.mysql import pymysql as mysql_pymysql
+
+from src.mcp_core.services import error_firewall_service as module
+from src.mcp_core.services.error_firewall_service import ErrorFirewallService
+
+
+def _errors(count):
+    """批量错误样例"""
+    return [
+        {
+            "error_type": "api_call",
+            "error_scene": "ci",
+            "error_pattern": {"endpoint": f"/api/{i}", "timeout": 30},
+            "error_message": "timeout",
+        }
+        for i in range(count)
+    ]
+
+
+class TestRecordErrorsBulk:
+    """批量记录错误测试类"""
+
+    def test_bulk_upsert_is_rewritten_to_multi_row(self):
+        """测试批量语句可被PyMySQL改写为单条多行VALUES"""
+        sql = str(module._Q_UPSERT_ERROR_BULK.compile(dialect=mysql_pymysql.dialect()))
+
+        match = pymysql_cursors.RE_INSERT_VALUES.match(sql)
+
+        assert match is not None
+        assert "ON DUPLICATE KEY UPDATE" in match.group(3)
+
+    def test_bulk_sends_batches_with_shared_timestamp(self):
+        """测试按批发送且整批共用同一时间参数"""
+        session = MagicMock()
+        service = ErrorFirewallService(session)
+
+        result = service.record_errors_bulk(_errors(5), batch_size=2)
+
+        batches = [call.args[1] for call in session.execute.call_args_list]
+        assert result["success"] and result["count"] == 5
+        assert [len(batch) for batch in batches] == [2, 2, 1]
+        assert len({row["now"] for batch in batches for row in batch}) == 1
+        session.commit.assert_called_once()
@@ -0,0 +1,196 @@
+"""
+智能进化系统API单元测试 (图谱缓存的ETag/304与zstd响应体)
+"""
+
+import json
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+pytest.importorskip("sentence_transformers")
+pytest.importorskip("javalang")
+pytest.importorskip("fastapi")
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.mcp_core.services import evolution_api as module
+from src.mcp_core.services.graph_worker import (
+    CACHE_RAW,
+    compress_graph_body,
+    compute_etag,
+    encode_graph_body,
+    graph_cache_key,
+    graph_etag_key,
+)
+
+VISUALIZATION = {
+    "nodes": [{"id": "a", "label": "Service", "size": 1.5}],
+    "edges": [{"source": "a", "target": "a", "type": "calls"}]
+}
+
+
+class FakeRedis:
+    """只支持 MGET 的Redis替身，值与真实客户端一样为字节"""
+
+    def __init__(self, values):
+        self.values = values
+
+    def mget(self, *keys):
+        return [self.values.get(key) for key in keys]
+
+
+@pytest.fixture
+def cached_graph():
+    """按图谱生成进程的写法写入缓存 (响应体 + ETag)"""
+    payload = encode_graph_body("p1", VISUALIZATION)
+    return payload, compute_etag(payload), {
+        graph_cache_key("p1"): compress_graph_body(payload),
+        graph_etag_key("p1"): compute_etag(payload).encode()
+    }
+
+
+@pytest.fixture
+def client_for():
+    """以指定缓存内容构造测试客户端"""
+    patches = []
+
+    def build(values):
+        generator = SimpleNamespace(
+            redis_client=SimpleNamespace(client=FakeRedis(values)),
+            SessionLocal=MagicMock()
+        )
+        patcher = patch.object(module, "get_graph_generator", return_value=generator)
+        patcher.start()
+        patches.append(patcher)
+        app = FastAPI()
+        app.include_router(module.router)
+        return TestClient(app, raise_server_exceptions=False)
+
+    yield build
+    for patcher in patches:
+        patcher.stop()
+
+
+class TestGraphCacheHelpers:
+    """图谱缓存辅助函数测试类"""
+
+    def test_split_cache_tags(self):
+        """测试按首字节标记拆分缓存值，无标记的旧缓存原样返回"""
+        body = b'{"success": true}'
+
+        assert module._split_graph_cache(CACHE_RAW + body) == (False, body)
+        assert module._split_graph_cache(body) == (False, body)
+        if module.HAS_ZSTD:
+            compressed, content = module._split_graph_cache(compress_graph_body(body))
+            assert compressed and content != body
+
+    def test_etag_matches(self):
+        """测试 If-None-Match 的强/弱校验、列表与通配符"""
+        etag = b"abc"
+
+        assert module._etag_matches('"abc"', etag)
+        assert module._etag_matches('W/"abc"', etag)
+        assert module._etag_matches('"x", W/"abc"', etag)
+        assert module._etag_matches("*", etag)
+        assert not module._etag_matches('"abd"', etag)
+        assert not module._etag_matches(None, etag)
+        assert not module._etag_matches('"abc"', None)
+
+
+class TestGetProjectGraph:
+    """图谱获取接口测试类"""
+
+    def test_cached_body_matches_envelope(self, client_for, cached_graph):
+        """测试缓存命中时的响应体与原先重新编码的响应一致"""
+        _, etag, values = cached_graph
+
+        response = client_for(values).get("/api/evolution/graph/p1")
+
+        assert response.status_code == 200
+        assert response.json() == {"success": True, "project_id": "p1", "graph": VISUALIZATION}
+        assert response.headers["etag"] == f'W/"{etag}"'
+
+    def test_if_none_match_returns_304(self, client_for, cached_graph):
+        """测试ETag命中时返回304且不带响应体"""
+        _, etag, values = cached_graph
+
+        response = client_for(values).get("/api/evolution/graph/p1", headers={"If-None-Match": f'W/"{etag}"'})
+
+        assert response.status_code == 304
+        assert response.content == b""
+        assert response.headers["etag"] == f'W/"{etag}"'
+
+    def test_zstd_passthrough(self, client_for, cached_graph):
+        """测试客户端接受zstd时直接透传压缩缓存，解压后与原响应体相同"""
+        if not module.HAS_ZSTD:
+            pytest.skip("zstandard 未安装")
+        import zstandard
+        payload, _, values = cached_graph
+
+        with client_for(values).stream(
+            "GET", "/api/evolution/graph/p1", headers={"Accept-Encoding": "zstd"}
+        ) as response:
+            raw = b"".join(response.iter_raw())
+
+        assert response.headers["content-encoding"] == "zstd"
+        assert zstandard.ZstdDecompressor().decompress(raw) == payload
+        assert json.loads(payload) == {"success": True, "project_id": "p1", "graph": VISUALIZATION}
+
+
+def fake_stream_rows(fail_on=None):
+    """按查询返回固定行片段的 _stream_rows 替身: fail_on 为节点查询时首批即失败，为边查询时输出全部片段后失败"""
+    chunks = {
+        module._Q_GRAPH_NODES: [b'{"id":"a"}', b',{"id":"b"}'],
+        module._Q_GRAPH_EDGES: [b'{"source":"a","target":"b"}']
+    }
+
+    def stream_rows(session, stmt, project_id):
+        if stmt is fail_on is module._Q_GRAPH_NODES:
+            raise RuntimeError("connection lost")
+        yield from chunks[stmt]
+        if stmt is fail_on:
+            raise RuntimeError("connection lost")
+
+    return stream_rows
+
+
+class TestStreamProjectGraph:
+    """图谱流式输出测试类 (缓存未命中)"""
+
+    @pytest.fixture(autouse=True)
+    def graph_exists(self):
+        with patch.object(module, "_fetch_rows", AsyncMock(return_value=[(1,)])):
+            yield
+
+    def test_streamed_body(self, client_for):
+        """测试流式输出与缓存命中时的字段一致"""
+        with patch.object(module, "_stream_rows", fake_stream_rows()):
+            response = client_for({}).get("/api/evolution/graph/p1")
+
+        assert response.status_code == 200
+        assert response.json() == {
+            "success": True,
+            "project_id": "p1",
+            "graph": {"nodes": [{"id": "a"}, {"id": "b"}], "edges": [{"source": "a", "target": "b"}]}
+        }
+
+    def test_first_batch_failure_returns_500(self, client_for):
+        """测试首批节点读取失败时在开始输出之前返回500"""
+        with patch.object(module, "_stream_rows", fake_stream_rows(fail_on=module._Q_GRAPH_NODES)):
+            response = client_for({}).get("/api/evolution/graph/p1")
+
+        assert response.status_code == 500
+        assert response.json()["detail"] == "connection lost"
+
+    def test_mid_stream_failure_ends_with_error(self, client_for):
+        """测试开始输出后出错时响应体仍是完整JSON，以失败标记结尾"""
+        with patch.object(module, "_stream_rows", fake_stream_rows(fail_on=module._Q_GRAPH_EDGES)):
+            response = client_for({}).get("/api/evolution/graph/p1")
+
+        body = response.json()
+        assert response.status_code == 200
+        assert body["success"] is False
+        assert body["error"] == "connection lost"
+        assert body["graph"] == {"nodes": [{"id": "a"}, {"id": "b"}], "edges": [{"source": "a", "target": "b"}]}
@@ -0,0 +1,148 @@
+"""
+经验ANN索引单元测试
+"""
+
+import pytest
+import numpy as np
+
+pytest.importorskip("faiss")
+
+from src.mcp_core.services.experience_ann_index import ExperienceANNIndex, experience_faiss_id
+
+
+@pytest.fixture
+def vectors():
+    """随机经验向量"""
+    rng = np.random.default_rng(42)
+    return {f"exp_{i}": rng.normal(size=64).astype(np.float32) for i in range(100)}
+
+
+class TestExperienceANNIndex:
+    """经验ANN索引测试类"""
+
+    def test_empty_index_not_available(self, tmp_path):
+        """测试空索引不可用"""
+        index = ExperienceANNIndex(str(tmp_path / "experiences.index"))
+
+        assert not index.available
+        assert index.search(np.ones(64), 5) == []
+
+    def test_search_returns_nearest(self, tmp_path, vectors):
+        """测试检索返回最相似经验"""
+        index = ExperienceANNIndex(str(tmp_path / "experiences.index"))
+        for exp_id, vec in vectors.items():
+            index.add(exp_id, vec)
+
+        results = index.search(vectors["exp_7"], 3)
+
+        assert results[0][0] == "exp_7"
+        assert results[0][1] == pytest.approx(1.0, abs=1e-4)
+
+    def test_duplicate_add_deduplicated(self, tmp_path, vectors):
+        """测试重复添加的经验在结果中只出现一次"""
+        index = ExperienceANNIndex(str(tmp_path / "experiences.index"))
+        for exp_id, vec in vectors.items():
+            index.add(exp_id, vec)
+        index.add("exp_3", vectors["exp_3"])
+
+        ids = [exp_id for exp_id, _ in index.search(vectors["exp_3"], 5)]
+
+        assert ids.count("exp_3") == 1
+
+    def test_save_and_load(self, tmp_path, vectors):
+        """测试持久化后重新加载"""
+        path = str(tmp_path / "ann" / "experiences.index")
+        index = ExperienceANNIndex(path)
+        for exp_id, vec in vectors.items():
+            index.add(exp_id, vec)
+        index.save()
+
+        reloaded = ExperienceANNIndex(path)
+
+        assert len(reloaded) == len(vectors)
+        assert reloaded.search(vectors["exp_11"], 1)[0][0] == "exp_11"
+
+    def test_faiss_id_is_stable(self):
+        """测试ID映射稳定且非负"""
+        assert experience_faiss_id("exp_1") == experience_faiss_id("exp_1")
+        assert experience_faiss_id("exp_1") >= 0
+
+    @pytest.mark.parametrize("kind", ["ivf", "flat"])
+    def test_alternative_kinds(self, tmp_path, vectors, kind):
+        """测试IVF/Flat索引检索"""
+        index = ExperienceANNIndex(str(tmp_path / "experiences.index"), kind=kind)
+        for exp_id, vec in vectors.items():
+            index.add(exp_id, vec)
+
+        assert index.search(vectors["exp_5"], 1)[0][0] == "exp_5"
+
+    def test_ivf_trains_in_background(self, tmp_path, monkeypatch):
+        """测试IVF达到训练下限后切换为IVF索引，并可持久化重载"""
+        import faiss
+        from src.mcp_core.services import experience_ann_index as module
+
+        monkeypatch.setattr(module, "IVF_MIN_TRAIN_SIZE", 50)
+        rng = np.random.default_rng(7)
+        data = {f"exp_{i}": rng.normal(size=32).astype(np.float32) for i in range(200)}
+        path = str(tmp_path / "experiences.index")
+
+        index = ExperienceANNIndex(path, kind="ivf")
+        for exp_id, vec in data.items():
+            index.add(exp_id, vec)
+        index._rebuild()
+
+        assert isinstance(faiss.downcast_index(index.index.index), faiss.IndexIVF)
+        assert len(index) == len(data)
+        assert index.search(data["exp_42"], 1)[0][0] == "exp_42"
+
+        index.save()
+        reloaded = ExperienceANNIndex(path, kind="ivf")
+        assert reloaded.search(data["exp_42"], 1)[0][0] == "exp_42"
+
+    def test_duplicates_do_not_underfill_top_k(self, tmp_path, vectors):
+        """测试大量重复添加后检索结果仍有k个不同经验"""
+        index = ExperienceANNIndex(str(tmp_path / "experiences.index"))
+        for exp_id, vec in vectors.items():
+            index.add(exp_id, vec)
+        for _ in range(20):
+            index.add("exp_3", vectors["exp_3"])
+
+        ids = [exp_id for exp_id, _ in index.search(vectors["exp_3"], 5)]
+
+        assert len(ids) == len(set(ids)) == 5
+
+    def test_rebuild_compacts_stale_vectors(self, tmp_path, vectors):
+        """测试重建后每个经验只保留最后一次添加的向量"""
+        index = ExperienceANNIndex(str(tmp_path / "experiences.index"))
+        for exp_id, vec in vectors.items():
+            index.add(exp_id, vec)
+        index.add("exp_3", vectors["exp_4"])
+
+        index._rebuild()
+
+        assert len(index) == len(vectors)
+        assert index._stale == 0
+        assert dict(index.search(vectors["exp_4"], 2))["exp_3"] == pytest.approx(1.0, abs=1e-4)
+
+    def test_load_rebuilds_on_kind_mismatch(self, tmp_path, vectors):
+        """测试已存索引类型与配置不符时按配置类型重建"""
+        import faiss
+        from src.mcp_core.services.experience_ann_index import index_kind
+
+        path = str(tmp_path / "experiences.index")
+        index = ExperienceANNIndex(path, kind="hnsw")
+        for exp_id, vec in vectors.items():
+            index.add(exp_id, vec)
+        index.save()
+
+        reloaded = ExperienceANNIndex(path, kind="flat")
+
+        assert index_kind(reloaded.index) == "flat"
+        assert not isinstance(faiss.downcast_index(reloaded.index.index), faiss.IndexHNSW)
+        assert len(reloaded) == len(vectors)
+        assert reloaded.search(vectors["exp_9"], 1)[0][0] == "exp_9"
+
+    def test_invalid_kind(self, tmp_path):
+        """测试不支持的索引类型"""
+        with pytest.raises(ValueError):
+            ExperienceANNIndex(str(tmp_path / "experiences.index"), kind="lsh")
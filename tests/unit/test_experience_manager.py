@@ -0,0 +1,254 @@
+"""
+经验管理系统单元测试
+"""
+
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+pytest.importorskip("sentence_transformers")
+
+from src.mcp_core.services import experience_manager as module
+from src.mcp_core.services.experience_manager import (
+    Experience,
+    ExperienceLRUCache,
+    ExperienceManagementSystem,
+    normalize_embedding,
+    normalize_rows,
+    quantize_embedding,
+)
+
+
+@pytest.fixture
+def manager(tmp_path):
+    """不连接数据库/Redis/嵌入模型的经验管理系统"""
+    with patch.object(module, "get_settings") as get_settings, \
+            patch.object(module, "create_engine"), \
+            patch.object(module, "get_embedding_service"), \
+            patch.object(module, "get_redis_client"):
+        get_settings.return_value.vector_db.faiss_index_path = str(tmp_path)
+        get_settings.return_value.vector_db.experience_ann_kind = "flat"
+        system = ExperienceManagementSystem()
+
+    yield system
+    system._io_pool.shutdown()
+
+
+def make_experience(exp_id, embedding, tags=(), category="bug_fix"):
+    """构造经验并放入内存缓存"""
+    return Experience(
+        experience_id=exp_id,
+        experience_type="solution",
+        category=category,
+        title=exp_id,
+        description="",
+        problem="",
+        solution="",
+        tags=list(tags),
+        embedding=normalize_embedding(np.asarray(embedding, dtype=np.float32))
+    )
+
+
+def add_experience(manager, experience, index_vector=True):
+    """写入内存缓存、倒排索引与ANN索引"""
+    manager.memory_cache[experience.experience_id] = experience
+    manager.update_indexes(experience)
+    if index_vector:
+        manager.ann_index.add(experience.experience_id, experience.embedding)
+
+
+class TestLRUCache:
+    """经验内存LRU缓存测试类"""
+
+    def test_read_promotes_and_evicts_least_recent(self):
+        """测试读取提升为最近使用，超出容量时淘汰最久未用项并回调"""
+        evicted = []
+        cache = ExperienceLRUCache(maxsize=3, on_evict=evicted.append)
+        for key in "abc":
+            cache[key] = key
+
+        assert cache["a"] == "a"
+        assert cache.get("b") == "b"
+        cache["d"] = "d"
+
+        assert evicted == ["c"]
+        assert list(cache) == ["a", "b", "d"]
+
+    def test_overwrite_does_not_evict(self):
+        """测试覆盖已有键只提升顺序，不触发淘汰"""
+        evicted = []
+        cache = ExperienceLRUCache(maxsize=2, on_evict=evicted.append)
+        cache["a"] = 1
+        cache["b"] = 2
+        cache["a"] = 3
+
+        assert evicted == []
+        assert list(cache.items()) == [("b", 2), ("a", 3)]
+        assert cache.get("missing", 0) == 0
+
+    def test_eviction_drops_embedding_row(self, manager):
+        """测试淘汰的经验同时移出嵌入矩阵，其余行与经验ID保持对应"""
+        manager.memory_cache.maxsize = 2
+        rng = np.random.default_rng(11)
+        embeddings = {}
+        for exp_id in ["e1", "e2", "e3"]:
+            embeddings[exp_id] = normalize_embedding(rng.normal(size=8).astype(np.float32))
+            manager.memory_cache[exp_id] = make_experience(exp_id, embeddings[exp_id])
+            manager._put_cache_embedding(exp_id, embeddings[exp_id])
+
+        assert "e1" not in manager.memory_cache
+        assert sorted(manager.cache_ids) == ["e2", "e3"]
+        for exp_id in ["e2", "e3"]:
+            row = manager._cache_rows[exp_id]
+            assert manager.cache_ids[row] == exp_id
+            quantized, scale = quantize_embedding(embeddings[exp_id])
+            np.testing.assert_array_equal(manager.cache_matrix[row], quantized)
+            assert manager.cache_scales[row] == pytest.approx(scale)
+
+
+class TestVectorSearch:
+    """向量检索测试类"""
+
+    def test_semantic_hit_with_other_tags_kept(self, manager):
+        """测试语义最相近但标签不匹配的经验不被预过滤排除"""
+        pytest.importorskip("faiss")
+        add_experience(manager, make_experience("semantic", [1.0, 0.0, 0.0], tags=["database"]))
+        add_experience(manager, make_experience("tagged", [0.8, 0.6, 0.0], tags=["python"]))
+
+        hits = manager.vector_search(np.array([1.0, 0.0, 0.0], dtype=np.float32), 5, {"tags": ["python"]})
+
+        assert [experience.experience_id for experience, _ in hits] == ["semantic", "tagged"]
+        assert hits[0][1] == pytest.approx(1.0, abs=1e-5)
+
+    def test_underfilled_prefilter_falls_back_to_scan(self, manager):
+        """测试ANN不可用且预过滤结果不足时回退到数据库扫描并合并"""
+        tagged = make_experience("tagged", [0.8, 0.6, 0.0], tags=["python"])
+        semantic = make_experience("semantic", [1.0, 0.0, 0.0], tags=["database"])
+        add_experience(manager, tagged, index_vector=False)
+
+        with patch.object(manager, "vector_search_scan", return_value=[(semantic, 1.0), (tagged, 0.8)]) as scan:
+            hits = manager.vector_search(np.array([1.0, 0.0, 0.0], dtype=np.float32), 5, {"tags": ["python"]})
+
+        scan.assert_called_once()
+        assert [experience.experience_id for experience, _ in hits] == ["semantic", "tagged"]
+
+
+class TestInvertedIndexes:
+    """倒排索引测试类"""
+
+    def test_lookup_returns_copy(self, manager):
+        """测试查询结果为副本，后续入库不影响已取出的候选集合"""
+        add_experience(manager, make_experience("e1", [1.0, 0.0], tags=["python"]), index_vector=False)
+
+        candidates = manager.lookup_index(manager.tag_index, ["python", "missing"])
+        add_experience(manager, make_experience("e2", [0.0, 1.0], tags=["python"]), index_vector=False)
+
+        assert candidates == {"e1"}
+        assert manager.prefilter_candidates({"tags": ["python"], "category": "bug_fix"}) == {"e1", "e2"}
+        assert "missing" not in manager.tag_index
+
+
+class TestContextMatch:
+    """上下文匹配度测试类"""
+
+    def test_batch_matches_single(self, manager):
+        """测试批量计算与逐条计算一致"""
+        experiences = [
+            make_experience("e1", [1.0, 0.0], tags=["python", "api"]),
+            make_experience("e2", [0.0, 1.0], tags=["java"], category="feature"),
+            make_experience("e3", [1.0, 1.0]),
+        ]
+        context = {"category": "bug_fix", "tags": ["python", "java"], "project_id": None}
+
+        batch = manager.calculate_context_matches(experiences, context)
+
+        assert batch.tolist() == [manager.calculate_context_match(e, context) for e in experiences]
+
+    def test_cache_only_within_one_retrieval(self, manager):
+        """测试匹配度只在传入的检索缓存内复用，经验修改后的新检索重新计算"""
+        experience = make_experience("e1", [1.0, 0.0])
+        context = {"category": "bug_fix"}
+        match_cache = {}
+
+        first = manager.calculate_context_match(experience, context, match_cache)
+        experience.category = "feature"
+
+        assert manager.calculate_context_match(experience, context, match_cache) == first
+        assert manager.calculate_context_matches([experience], context, match_cache)[0] == first
+        assert manager.calculate_context_match(experience, context) != first
+
+    def test_query_tags_do_not_grow_tag_ids(self, manager):
+        """测试查询中的未知标签不分配ID，且不影响与已知标签的匹配"""
+        experience = make_experience("e1", [1.0, 0.0], tags=["python"])
+        context = {"tags": ["python"] + [f"unknown_{i}" for i in range(100)], "project_id": "other"}
+
+        matches = manager.calculate_context_matches([experience], context)
+
+        assert matches[0] == pytest.approx(1 / 101)
+        assert set(manager._tag_ids) == {"python"}
+
+
+class TestConfidence:
+    """置信度测试类"""
+
+    def test_batch_matches_single(self, manager):
+        """测试批量置信度与逐条计算完全一致 (覆盖各使用次数档位与上限截断)"""
+        rng = np.random.default_rng(3)
+        experiences = []
+        for i, usage_count in enumerate([0, 2, 3, 10, 11, 50]):
+            experience = make_experience(f"e{i}", [1.0, 0.0], tags=["python"] if i % 2 else ["java"])
+            experience.usage_count = usage_count
+            experience.effectiveness = float(rng.uniform(0.5, 1.0))
+            experiences.append(experience)
+        scores = np.append(rng.uniform(0.0, 1.0, len(experiences) - 1), 5.0)
+        context = {"category": "bug_fix", "tags": ["python"]}
+
+        batch = manager.calculate_confidences(experiences, scores, context)
+
+        assert batch.tolist() == [
+            manager.calculate_confidence(e, float(score), context) for e, score in zip(experiences, scores)
+        ]
+        assert batch[-1] == 1.0
+
+
+class TestRecommendation:
+    """推荐生成测试类"""
+
+    def test_risk_assessment_matches_assess_risks(self, manager):
+        """测试推荐中的风险评估与 assess_risks 一致"""
+        experience = make_experience("e1", [1.0, 0.0])
+        experience.complexity = 0.4
+        experience.reliability = 0.7
+        context = {"project_id": "other"}
+
+        recommendation = manager.generate_recommendation(experience, 0.8, "query", context, confidence=0.5)
+
+        assert recommendation.risk_assessment == manager.assess_risks(experience, context)
+        assert recommendation.risks == manager.assess_risks_fast(experience, context)
+
+
+class TestSimilarity:
+    """相似度计算测试类"""
+
+    def test_calculate_similarity_is_cosine(self, manager):
+        """测试单对相似度不要求输入已归一化"""
+        assert manager.calculate_similarity(np.array([3.0, 0.0]), [2.0, 2.0]) == pytest.approx(np.sqrt(0.5))
+        assert manager.calculate_similarity(np.zeros(2), [1.0, 0.0]) == 0.0
+
+    def test_batch_similarity_matches_cosine_after_normalization(self, manager):
+        """测试按行归一化后批量内积与余弦相似度一致 (float32 与 int8 量化矩阵)"""
+        rng = np.random.default_rng(7)
+        query = rng.normal(size=32).astype(np.float32)
+        rows = rng.normal(size=(20, 32)).astype(np.float32) * 5
+        expected = [manager.calculate_similarity(query, row) for row in rows]
+
+        matrix = normalize_rows(rows)
+        quantized = [quantize_embedding(row) for row in matrix]
+
+        assert manager.batch_similarity(normalize_embedding(query), matrix) == pytest.approx(expected, abs=1e-5)
+        assert manager.batch_similarity(
+            normalize_embedding(query),
+            np.stack([q for q, _ in quantized]),
+            np.array([scale for _, scale in quantized], dtype=np.float32)
+        ) == pytest.approx(expected, abs=2e-2)
@@ -0,0 +1,154 @@
+"""
+图谱单文件分析缓存单元测试
+"""
+
+import os
+
+import pytest
+
+from src.mcp_core.code_analyzer import CodeEntity, CodeRelation, PythonCodeAnalyzer
+from src.mcp_core.services import graph_analysis as module
+from src.mcp_core.services.graph_analysis import (
+    analyze_source_file,
+    decode_analysis,
+    encode_analysis,
+    prune_analysis_cache,
+    resolve_source_key,
+)
+
+SOURCE = '''
+class Service:
+    """服务"""
+
+    def run(self, value):
+        return helper(value)
+
+
+def helper(value):
+    return value
+'''
+
+
+@pytest.fixture
+def project(tmp_path):
+    """单文件示例项目"""
+    root = tmp_path / "project"
+    root.mkdir()
+    path = root / "service.py"
+    path.write_text(SOURCE, encoding="utf-8")
+    return str(root), str(path)
+
+
+@pytest.fixture
+def count_analyses(monkeypatch):
+    """统计分析器实际执行次数"""
+    calls = []
+    original = PythonCodeAnalyzer.analyze
+
+    def analyze(self, content):
+        calls.append(self.file_path)
+        return original(self, content)
+
+    monkeypatch.setattr(PythonCodeAnalyzer, "analyze", analyze)
+    return calls
+
+
+class TestAnalysisCodec:
+    """分析结果编解码测试类"""
+
+    def test_round_trip(self):
+        """测试编码后还原为相同的实体与关系"""
+        entities = [CodeEntity("e1", "class", "A", "m.A", "m.py", 1, 5, metadata={"bases": ["B"]})]
+        relations = [CodeRelation("e1", "B", "inherits", {"line": 1})]
+
+        assert decode_analysis(encode_analysis((entities, relations))) == (entities, relations)
+
+    def test_sets_encoded_as_lists(self):
+        """测试元数据中的集合编码为列表"""
+        entity = CodeEntity("e1", "class", "A", "m.A", "m.py", 1, 5, metadata={"modifiers": {"public"}})
+
+        decoded, _ = decode_analysis(encode_analysis(([entity], [])))
+
+        assert decoded[0].metadata == {"modifiers": ["public"]}
+
+
+class TestAnalysisDiskCache:
+    """分析结果磁盘缓存测试类"""
+
+    def test_cached_result_matches_fresh_analysis(self, tmp_path, project, count_analyses):
+        """测试缓存命中结果与重新分析一致，且不再执行分析器"""
+        root, path = project
+        cache_dir = str(tmp_path / "cache")
+
+        first = analyze_source_file(path, root, PythonCodeAnalyzer, cache_dir)
+        second = analyze_source_file(path, root, PythonCodeAnalyzer, cache_dir)
+
+        assert first == second
+        assert len(count_analyses) == 1
+
+    def test_stat_fast_path_skips_reading(self, tmp_path, project):
+        """测试修改时间与大小未变时不读取文件内容"""
+        root, path = project
+        cache_dir = str(tmp_path / "cache")
+
+        key, content = resolve_source_key(path, root, PythonCodeAnalyzer, cache_dir)
+        cached_key, cached_content = resolve_source_key(path, root, PythonCodeAnalyzer, cache_dir)
+
+        assert content == SOURCE
+        assert cached_key == key
+        assert cached_content is None
+
+    def test_modified_file_is_reanalyzed(self, tmp_path, project, count_analyses):
+        """测试文件内容变化后重新分析"""
+        root, path = project
+        cache_dir = str(tmp_path / "cache")
+        analyze_source_file(path, root, PythonCodeAnalyzer, cache_dir)
+
+        with open(path, "a", encoding="utf-8") as f:
+            f.write("\n\ndef extra():\n    pass\n")
+        entities, _ = analyze_source_file(path, root, PythonCodeAnalyzer, cache_dir)
+
+        assert len(count_analyses) == 2
+        assert any(entity.name == "extra" for entity in entities)
+
+    def test_invalid_key_alias_ignored(self, tmp_path, project):
+        """测试被篡改的键记录不会被当作文件名使用"""
+        root, path = project
+        cache_dir = str(tmp_path / "cache")
+        key, _ = resolve_source_key(path, root, PythonCodeAnalyzer, cache_dir)
+        alias = next(p for p in os.listdir(cache_dir) if p.endswith(module.ANALYSIS_KEY_SUFFIX))
+        with open(os.path.join(cache_dir, alias), "w") as f:
+            f.write("../../etc/passwd")
+
+        resolved, content = resolve_source_key(path, root, PythonCodeAnalyzer, cache_dir)
+
+        assert resolved == key
+        assert content == SOURCE
+
+
+class TestPruneAnalysisCache:
+    """磁盘缓存淘汰测试类"""
+
+    def test_under_limit_keeps_everything(self, tmp_path):
+        """测试未超出上限时不删除"""
+        (tmp_path / "a.json").write_bytes(b"x" * 100)
+
+        assert prune_analysis_cache(str(tmp_path), 1000) == 0
+        assert (tmp_path / "a.json").exists()
+
+    def test_evicts_oldest_first(self, tmp_path):
+        """测试超出上限时按修改时间从旧到新淘汰，降至上限比例以下"""
+        for i in range(10):
+            path = tmp_path / f"{i}.json"
+            path.write_bytes(b"x" * 100)
+            os.utime(path, ns=(i * 10**9, i * 10**9))
+
+        removed = prune_analysis_cache(str(tmp_path), 500)
+
+        remaining = sorted(int(p.stem) for p in tmp_path.iterdir())
+        assert removed == 6
+        assert remaining == [6, 7, 8, 9]
+
+    def test_missing_directory(self, tmp_path):
+        """测试缓存目录不存在"""
+        assert prune_analysis_cache(str(tmp_path / "missing"), 10) == 0
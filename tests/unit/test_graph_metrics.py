@@ -0,0 +1,157 @@
+"""
+图谱指标计算单元测试 (列式快速实现与 NetworkX / python-louvain 参考实现对照)
+"""
+
+import numpy as np
+import pytest
+
+pytest.importorskip("sentence_transformers")
+pytest.importorskip("javalang")
+nx = pytest.importorskip("networkx")
+
+from src.mcp_core.services import graph_generator as module
+from src.mcp_core.services.graph_generator import GraphEdge, GraphNode, ProjectGraphGenerator
+
+
+def make_node(node_id):
+    """构造只含编号所需字段的节点"""
+    return GraphNode(
+        node_id=node_id,
+        node_type="function",
+        node_name=node_id,
+        qualified_name=node_id,
+        file_path="",
+        properties={},
+        metrics={}
+    )
+
+
+def build_graph(node_ids, weighted_edges):
+    """
+    由同一组节点与边构造列式图谱及对应的 DiGraph
+
+    Returns:
+        (GraphArrays, nx.DiGraph)
+    """
+    nodes = [make_node(node_id) for node_id in node_ids]
+    edges = [
+        GraphEdge(edge_id=f"{source}-{target}-{i}", source_id=source, target_id=target, edge_type="calls", weight=weight)
+        for i, (source, target, weight) in enumerate(weighted_edges)
+    ]
+    # build_graph_arrays 不依赖生成器的数据库/Redis/嵌入模型连接
+    arrays = ProjectGraphGenerator.__new__(ProjectGraphGenerator).build_graph_arrays(nodes, edges)
+
+    graph = nx.DiGraph()
+    graph.add_nodes_from(node_ids)
+    for source, target, weight in weighted_edges:
+        graph.add_edge(source, target, weight=weight)
+    return arrays, graph
+
+
+def random_graph(num_nodes, num_edges, seed):
+    """随机有向加权图 (含重复边与无出边节点)"""
+    rng = np.random.default_rng(seed)
+    node_ids = [f"n{i}" for i in range(num_nodes)]
+    weighted_edges = [
+        (node_ids[source], node_ids[target], float(weight))
+        for source, target, weight in zip(
+            rng.integers(0, num_nodes - 5, num_edges),
+            rng.integers(0, num_nodes, num_edges),
+            rng.uniform(0.5, 2.0, num_edges)
+        )
+        if source != target
+    ]
+    return build_graph(node_ids, weighted_edges)
+
+
+class TestGraphArrays:
+    """列式图谱测试类"""
+
+    def test_duplicate_edges_follow_digraph(self):
+        """测试重复边与DiGraph一致只保留最后一条"""
+        arrays, graph = build_graph(["a", "b"], [("a", "b", 1.0), ("a", "b", 3.0)])
+
+        assert arrays.weights.tolist() == [3.0]
+        assert graph["a"]["b"]["weight"] == 3.0
+
+
+class TestPageRank:
+    """PageRank测试类"""
+
+    def test_matches_networkx(self):
+        """测试稀疏矩阵实现与 nx.pagerank(weight="weight") 一致"""
+        pytest.importorskip("scipy")
+        arrays, graph = random_graph(60, 200, seed=1)
+
+        expected = nx.pagerank(graph, weight="weight")
+
+        assert module.pagerank_csr(arrays) == pytest.approx(
+            [expected[node_id] for node_id in arrays.node_ids], abs=1e-9
+        )
+
+    def test_empty_graph(self):
+        """测试空图谱"""
+        arrays, _ = build_graph([], [])
+
+        assert module.pagerank_csr(arrays).shape == (0,)
+
+
+class TestSpringLayout:
+    """力导向布局测试类"""
+
+    def test_matches_networkx(self):
+        """测试相同初始坐标下与 nx.spring_layout 的结果一致 (fastmath 的舍入差异随迭代累积，按缩放后坐标比较)"""
+        pytest.importorskip("numba")
+        arrays, graph = random_graph(40, 80, seed=2)
+        np.random.seed(0)
+        initial = np.random.rand(arrays.num_nodes, 2)
+
+        expected = nx.spring_layout(
+            graph,
+            k=2,
+            pos=dict(zip(arrays.node_ids, initial)),
+            iterations=50,
+            weight="weight",
+            scale=100
+        )
+        np.random.seed(0)
+        layout = module.spring_layout_csr(arrays, k=2, iterations=50, scale=100)
+
+        assert layout == pytest.approx(np.array([expected[node_id] for node_id in arrays.node_ids]), abs=1e-4)
+
+    def test_single_node(self):
+        """测试单节点图谱位于原点"""
+        pytest.importorskip("numba")
+        arrays, _ = build_graph(["a"], [])
+
+        assert module.spring_layout_csr(arrays, k=2).tolist() == [[0.0, 0.0]]
+
+
+class TestLouvain:
+    """Louvain社区发现测试类"""
+
+    def test_matches_python_louvain(self):
+        """测试igraph实现与 community.best_partition 划分出相同的社区"""
+        pytest.importorskip("igraph")
+        community = pytest.importorskip("community")
+        # 三个全连接的小团，团之间各有一条弱连接，另含一对互为反向的边
+        groups = [[f"g{g}_{i}" for i in range(5)] for g in range(3)]
+        weighted_edges = [
+            (source, target, 1.0)
+            for group in groups
+            for i, source in enumerate(group)
+            for target in group[i + 1:]
+        ]
+        weighted_edges += [("g0_0", "g1_0", 0.1), ("g1_1", "g2_1", 0.1), ("g2_1", "g2_0", 1.0)]
+        arrays, graph = build_graph([node_id for group in groups for node_id in group], weighted_edges)
+
+        def communities(partition):
+            grouped = {}
+            for node_id, label in partition.items():
+                grouped.setdefault(label, set()).add(node_id)
+            return sorted(map(sorted, grouped.values()))
+
+        expected = community.best_partition(graph.to_undirected(), random_state=0)
+
+        assert communities(module.louvain_partition(arrays)) == communities(expected)
+        assert communities(expected) == [sorted(group) for group in groups]
@@ -0,0 +1,50 @@
+"""
+图谱生成工作进程单元测试
+"""
+
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("sentence_transformers")
+pytest.importorskip("javalang")
+
+from src.mcp_core.services.graph_worker import compute_graph_statistics
+
+
+def make_node(node_id, node_type, complexity=0.0, importance=0.0):
+    """构造只含统计所需字段的节点"""
+    return SimpleNamespace(
+        node_id=node_id,
+        node_type=node_type,
+        metrics={"complexity": complexity, "importance": importance}
+    )
+
+
+class TestComputeGraphStatistics:
+    """图谱统计测试类"""
+
+    def test_duplicates_follow_upsert(self):
+        """测试重复节点与入库一致: 类型取首次写入，指标取最后一次写入"""
+        graph = SimpleNamespace(nodes=[
+            make_node("a", "class", complexity=10.0, importance=0.9),
+            make_node("b", "function", complexity=2.0, importance=0.1),
+            make_node("a", "function", complexity=4.0, importance=0.3),
+        ])
+
+        stats = compute_graph_statistics(graph)
+
+        assert stats == {
+            "total_nodes": 2,
+            "class_count": 1,
+            "function_count": 1,
+            "avg_complexity": 3.0,
+            "max_importance": 0.3
+        }
+
+    def test_empty_graph_returns_floats(self):
+        """测试空图谱的平均复杂度与最大重要性为浮点0"""
+        stats = compute_graph_statistics(SimpleNamespace(nodes=[]))
+
+        assert stats["avg_complexity"] == 0.0 and isinstance(stats["avg_complexity"], float)
+        assert stats["max_importance"] == 0.0 and isinstance(stats["max_importance"], float)